@@ -3,8 +3,11 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import database
+from db_client import database
+import datetime
 from ui_style import *
+from virtual_table import VirtualTable
+from db_executor import DatabaseExecutor
 
 # ===================================================================
 # MAIN ADMIN DASHBOARD WINDOW
@@ -24,6 +27,14 @@ def open_admin_dashboard():
     y = (root.winfo_screenheight() // 2) - (h // 2)
     root.geometry(f"{w}x{h}+{x}+{y}")
 
+    # All database calls run in the background; results come back via after()
+    db = DatabaseExecutor(root)
+
+    def on_root_close():
+        db.close()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", on_root_close)
+
     # --- Header ---
     title = title_label(root, "Admin Dashboard")
     title.pack(pady=(20, 10))
@@ -37,11 +48,13 @@ def open_admin_dashboard():
     users_frame = tk.Frame(notebook, bg=WHITE)
     workers_frame = tk.Frame(notebook, bg=WHITE)
     bookings_frame = tk.Frame(notebook, bg=WHITE)
+    analytics_frame = tk.Frame(notebook, bg=WHITE)
 
     notebook.add(stats_frame, text="Dashboard Stats")
     notebook.add(users_frame, text="Manage Customers")
     notebook.add(workers_frame, text="Manage Workers")
     notebook.add(bookings_frame, text="View All Bookings")
+    notebook.add(analytics_frame, text="Analytics")
 
     # ==================================
     # TAB 1: DASHBOARD STATS
@@ -64,19 +77,85 @@ def open_admin_dashboard():
     create_stat_box(stats_container, total_workers_var)
     create_stat_box(stats_container, total_bookings_var)
 
+    status_breakdown_var = tk.StringVar(value="")
+    tk.Label(stats_frame, textvariable=status_breakdown_var, font=SUBTITLE_FONT,
+             bg=WHITE, fg=TEXT_LIGHT).pack()
+
+    def show_stats(stats):
+        total_users_var.set(f"Total Customers:\n{stats['users']}")
+        total_workers_var.set(f"Total Workers:\n{stats['workers']}")
+        total_bookings_var.set(f"Total Bookings:\n{stats['bookings']}")
+        by_status = "   ".join(f"{status}: {count}" for status, count in stats["by_status"].items())
+        status_breakdown_var.set(f"{by_status}   Reviews: {stats['reviews']}")
+
     def load_stats():
-        # This function will be fully built in Step U4.2
-        try:
-            stats = database.get_app_stats() # (Pending Step U4.2)
-            total_users_var.set(f"Total Customers:\n{stats['users']}")
-            total_workers_var.set(f"Total Workers:\n{stats['workers']}")
-            total_bookings_var.set(f"Total Bookings:\n{stats['bookings']}")
-        except Exception as e:
-            print(f"Stats error (normal if DB not updated): {e}")
+        db.submit(database.get_app_stats, callback=show_stats, key="stats",
+                  on_error=lambda e: print(f"Stats error (normal if DB not updated): {e}"))
 
     refresh_stats_btn = styled_button(stats_frame, "Refresh Stats", command=load_stats, width=20)
     refresh_stats_btn.pack(pady=20)
 
+    def rebuild_stats():
+        db.submit(database.rebuild_app_stats, callback=show_stats, key="stats")
+
+    rebuild_stats_btn = styled_button(stats_frame, "Recount Stats", command=rebuild_stats, width=20)
+    rebuild_stats_btn.pack(pady=(0, 10))
+
+    def on_ratings_checked(drifted):
+        if not drifted:
+            messagebox.showinfo("Ratings", "All worker ratings match their reviews.", parent=root)
+            return
+        ids = ", ".join(str(row[0]) for row in drifted[:20])
+        if messagebox.askyesno("Ratings", f"{len(drifted)} worker rating(s) are out of sync (IDs: {ids}).\nRecalculate them now?", parent=root):
+            db.submit(database.check_rating_consistency, repair=True, callback=on_ratings_repaired)
+
+    def on_ratings_repaired(_):
+        messagebox.showinfo("Ratings", "Worker ratings recalculated.", parent=root)
+        workers_table.refresh()
+
+    def check_ratings():
+        db.submit(database.check_rating_consistency, callback=on_ratings_checked, key="ratings")
+
+    check_ratings_btn = styled_button(stats_frame, "Check Ratings", command=check_ratings, width=20)
+    check_ratings_btn.pack()
+
+    def on_photos_cleaned(result):
+        removed, freed = result
+        messagebox.showinfo("Photos", f"Removed {len(removed)} unused photo(s), freed {freed / 1024:.0f} KB.", parent=root)
+
+    def clean_photos():
+        if messagebox.askyesno("Photos", "Delete photo files no worker uses any more?", parent=root):
+            db.submit(database.gc_photos, callback=on_photos_cleaned, key="photos")
+
+    clean_photos_btn = styled_button(stats_frame, "Clean Photos", command=clean_photos, width=20)
+    clean_photos_btn.pack(pady=(10, 0))
+
+    def on_old_photos_stored(result):
+        stored, skipped = result
+        msg = f"Moved {stored} worker photo(s) into the photo store."
+        if skipped:
+            msg += f"\n\n{len(skipped)} could not be moved:\n" + "\n".join(f"{path}: {reason}" for path, reason in skipped[:10])
+            if len(skipped) > 10:
+                msg += f"\n...and {len(skipped) - 10} more"
+        (messagebox.showwarning if skipped else messagebox.showinfo)("Photos", msg, parent=root)
+
+    def store_old_photos():
+        db.submit(database.store_legacy_photos, callback=on_old_photos_stored, key="old_photos")
+
+    store_photos_btn = styled_button(stats_frame, "Move Old Photos", command=store_old_photos, width=20)
+    store_photos_btn.pack(pady=(10, 0))
+
+    def on_load_failed(what, error):
+        messagebox.showerror("Error", f"Could not load {what}: {error}", parent=root)
+
+    def on_deleted(result, success_msg, reload):
+        ok, err = result
+        if ok:
+            messagebox.showinfo("Success", success_msg, parent=root)
+            reload()
+        else:
+            messagebox.showerror("Error", f"Delete failed: {err}", parent=root)
+
     # ==================================
     # TAB 2: MANAGE CUSTOMERS
     # ==================================
@@ -84,44 +163,26 @@ def open_admin_dashboard():
     users_table_frame.pack(fill="both", expand=True, pady=10)
     
     user_cols = ("ID", "Name", "Email", "Phone", "Address")
-    user_tree = ttk.Treeview(users_table_frame, columns=user_cols, show="headings", height=25)
-    for col in user_cols:
-        user_tree.heading(col, text=col)
-        user_tree.column(col, width=150)
-    user_tree.pack(fill="both", expand=True, side="left")
-    
-    user_scroll = ttk.Scrollbar(users_table_frame, orient="vertical", command=user_tree.yview)
-    user_tree.configure(yscroll=user_scroll.set)
-    user_scroll.pack(side="right", fill="y")
-
-    def load_users():
-        for i in user_tree.get_children(): user_tree.delete(i)
-        try:
-            users = database.get_all_users() # (Pending Step U4.2)
-            for user in users:
-                user_tree.insert("", "end", values=user)
-        except Exception as e:
-            print(f"User load error (normal if DB not updated): {e}")
+    users_table = VirtualTable(users_table_frame, user_cols, database.get_users_page, executor=db,
+                               on_error=lambda e: on_load_failed("customers", e))
+    users_table.pack(fill="both", expand=True)
+    user_tree = users_table.tree
 
     user_btn_frame = tk.Frame(users_frame, bg=WHITE)
     user_btn_frame.pack(pady=10)
     
-    refresh_users_btn = styled_button(user_btn_frame, "Refresh", command=load_users, width=15)
+    refresh_users_btn = styled_button(user_btn_frame, "Refresh", command=users_table.refresh, width=15)
     refresh_users_btn.pack(side="left", padx=10)
     
     def delete_user():
-        selected = user_tree.focus()
+        selected = users_table.selected_row()
         if not selected:
             messagebox.showwarning("Error", "Please select a customer to delete.", parent=root)
             return
-        user_id = user_tree.item(selected)["values"][0]
+        user_id = selected[0]
         if messagebox.askyesno("Confirm", f"Are you sure you want to delete customer ID {user_id}? This is permanent.", parent=root):
-            try:
-                database.delete_user(user_id) # (Pending Step U4.2)
-                messagebox.showinfo("Success", "Customer deleted.", parent=root)
-                load_users()
-            except Exception as e:
-                messagebox.showerror("Error", f"Delete failed: {e}", parent=root)
+            db.submit(database.delete_user, user_id,
+                      callback=lambda result: on_deleted(result, "Customer deleted.", users_table.refresh))
 
     delete_user_btn = styled_button(user_btn_frame, "Delete Selected", command=delete_user, width=15)
     delete_user_btn.pack(side="left", padx=10)
@@ -134,44 +195,26 @@ def open_admin_dashboard():
     workers_table_frame.pack(fill="both", expand=True, pady=10)
     
     worker_cols = ("ID", "Name", "Skill", "Phone", "Rating", "Availability")
-    worker_tree = ttk.Treeview(workers_table_frame, columns=worker_cols, show="headings", height=25)
-    for col in worker_cols:
-        worker_tree.heading(col, text=col)
-        worker_tree.column(col, width=150)
-    worker_tree.pack(fill="both", expand=True, side="left")
-    
-    worker_scroll = ttk.Scrollbar(workers_table_frame, orient="vertical", command=worker_tree.yview)
-    worker_tree.configure(yscroll=worker_scroll.set)
-    worker_scroll.pack(side="right", fill="y")
-
-    def load_workers():
-        for i in worker_tree.get_children(): worker_tree.delete(i)
-        try:
-            workers = database.get_all_workers() # (Pending Step U4.2)
-            for w in workers:
-                worker_tree.insert("", "end", values=w)
-        except Exception as e:
-            print(f"Worker load error (normal if DB not updated): {e}")
+    workers_table = VirtualTable(workers_table_frame, worker_cols, database.get_workers_page, executor=db,
+                                 on_error=lambda e: on_load_failed("workers", e))
+    workers_table.pack(fill="both", expand=True)
+    worker_tree = workers_table.tree
 
     worker_btn_frame = tk.Frame(workers_frame, bg=WHITE)
     worker_btn_frame.pack(pady=10)
     
-    refresh_workers_btn = styled_button(worker_btn_frame, "Refresh", command=load_workers, width=15)
+    refresh_workers_btn = styled_button(worker_btn_frame, "Refresh", command=workers_table.refresh, width=15)
     refresh_workers_btn.pack(side="left", padx=10)
     
     def delete_worker():
-        selected = worker_tree.focus()
+        selected = workers_table.selected_row()
         if not selected:
             messagebox.showwarning("Error", "Please select a worker to delete.", parent=root)
             return
-        worker_id = worker_tree.item(selected)["values"][0]
+        worker_id = selected[0]
         if messagebox.askyesno("Confirm", f"Are you sure you want to delete worker ID {worker_id}? This is permanent.", parent=root):
-            try:
-                database.delete_worker(worker_id) # (Pending Step U4.2)
-                messagebox.showinfo("Success", "Worker deleted.", parent=root)
-                load_workers()
-            except Exception as e:
-                messagebox.showerror("Error", f"Delete failed: {e}", parent=root)
+            db.submit(database.delete_worker, worker_id,
+                      callback=lambda result: on_deleted(result, "Worker deleted.", workers_table.refresh))
 
     delete_worker_btn = styled_button(worker_btn_frame, "Delete Selected", command=delete_worker, width=15)
     delete_worker_btn.pack(side="left", padx=10)
@@ -184,33 +227,89 @@ def open_admin_dashboard():
     bookings_table_frame.pack(fill="both", expand=True, pady=10)
     
     booking_cols = ("ID", "Customer ID", "Worker ID", "Date", "Status", "Address")
-    booking_tree = ttk.Treeview(bookings_table_frame, columns=booking_cols, show="headings", height=25)
-    for col in booking_cols:
-        booking_tree.heading(col, text=col)
-        booking_tree.column(col, width=150)
-    booking_tree.pack(fill="both", expand=True, side="left")
-    
-    booking_scroll = ttk.Scrollbar(bookings_table_frame, orient="vertical", command=booking_tree.yview)
-    booking_tree.configure(yscroll=booking_scroll.set)
-    booking_scroll.pack(side="right", fill="y")
-
-    def load_bookings():
-        for i in booking_tree.get_children(): booking_tree.delete(i)
-        try:
-            bookings = database.get_all_bookings() # (Pending Step U4.2)
-            for b in bookings:
-                booking_tree.insert("", "end", values=b)
-        except Exception as e:
-            print(f"Bookings load error (normal if DB not updated): {e}")
-            
-    refresh_bookings_btn = styled_button(bookings_frame, "Refresh All Bookings", command=load_bookings, width=25)
+    bookings_table = VirtualTable(bookings_table_frame, booking_cols, database.get_bookings_page, executor=db,
+                                  on_error=lambda e: on_load_failed("bookings", e))
+    bookings_table.pack(fill="both", expand=True)
+    booking_tree = bookings_table.tree
+
+    refresh_bookings_btn = styled_button(bookings_frame, "Refresh All Bookings", command=bookings_table.refresh, width=25)
     refresh_bookings_btn.pack(pady=10)
 
+    # ==================================
+    # TAB 5: ANALYTICS (daily rollups)
+    # ==================================
+    analytics_top = tk.Frame(analytics_frame, bg=WHITE)
+    analytics_top.pack(fill="x", pady=10, padx=10)
+
+    tk.Label(analytics_top, text="Period:", font=BOLD_FONT, bg=WHITE).pack(side="left")
+    period_options = {"Last 30 days": 30, "Last 90 days": 90, "Last 365 days": 365}
+    period_var = tk.StringVar(value="Last 30 days")
+    period_dd = ttk.Combobox(analytics_top, textvariable=period_var, values=list(period_options),
+                             width=15, font=NORMAL_FONT, state="readonly")
+    period_dd.pack(side="left", padx=10)
+    period_dd.bind("<<ComboboxSelected>>", lambda e: load_analytics())
+
+    charts_frame = tk.Frame(analytics_frame, bg=WHITE)
+    charts_frame.pack(fill="both", expand=True, padx=10)
+    charts_frame.columnconfigure((0, 1), weight=1)
+
+    bookings_chart = tk.Canvas(charts_frame, bg=WHITE, width=480, height=200, highlightthickness=0)
+    bookings_chart.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+    signups_chart = tk.Canvas(charts_frame, bg=WHITE, width=480, height=200, highlightthickness=0)
+    signups_chart.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
+    ratings_chart = tk.Canvas(charts_frame, bg=WHITE, width=480, height=200, highlightthickness=0)
+    ratings_chart.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+
+    skill_status_cols = ("Skill",) + database.BOOKING_STATUSES
+    skill_status_tree = ttk.Treeview(charts_frame, columns=skill_status_cols, show="headings", height=8)
+    for col in skill_status_cols:
+        skill_status_tree.heading(col, text=col)
+        skill_status_tree.column(col, width=90)
+    skill_status_tree.grid(row=1, column=1, sticky="nsew", padx=5, pady=5)
+
+    def show_analytics(data):
+        # Fill in the days without any rows so the bars line up with dates
+        start = datetime.date.fromisoformat(data["start"])
+        end = datetime.date.fromisoformat(data["end"])
+        days = [(start + datetime.timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+        bookings = dict(data["bookings_by_day"])
+        draw_bar_chart(bookings_chart, "Bookings per day", days,
+                       [[bookings.get(day, 0) for day in days]])
+
+        signups = {day: (users, workers) for day, users, workers in data["signups_by_day"]}
+        draw_bar_chart(signups_chart, "New sign-ups per day", days,
+                       [[signups.get(day, (0, 0))[0] for day in days],
+                        [signups.get(day, (0, 0))[1] for day in days]],
+                       legend=("Customers", "Workers"))
+
+        draw_hbar_chart(ratings_chart, "Average rating per skill",
+                        [(skill, avg, f"({count} reviews)") for skill, avg, count in data["rating_by_skill"]],
+                        max_value=5)
+
+        per_skill = {}
+        for skill, status, count in data["bookings_by_skill"]:
+            per_skill.setdefault(skill, {})[status] = count
+        skill_status_tree.delete(*skill_status_tree.get_children())
+        for skill, counts in per_skill.items():
+            skill_status_tree.insert("", "end", values=(skill,) + tuple(counts.get(s, 0) for s in database.BOOKING_STATUSES))
+
+    def load_analytics():
+        db.submit(database.get_analytics, period_options[period_var.get()], callback=show_analytics,
+                  on_error=lambda e: print(f"Analytics error: {e}"))
+
+    refresh_analytics_btn = styled_button(analytics_top, "Refresh", command=load_analytics, width=12)
+    refresh_analytics_btn.pack(side="left", padx=10)
+
+    # Charts are drawn when the tab is first shown, not at startup
+    notebook.bind("<<NotebookTabChanged>>",
+                  lambda e: load_analytics() if notebook.select() == str(analytics_frame) else None)
+
     # --- Initial Load ---
     load_stats()
-    load_users()
-    load_workers()
-    load_bookings()
+    users_table.refresh()
+    workers_table.refresh()
+    bookings_table.refresh()
 
     root.mainloop()
 
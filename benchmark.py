@@ -0,0 +1,373 @@
+# benchmark.py
+# Times the public database.py functions against a seeded database
+#
+# Usage:
+#   python seed_data.py --db bench.db --workers 100000 --bookings 1000000 --messages 5000000
+#   python benchmark.py --db bench.db --output results.json
+#   python benchmark.py --db bench.db --output new.json --compare results.json
+#
+# Writes happen too (registrations, bookings, reviews, chats, deletes),
+# so always point it at a scratch copy, never the live database.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+
+import database
+from seed_data import SEED_PASSWORD, WORKER_EMAIL, CUSTOMER_EMAIL, SKILLS
+
+# Functions that are plumbing rather than something a screen waits on
+SKIPPED = {
+    "get_connection": "connection setup",
+    "get_pool": "connection setup",
+    "pooled_connection": "connection setup",
+    "close_pool": "connection setup",
+    "set_pragma_profile": "configuration",
+    "get_pragma_profile": "configuration",
+    "migrate_db": "one-off schema upgrade",
+    "connect_db": "one-off schema upgrade",
+    "export_columns": "constant lookup",
+    "gc_photos": "works on the photo directory, not the database",
+    "store_legacy_photos": "one-off copy of old uploads into the photo store",
+    "load_gazetteer": "one-off import; re-geocodes every address",
+    "geocode_all": "one-off; re-geocodes every address",
+}
+
+# ===================================================================
+# CONTEXT
+# ===================================================================
+class BenchContext:
+    """Id ranges of the seeded data plus rows created during the run."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        with database.pooled_connection() as conn:
+            cursor = conn.cursor()
+            self.max_user = cursor.execute("SELECT IFNULL(MAX(user_id), 0) FROM users").fetchone()[0]
+            self.max_worker = cursor.execute("SELECT IFNULL(MAX(worker_id), 0) FROM workers").fetchone()[0]
+            self.max_booking = cursor.execute("SELECT IFNULL(MAX(booking_id), 0) FROM bookings").fetchone()[0]
+            self.max_change = cursor.execute("SELECT IFNULL(MAX(change_id), 0) FROM change_log").fetchone()[0]
+            self.villages = cursor.execute("SELECT name, lat, lon FROM villages").fetchall() or [("Nowhere", 0.0, 0.0)]
+            last = cursor.execute("SELECT date(MAX(created_at)) FROM bookings").fetchone()[0]
+        if not (self.max_user and self.max_worker and self.max_booking):
+            raise ValueError(f"{database.DB_FILE} needs customers, workers and bookings; run seed_data.py first")
+        # "Today" for the dates the cases ask about: the end of the seeded
+        # history, so a given seed gets the same arguments on any day
+        self.today = datetime.date.fromisoformat(last) if last else datetime.date.today()
+        self.new_bookings = []   # (booking_id, customer_id, worker_id) from create_booking
+        self.booked_days = set()  # (worker_id, day) this run booked, so bookings don't clash
+        self.tag = uuid.uuid4().hex[:8]
+        self.counter = 0
+
+    def user(self):
+        return self.rng.randint(1, self.max_user)
+
+    def worker(self):
+        return self.rng.randint(1, self.max_worker)
+
+    def booking(self):
+        return self.rng.randint(1, self.max_booking)
+
+    def unique(self):
+        self.counter += 1
+        return f"bench-{self.tag}-{self.counter}"
+
+    def bench_ids(self, table, key):
+        """Ids of rows this run registered (for the delete cases)."""
+        with database.pooled_connection() as conn:
+            rows = conn.execute(f"SELECT {key} FROM {table} WHERE email LIKE ?", (f"bench-{self.tag}-%",)).fetchall()
+        return [row[0] for row in rows]
+
+# ===================================================================
+# CASES
+# ===================================================================
+# name -> (function returning (args, kwargs), iterations cap or None).
+# Cases run in this order; writes that need earlier rows come later.
+def _keyword(ctx):
+    return ctx.rng.choice(["", "", "plumb", "elec", "ramesh", "kumar", "nagar", "carp"])
+
+def _point(ctx):
+    _, lat, lon = ctx.rng.choice(ctx.villages)
+    return (lat + ctx.rng.uniform(-0.05, 0.05), lon + ctx.rng.uniform(-0.05, 0.05))
+
+def _skill(ctx):
+    return ctx.rng.choice([None, None] + list(SKILLS))
+
+def _profile_args(ctx):
+    worker_id = ctx.worker()
+    row = database.get_worker_profile(worker_id)
+    return (worker_id, row[1], row[3], row[4], row[5], row[6], row[7], row[8], row[9]), {}
+
+def _free_day(ctx, worker_id):
+    # After the seeded bookings (up to two weeks ahead), before _far_day()
+    while True:
+        day = (ctx.today + datetime.timedelta(days=ctx.rng.randint(31, 390))).isoformat()
+        if (worker_id, day) not in ctx.booked_days:
+            ctx.booked_days.add((worker_id, day))
+            return day
+
+def _create_booking_args(ctx):
+    worker_id = ctx.worker()
+    return (ctx.user(), worker_id, _free_day(ctx, worker_id), "Bench address"), {}
+
+def _delete_args(ctx, table, key):
+    """A row this run registered, first given a completed, reviewed booking.
+
+    Deleting it then also runs the ON DELETE SET NULL actions on bookings
+    and reviews, and the triggers those fire, like a real account would.
+    """
+    row_id = ctx.bench_ids(table, key)[0]
+    customer_id, worker_id = (row_id, ctx.worker()) if table == "users" else (ctx.user(), row_id)
+    ok, booking_id = database.create_booking(customer_id, worker_id, _free_day(ctx, worker_id), "Bench address")
+    if not ok:
+        raise RuntimeError(f"setup for {table} delete failed: {booking_id}")
+    database.update_booking_status(booking_id, "Completed")
+    database.add_review(booking_id, customer_id, worker_id, 4, "Bench review")
+    return (row_id,), {}
+
+def _service_day(ctx):
+    return (ctx.today + datetime.timedelta(days=ctx.rng.randint(0, 14))).isoformat()
+
+def _far_day(ctx):
+    # Past anything seeded or booked by the run, so blocking can't be refused
+    return (ctx.today + datetime.timedelta(days=ctx.rng.randint(400, 700))).isoformat()
+
+def _add_review_args(ctx):
+    booking_id, customer_id, worker_id = ctx.new_bookings.pop()
+    return (booking_id, customer_id, worker_id, ctx.rng.randint(1, 5), "Bench review"), {}
+
+CASES = [
+    # ---- login ----
+    ("verify_customer", lambda c: ((CUSTOMER_EMAIL.format(c.user()), SEED_PASSWORD), {}), None),
+    ("verify_worker", lambda c: ((WORKER_EMAIL.format(c.worker()), SEED_PASSWORD), {}), None),
+    ("verify_admin", lambda c: (("admin", "admin123"), {}), None),
+    ("hash_password", lambda c: ((c.unique(),), {}), None),
+    # ---- profiles and search ----
+    ("get_customer_details", lambda c: ((c.user(),), {}), None),
+    ("get_worker_profile", lambda c: ((c.worker(),), {}), None),
+    ("get_worker_list_for_search", lambda c: ((), {}), 5),
+    ("search_workers", lambda c: ((), {"keyword": _keyword(c), "skill": _skill(c)}), 20),
+    ("search_workers_page", lambda c: ((), {"keyword": _keyword(c), "skill": _skill(c)}), None),
+    ("find_nearest_workers", lambda c: ((_point(c),), {"skill": _skill(c)}), None),
+    ("geocode_address", lambda c: ((f"Ward 1, {c.rng.choice(c.villages)[0]}",), {}), None),
+    ("find_free_workers", lambda c: ((_service_day(c),), {"skill": _skill(c)}), None),
+    # ---- bookings, reviews, chat ----
+    ("get_bookings_by_customer", lambda c: ((c.user(),), {}), None),
+    ("get_customer_bookings_with_reviews", lambda c: ((c.user(),), {}), None),
+    ("get_bookings_by_worker", lambda c: ((c.worker(),), {}), None),
+    ("check_if_reviewed", lambda c: ((c.booking(),), {}), None),
+    ("is_worker_free", lambda c: ((c.worker(), _service_day(c)), {}), None),
+    ("get_worker_calendar", lambda c: ((c.worker(), c.today.isoformat()), {}), None),
+    ("get_messages", lambda c: ((c.booking(),), {}), None),
+    ("get_messages_since", lambda c: ((c.booking(), 0), {}), None),
+    # ---- change feed ----
+    ("get_change_token", lambda c: ((f"worker:{c.worker()}",), {}), None),
+    ("has_changes_since", lambda c: ((c.max_change, "workers"), {}), None),
+    ("get_changes_since", lambda c: ((max(0, c.max_change - 500),), {}), None),
+    # ---- admin ----
+    ("get_app_stats", lambda c: ((), {}), None),
+    ("get_users_page", lambda c: ((c.rng.randint(0, c.max_user), 200), {}), None),
+    ("get_workers_page", lambda c: ((c.rng.randint(0, c.max_worker), 200), {}), None),
+    ("get_bookings_page", lambda c: ((c.rng.randint(0, c.max_booking), 200), {}), None),
+    ("get_all_users", lambda c: ((), {}), 3),
+    ("get_all_workers", lambda c: ((), {}), 3),
+    ("get_all_bookings", lambda c: ((), {}), 3),
+    ("get_analytics", lambda c: ((c.rng.choice([30, 90, 365]),), {}), None),
+    ("check_rating_consistency", lambda c: ((), {}), 3),
+    ("iter_export_rows", lambda c: (("bookings",), {"start": (c.today - datetime.timedelta(days=7)).isoformat()}), 5),
+    ("get_schema_version", lambda c: ((), {}), None),
+    ("get_active_pragmas", lambda c: ((), {}), None),
+    ("get_pool_stats", lambda c: ((), {}), None),
+    # ---- writes ----
+    ("register_customer", lambda c: ((c.unique(), c.unique() + "@bench.test", "9000000000", SEED_PASSWORD), {}), None),
+    ("register_worker", lambda c: ((c.unique(), c.unique() + "@bench.test", "8000000000", SEED_PASSWORD,
+                                    c.rng.choice(list(SKILLS)), 5, 300.0, "Available", "Bench address", None), {}), None),
+    ("bulk_insert", lambda c: (("users", [{"name": "Bulk", "email": c.unique() + "@bench.test", "phone": "9",
+                                           "password": "x", "address": "", "created_at": None} for _ in range(1000)]), {}), 5),
+    ("update_worker_profile", _profile_args, None),
+    ("create_booking", _create_booking_args, None),
+    ("update_booking_status", lambda c: ((c.new_bookings[-1][0] if c.new_bookings else c.booking(), "Completed"), {}), None),
+    ("add_review", _add_review_args, None),
+    ("block_days", lambda c: ((c.worker(), _far_day(c)), {}), None),
+    ("unblock_days", lambda c: ((c.worker(), _far_day(c)), {}), None),
+    ("send_message", lambda c: ((c.booking(), c.user(), "customer", "Bench message"), {}), None),
+    ("refresh_rollups", lambda c: ((), {}), None),
+    ("rebuild_app_stats", lambda c: ((), {}), 3),
+    ("rebuild_rollups", lambda c: ((), {}), 3),
+    ("prune_change_log", lambda c: ((), {}), 3),
+    ("delete_user", lambda c: _delete_args(c, "users", "user_id"), None),
+    ("delete_worker", lambda c: _delete_args(c, "workers", "worker_id"), None),
+]
+
+# ===================================================================
+# RUNNER
+# ===================================================================
+def _row_count(result):
+    """Rows a call returned, for rows/s; None when that isn't meaningful."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return None
+
+def _failure(result):
+    """The error of an (ok, error) result that reports failure, else None."""
+    if isinstance(result, tuple) and len(result) == 2 and result[0] is False:
+        return str(result[1])
+    return None
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def run_case(ctx, name, make_args, iterations):
+    func = getattr(database, name)
+    times, rows, failed, first_error = [], 0, 0, None
+    for _ in range(iterations):
+        args, kwargs = make_args(ctx)
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        if name == "iter_export_rows":
+            result = list(result)
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        error = _failure(result)
+        if error is not None:
+            failed += 1
+            first_error = first_error or error
+        if name == "create_booking" and result[0]:
+            ctx.new_bookings.append((result[1], args[0], args[1]))
+        count = _row_count(result)
+        if count is not None:
+            rows += count
+    times.sort()
+    total = sum(times)
+    return {
+        "calls": len(times),
+        "mean_ms": round(total / len(times) * 1000, 3),
+        "p50_ms": round(_percentile(times, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(times, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(times, 0.99) * 1000, 3),
+        "max_ms": round(times[-1] * 1000, 3),
+        "rows_per_s": round(rows / total, 1) if rows and total else None,
+        "failed": failed,
+        "first_error": first_error,
+    }
+
+def _metadata(seed, iterations):
+    with database.pooled_connection() as conn:
+        messages = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    stats = database.get_app_stats()
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "db_file": database.DB_FILE,
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "pragma_profile": database.PRAGMA_PROFILE,
+        "seed": seed,
+        "iterations": iterations,
+        "scale": {"users": stats["users"], "workers": stats["workers"], "bookings": stats["bookings"],
+                  "reviews": stats["reviews"], "messages": messages},
+    }
+
+def run_benchmark(iterations=200, seed=1, only=None, progress=print):
+    """Runs every case (or those named in `only`). Returns the results dict."""
+    database.connect_db()
+    ctx = BenchContext(random.Random(seed))
+    meta = _metadata(seed, iterations)
+    results = {}
+    for name, make_args, cap in CASES:
+        if only and name not in only:
+            continue
+        count = min(iterations, cap) if cap else iterations
+        if name == "add_review":
+            count = min(count, len(ctx.new_bookings))
+        elif name in ("delete_user", "delete_worker"):
+            count = min(count, len(ctx.bench_ids("users" if name == "delete_user" else "workers",
+                                                 "user_id" if name == "delete_user" else "worker_id")))
+        if count == 0:
+            continue
+        results[name] = run_case(ctx, name, make_args, count)
+        r = results[name]
+        progress(f"  {name:<36} p50 {r['p50_ms']:>9.3f} ms  p95 {r['p95_ms']:>9.3f} ms  p99 {r['p99_ms']:>9.3f} ms"
+                 + (f"  FAILED {r['failed']}/{r['calls']}: {r['first_error']}" if r["failed"] else ""))
+
+    covered = {name for name, _, _ in CASES}
+    public = sorted(n for n, v in vars(database).items()
+                    if callable(v) and not n.startswith("_") and getattr(v, "__module__", None) == "database"
+                    and not isinstance(v, type))
+    return {
+        "meta": meta,
+        "results": results,
+        "failed": {name: r["failed"] for name, r in results.items() if r["failed"]},
+        "skipped": {n: SKIPPED.get(n, "no benchmark case yet") for n in public if n not in covered},
+    }
+
+def compare(current, baseline):
+    """Prints p50/p95 against a previous results file."""
+    print(f"\n{'function':<36} {'p50 old':>10} {'p50 new':>10} {'change':>8}   {'p95 old':>10} {'p95 new':>10} {'change':>8}")
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:>10.3f} {new[key]:>10.3f} {change:>+7.0f}%")
+        print(f"{name:<36} " + "   ".join(cells))
+
+# ===================================================================
+# COMMAND LINE
+# ===================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark database.py against a seeded database.")
+    parser.add_argument("--db", default="bench.db", help="seeded scratch database (default: bench.db)")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per function (heavy ones are capped)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", metavar="FUNCTION", help="benchmark just these functions")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="previous results to compare against")
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.abspath(database.DB_FILE):
+        parser.error(f"refusing to benchmark the live database {database.DB_FILE}")
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found; create it with seed_data.py")
+    database.DB_FILE = args.db
+
+    try:
+        report = run_benchmark(args.iterations, args.seed, args.only)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if report["skipped"]:
+        print("Not benchmarked: " + ", ".join(sorted(report["skipped"])))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    if report["failed"]:
+        # A failing call is usually fast, so its timings would look like a win
+        print("Calls returned errors: " + ", ".join(f"{n} ({c})" for n, c in sorted(report["failed"].items())))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# bulk_import.py
+# Bulk import of customers and workers from CSV / JSONL files
+#
+# Usage:
+#   python bulk_import.py customers villagers.csv
+#   python bulk_import.py workers workers.jsonl --rejects rejected.csv
+
+import argparse
+import csv
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+
+import database
+
+BATCH_SIZE = 2000
+
+# Header spellings seen in the onboarding spreadsheets -> column name
+FIELD_ALIASES = {
+    "full_name": "name",
+    "mobile": "phone",
+    "phone_number": "phone",
+    "pwd": "password",
+    "exp": "experience",
+    "experience_years": "experience",
+    "price": "price_per_hour",
+    "rate": "price_per_hour",
+}
+
+# ===================================================================
+# READING
+# ===================================================================
+@functools.lru_cache(maxsize=256)
+def _normalize_key(key):
+    key = (key or "").strip().lower().replace(" ", "_").replace("-", "_")
+    return FIELD_ALIASES.get(key, key)
+
+def read_records(path, fmt=None):
+    """Yields (line_number, record_dict) one at a time, never the whole file.
+
+    fmt is "csv" or "jsonl"; by default it comes from the file extension.
+    Lines that can't be parsed are yielded with an "_error" key.
+    """
+    fmt = fmt or ("jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".json", ".ndjson") else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = [_normalize_key(k) for k in next(reader, [])]
+            for values in reader:
+                if not any(values):
+                    continue
+                yield reader.line_num, {k: v.strip() for k, v in zip(header, values) if k}
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("not an object")
+                except ValueError as e:
+                    yield line_no, {"_error": f"Invalid JSON: {e}"}
+                    continue
+                yield line_no, {_normalize_key(k): str(v).strip() if v is not None else "" for k, v in record.items()}
+
+# ===================================================================
+# VALIDATION
+# ===================================================================
+# Same rules as the registration forms. Each returns (row, None) or
+# (None, reason); the password is still plain text at this point.
+def _validate_common(record):
+    if "_error" in record:
+        return None, record["_error"]
+    name = record.get("name", "")
+    email = record.get("email", "").lower()
+    phone = record.get("phone", "")
+    password = record.get("password", "")
+    if not name or not password or (not email and not phone):
+        return None, "Name, Password, and either Email or Phone are required"
+    if email and "@" not in email:
+        return None, f"Invalid email: {email}"
+    return {
+        "name": name,
+        # Blank emails are stored as NULL so they don't collide on UNIQUE
+        "email": email or None,
+        "phone": phone,
+        "password": password,
+        "address": record.get("address", ""),
+    }, None
+
+def validate_customer(record):
+    return _validate_common(record)
+
+def validate_worker(record):
+    row, err = _validate_common(record)
+    if err:
+        return None, err
+    try:
+        row["experience"] = int(record.get("experience") or 0)
+        row["price_per_hour"] = float(record.get("price_per_hour") or 0.0)
+    except ValueError:
+        return None, "Experience and Price must be valid numbers"
+    row["skill"] = record.get("skill", "")
+    row["availability"] = record.get("availability") or "Available"
+    row["photo"] = None
+    return row, None
+
+IMPORT_KINDS = {
+    "customers": ("users", validate_customer),
+    "workers": ("workers", validate_worker),
+}
+
+# ===================================================================
+# IMPORT
+# ===================================================================
+def _flush(table, batch, result):
+    """Hashes and inserts one batch in a single transaction."""
+    created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    for _, row in batch:
+        row["password"] = database.hash_password(row["password"])
+        row["created_at"] = created
+        rows.append(row)
+    inserted, rejected = database.bulk_insert(table, rows)
+    result["inserted"] += inserted
+    for index, reason in rejected:
+        line_no, row = batch[index]
+        result["rejected"].append((line_no, row.get("email") or row.get("phone"), reason))
+
+def import_file(kind, path, fmt=None, batch_size=BATCH_SIZE, on_progress=None):
+    """Imports a customers or workers file.
+
+    Returns {"inserted": n, "rejected": [(line_number, email_or_phone, reason)]}.
+    on_progress(result), if given, is called after every batch.
+    """
+    table, validate = IMPORT_KINDS[kind]
+    database.connect_db()
+    result = {"inserted": 0, "rejected": []}
+    seen_emails = set()
+    batch = []
+
+    for line_no, record in read_records(path, fmt):
+        row, err = validate(record)
+        if err is None and row["email"]:
+            if row["email"] in seen_emails:
+                err = "Duplicate email in file"
+            else:
+                seen_emails.add(row["email"])
+        if err:
+            result["rejected"].append((line_no, record.get("email") or record.get("phone"), err))
+            continue
+
+        batch.append((line_no, row))
+        if len(batch) >= batch_size:
+            _flush(table, batch, result)
+            batch = []
+            if on_progress:
+                on_progress(result)
+
+    if batch:
+        _flush(table, batch, result)
+        if on_progress:
+            on_progress(result)
+    return result
+
+def write_rejects(rejected, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "email_or_phone", "reason"])
+        writer.writerows(rejected)
+
+# ===================================================================
+# COMMAND LINE
+# ===================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import customers or workers.")
+    parser.add_argument("kind", choices=sorted(IMPORT_KINDS))
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--rejects", help="write rejected rows to this CSV file")
+    parser.add_argument("--db", help=f"database file (default: {database.DB_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_FILE = args.db
+
+    start = time.perf_counter()
+    result = import_file(args.kind, args.path, args.format, args.batch_size,
+                         on_progress=lambda r: print(f"  {r['inserted']} imported, {len(r['rejected'])} rejected", end="\r", flush=True))
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"Imported {result['inserted']} {args.kind} in {elapsed:.1f}s, rejected {len(result['rejected'])}.")
+    if args.rejects:
+        write_rejects(result["rejected"], args.rejects)
+        print(f"Rejected rows written to {args.rejects}")
+    else:
+        for line_no, who, reason in result["rejected"][:20]:
+            print(f"  line {line_no}: {who}: {reason}")
+        if len(result["rejected"]) > 20:
+            print(f"  ... {len(result['rejected']) - 20} more (use --rejects FILE to save them all)")
+    return 0 if result["inserted"] or not result["rejected"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
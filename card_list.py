@@ -0,0 +1,143 @@
+# card_list.py
+# Virtual-scrolling list of cards that recycles a fixed set of widgets (Tkinter)
+
+import tkinter as tk
+from tkinter import ttk
+
+from ui_style import SUBTITLE_FONT, TEXT_LIGHT
+
+# ===================================================================
+# VIRTUAL CARD LIST
+# ===================================================================
+class VirtualCardList(tk.Frame):
+    """A scrollable column of equal-height cards, only the visible ones built.
+
+    make_card(parent) builds one empty card widget and bind_card(card, row)
+    fills it with a row; the list creates just enough cards to cover the
+    viewport (plus one) and, as the user scrolls, moves them and binds
+    the newly visible rows into them. Widget count therefore depends on
+    the window height, not on how many rows there are. A card is only
+    rebound when the row it shows changes.
+
+    on_near_end (optional) is called when the view reaches the last 10%,
+    so pages can be appended with append_rows().
+    """
+
+    def __init__(self, parent, make_card, bind_card, card_height=150, gap=16,
+                 on_near_end=None, empty_text="Nothing to show."):
+        super().__init__(parent, bg=parent.cget("bg"))
+        self.make_card = make_card
+        self.bind_card = bind_card
+        self.card_height = card_height
+        self.gap = gap
+        self.on_near_end = on_near_end
+
+        self.rows = []
+        self.top_px = 0          # scroll offset in pixels
+        self._version = 0        # bumped by set_rows(), so every card rebinds
+        self._cards = []         # [card, canvas window id, (version, row index) shown]
+        self._view_w = 1
+        self._view_h = 1
+
+        self.canvas = tk.Canvas(self, bg=self.cget("bg"), highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self._empty = self.canvas.create_text(0, 50, text=empty_text, anchor="n", state="hidden",
+                                              font=SUBTITLE_FONT, fill=TEXT_LIGHT)
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self._bind_wheel(self.canvas)
+
+    # ---------- Public ----------
+    def set_rows(self, rows):
+        """Replaces the rows and scrolls back to the top."""
+        self.rows = list(rows)
+        self._version += 1
+        self.top_px = 0
+        self._render()
+
+    def append_rows(self, rows):
+        """Adds rows at the end, keeping the scroll position."""
+        self.rows.extend(rows)
+        self._render()
+
+    def scroll_to(self, y):
+        self.top_px = int(y)
+        self._render()
+
+    def card_count(self):
+        return len(self._cards)
+
+    # ---------- Pool ----------
+    def _content_height(self):
+        return len(self.rows) * self.card_height
+
+    def _max_top(self):
+        return max(0, self._content_height() - self._view_h)
+
+    def _ensure_cards(self):
+        # Enough cards to cover the viewport even when it is cut mid-card
+        needed = self._view_h // self.card_height + 2
+        while len(self._cards) < needed:
+            card = self.make_card(self.canvas)
+            self._bind_wheel(card)
+            item = self.canvas.create_window(0, -self.card_height * 2, window=card, anchor="nw",
+                                             width=self._card_width(), height=self.card_height - self.gap)
+            self._cards.append([card, item, None])
+
+    def _card_width(self):
+        return max(1, self._view_w - 40)
+
+    def _render(self):
+        self._ensure_cards()
+        self.top_px = max(0, min(self.top_px, self._max_top()))
+        first = self.top_px // self.card_height
+        for slot, entry in enumerate(self._cards):
+            card, item, shown = entry
+            row_index = first + slot
+            if row_index >= len(self.rows):
+                # Parked above the view until a row needs it
+                self.canvas.coords(item, 20, -self.card_height * 2)
+                continue
+            if shown != (self._version, row_index):
+                self.bind_card(card, self.rows[row_index])
+                entry[2] = (self._version, row_index)
+            self.canvas.coords(item, 20, row_index * self.card_height - self.top_px + self.gap // 2)
+
+        self.canvas.itemconfigure(self._empty, state="normal" if not self.rows else "hidden")
+        total = self._content_height()
+        if total <= self._view_h:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top_px / total, (self.top_px + self._view_h) / total)
+        # Also fires when a short page doesn't fill the view, so paging continues
+        if self.on_near_end and self.rows and self.top_px + self._view_h >= 0.9 * total:
+            self.on_near_end()
+
+    # ---------- Events ----------
+    def _on_configure(self, event):
+        self._view_w, self._view_h = event.width, event.height
+        self.canvas.coords(self._empty, event.width // 2, 50)
+        self._ensure_cards()
+        for _, item, _ in self._cards:
+            self.canvas.itemconfigure(item, width=self._card_width())
+        self.scroll_to(self.top_px)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self._content_height())
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.scroll_to(self.top_px + step * (self._view_h if args[2] == "pages" else self.card_height // 3))
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.top_px + (-1 if event.delta > 0 else 1) * self.card_height // 2)
+        return "break"
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_mousewheel)
+        widget.bind("<Button-4>", lambda e: self.scroll_to(self.top_px - self.card_height // 2))
+        widget.bind("<Button-5>", lambda e: self.scroll_to(self.top_px + self.card_height // 2))
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
@@ -3,8 +3,10 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import database
+from db_client import database
 from ui_style import *
+from db_executor import DatabaseExecutor
+from ui_profile import profiled
 
 # ===================================================================
 # CHAT WINDOW
@@ -20,6 +22,8 @@ def open_chat_window(parent_root, booking_id, current_user_id, current_user_type
     win.transient(parent_root)
     win.grab_set()
 
+    db = DatabaseExecutor(win)
+
     # --- Header ---
     title = title_label(win, f"Chat: {recipient_name}")
     title.pack(side="top", pady=(15, 5)) # <-- LAYOUT FIX
@@ -39,13 +43,15 @@ def open_chat_window(parent_root, booking_id, current_user_id, current_user_type
         if not msg:
             return
             
-        ok, err = database.send_message(booking_id, current_user_id, current_user_type, msg)
-        
-        if ok:
-            msg_entry.delete(0, tk.END)
-            load_messages() # Refresh chat
-        else:
-            messagebox.showerror("Error", f"Could not send message: {err}", parent=win)
+        def on_sent(result):
+            ok, err = result
+            if ok:
+                msg_entry.delete(0, tk.END)
+                load_messages(follow=True) # Append the new message
+            else:
+                messagebox.showerror("Error", f"Could not send message: {err}", parent=win)
+
+        db.submit(database.send_message, booking_id, current_user_id, current_user_type, msg, callback=on_sent)
 
     send_btn = styled_button(input_frame, "Send", command=send_new_message, width=10)
     send_btn.pack(side="right", padx=(10, 0))
@@ -82,14 +88,28 @@ def open_chat_window(parent_root, booking_id, current_user_id, current_user_type
     scrollbar.pack(side="right", fill="y")
     chat_history.pack(side="left", fill="both", expand=True)
 
-    # --- Load Messages ---
-    def load_messages():
+    # --- Load Messages (appends only messages we haven't shown yet) ---
+    last_message_id = 0
+
+    @profiled
+    def load_messages(follow=False):
+        db.submit(database.get_messages_since, booking_id, last_message_id,
+                  callback=lambda messages: append_messages(messages, follow))
+
+    @profiled
+    def append_messages(messages, follow=False):
+        nonlocal last_message_id
+        # A load that overlapped an earlier one may repeat messages
+        messages = [m for m in messages if m[0] > last_message_id]
+        if not messages:
+            return
+
+        # Only follow new messages if the user was already at the bottom
+        at_bottom = follow or chat_history.yview()[1] >= 0.999
         chat_history.config(state="normal")
-        chat_history.delete("1.0", tk.END)
-        
-        messages = database.get_messages(booking_id)
         
-        for (sender_id, sender_type, message, timestamp) in messages:
+        for (message_id, sender_id, sender_type, message, timestamp) in messages:
+            last_message_id = message_id
             if sender_type == current_user_type:
                 chat_history.insert(tk.END, f"{message}\n", "user_msg")
                 chat_history.insert(tk.END, f"{timestamp}\n\n", "timestamp")
@@ -98,13 +118,24 @@ def open_chat_window(parent_root, booking_id, current_user_id, current_user_type
                 chat_history.insert(tk.END, f"{timestamp}\n\n", "timestamp_other")
         
         chat_history.config(state="disabled")
-        chat_history.see(tk.END) # Auto-scroll to bottom
+        if at_bottom:
+            chat_history.see(tk.END) # Auto-scroll to bottom
+
+    # --- Auto-Refresh (only when the change feed shows new messages) ---
+    change_scope = f"booking:{booking_id}"
+    change_token = 0
+
+    def on_token(token):
+        nonlocal change_token
+        if token > change_token:
+            change_token = token
+            load_messages()
 
-    # --- Auto-Refresh ---
     def auto_refresh_chat():
         if not win.winfo_exists():
             return
-        load_messages()
+        # Runs in the background; messages are only fetched when the token moved
+        db.submit(database.get_change_token, change_scope, callback=on_token, key="poll")
         win.task_id = win.after(5000, auto_refresh_chat) # Refresh every 5 seconds
 
     load_messages() # Initial load
@@ -113,6 +144,7 @@ def open_chat_window(parent_root, booking_id, current_user_id, current_user_type
     def on_close():
         if hasattr(win, 'task_id'):
             win.after_cancel(win.task_id)
+        db.close()
         win.destroy()
     
     win.protocol("WM_DELETE_WINDOW", on_close)
\ No newline at end of file
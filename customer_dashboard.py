@@ -3,12 +3,19 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-import database
+from db_client import database
 import os
 import datetime
 from ui_style import *
 from chat_window import open_chat_window # <-- U3 IMPORT
+from db_executor import DatabaseExecutor
+from image_cache import ImageCache
+from card_list import VirtualCardList
+from search_cache import SearchCache, normalize_search, SEARCH_DEBOUNCE_MS
+import ui_profile
+from ui_profile import profiled
+
+DISTANCE_CHOICES_KM = (2, 5, 10, 25, 50)
 
 # Ensure DB exists (runs once on import)
 database.connect_db()
@@ -36,6 +43,15 @@ def open_customer_dashboard(user_id, user_name):
     y = (root.winfo_screenheight() // 2) - (h // 2)
     root.geometry(f"{w}x{h}+{x}+{y}")
 
+    # All database calls run in the background; results come back via after()
+    db = DatabaseExecutor(root)
+
+    def on_root_close():
+        cancel_search_jobs()
+        db.close()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", on_root_close)
+
     # --- Header ---
     title = title_label(root, f"Welcome, {user_name}")
     title.pack(pady=(20, 5))
@@ -64,6 +80,16 @@ def open_customer_dashboard(user_id, user_name):
     avail_dd.current(0)
     avail_dd.grid(row=0, column=5, padx=5)
 
+    # "Within" needs the customer's village in the gazetteer
+    tk.Label(top_frame, text="Within:", bg=SECONDARY, font=BOLD_FONT).grid(row=1, column=0, padx=(10,5), pady=(0,15))
+    distance_var = tk.StringVar(value="Any distance")
+    distance_dd = ttk.Combobox(top_frame, textvariable=distance_var, width=15, font=NORMAL_FONT, state="readonly")
+    distance_dd["values"] = ["Any distance"] + [f"{km} km" for km in DISTANCE_CHOICES_KM]
+    distance_dd.current(0)
+    distance_dd.grid(row=1, column=1, sticky="w", padx=5, pady=(0,15))
+    if customer_details.get("lat") is None:
+        distance_dd.configure(state="disabled")
+
     search_btn = styled_button(top_frame, "Search", command=lambda: do_search(), width=12)
     search_btn.grid(row=0, column=6, padx=10)
 
@@ -71,6 +97,8 @@ def open_customer_dashboard(user_id, user_name):
     bookings_btn.grid(row=0, column=7, padx=10)
     
     def logout():
+        cancel_search_jobs()
+        db.close()
         root.destroy()
         import login 
         login.open_login_window()
@@ -79,76 +107,183 @@ def open_customer_dashboard(user_id, user_name):
     logout_btn.grid(row=0, column=8, padx=10)
     logout_btn.configure(bg="#C0392B", activebackground="#A93226") 
 
-    # --- Worker Cards Area (Scrollable) ---
-    worker_list_frame = scrollable_frame(root)
-    
-    image_refs = {}
+    # --- Worker Cards Area (virtual: a few recycled cards, more pages load near the bottom) ---
+    image_cache = ImageCache()
+    search_state = {"filters": None, "page_token": None, "done": True, "pending": False, "generation": 0}
+    search_jobs = {"debounce": None, "poll": None}
+    # Pages already fetched, until the workers table changes (polled below)
+    search_cache = SearchCache()
+    ui_profile.register_stats("worker search cache", search_cache.stats)
 
     def load_image(path, size=(100, 100)):
-        if path and os.path.exists(path):
-            try:
-                img = Image.open(path)
-                img = img.resize(size, Image.LANCZOS)
-                return ImageTk.PhotoImage(img)
-            except Exception as e:
-                print(f"Error loading image {path}: {e}")
-                return None
-        return None
-
-    def populate_cards(rows):
-        for widget in worker_list_frame.winfo_children():
-            widget.destroy()
-
-        if not rows:
-            tk.Label(worker_list_frame, text="No workers found matching your criteria.", font=SUBTITLE_FONT, bg=WHITE, fg=TEXT_LIGHT).pack(pady=50)
-            return
-
-        for idx, row in enumerate(rows):
-            wid, name, skill, price, avail, photo_path, rating, address = row
-            
-            card = tk.Frame(worker_list_frame, bg=WHITE, highlightbackground=CARD_SHADOW, highlightthickness=1)
-            card.pack(fill="x", padx=20, pady=8)
-
-            img = load_image(photo_path)
-            image_refs[wid] = img
-            
-            photo_lbl = tk.Label(card, image=img, bg=WHITE, width=100, height=100)
-            if img is None:
-                photo_lbl.config(text="No Pic", font=NORMAL_FONT, fg=TEXT_LIGHT, relief="solid", bd=1, width=12, height=6)
-            photo_lbl.grid(row=0, column=0, rowspan=4, padx=15, pady=15)
-
-            tk.Label(card, text=name, font=SUBTITLE_FONT, bg=WHITE, fg=TEXT_DARK).grid(row=0, column=1, sticky="w", pady=(10,0))
-            tk.Label(card, text=f"Skill: {skill}", font=NORMAL_FONT, bg=WHITE, fg=TEXT_LIGHT).grid(row=1, column=1, sticky="w")
-            tk.Label(card, text=f"Address: {address}", font=NORMAL_FONT, bg=WHITE, fg=TEXT_LIGHT).grid(row=2, column=1, sticky="w")
-            
-            price_rating_frame = tk.Frame(card, bg=WHITE)
-            price_rating_frame.grid(row=3, column=1, sticky="w", pady=(0,10))
+        # Re-rendering the same workers reuses the already resized photos
+        return image_cache.get(path, size)
+
+    def make_card(parent):
+        # Built once per slot; bind_card() fills it with whichever worker it shows
+        card = tk.Frame(parent, bg=WHITE, highlightbackground=CARD_SHADOW, highlightthickness=1)
+        card.photo_lbl = tk.Label(card, bg=WHITE)
+        card.photo_lbl.grid(row=0, column=0, rowspan=4, padx=15, pady=15)
+
+        card.name_lbl = tk.Label(card, font=SUBTITLE_FONT, bg=WHITE, fg=TEXT_DARK)
+        card.name_lbl.grid(row=0, column=1, sticky="w", pady=(10,0))
+        card.skill_lbl = tk.Label(card, font=NORMAL_FONT, bg=WHITE, fg=TEXT_LIGHT)
+        card.skill_lbl.grid(row=1, column=1, sticky="w")
+        card.address_lbl = tk.Label(card, font=NORMAL_FONT, bg=WHITE, fg=TEXT_LIGHT)
+        card.address_lbl.grid(row=2, column=1, sticky="w")
+
+        price_rating_frame = tk.Frame(card, bg=WHITE)
+        price_rating_frame.grid(row=3, column=1, sticky="w", pady=(0,10))
+        card.price_lbl = tk.Label(price_rating_frame, font=BOLD_FONT, bg=WHITE, fg=PRIMARY)
+        card.price_lbl.pack(side="left")
+        card.rating_lbl = tk.Label(price_rating_frame, font=BOLD_FONT, bg=WHITE, fg="#FBBC04")
+        card.rating_lbl.pack(side="left", padx=10)
+
+        btn_frame = tk.Frame(card, bg=WHITE)
+        btn_frame.grid(row=0, column=2, rowspan=4, padx=20)
+
+        card.worker_id = None
+        hire_btn = styled_button(btn_frame, "Hire Now",
+                                 command=lambda: make_hire_now(card.worker_id, user_id, customer_details["address"])(),
+                                 width=12)
+        hire_btn.pack(pady=5)
+
+        profile_btn = styled_button(btn_frame, "View Profile", command=lambda: make_view_profile(card.worker_id)(), width=12)
+        profile_btn.pack(pady=5)
+        return card
+
+    def bind_card(card, row):
+        wid, name, skill, price, avail, photo_path, rating, address = row
+        card.worker_id = wid
+
+        img = load_image(photo_path)
+        card.photo = img     # the cache may evict it; the card keeps it alive while shown
+        if img is None:
+            card.photo_lbl.config(image="", text="No Pic", font=NORMAL_FONT, fg=TEXT_LIGHT, relief="solid", bd=1, width=12, height=6)
+        else:
+            card.photo_lbl.config(image=img, text="", relief="flat", bd=0, width=100, height=100)
+
+        card.name_lbl.config(text=name)
+        card.skill_lbl.config(text=f"Skill: {skill}")
+        card.address_lbl.config(text=f"Address: {address}")
+        card.price_lbl.config(text=f"₹{price}/hr")
+        card.rating_lbl.config(text=f"• ⭐ {rating:.1f} Rating")
+
+    worker_list = VirtualCardList(root, make_card, bind_card, card_height=148, gap=16,
+                                  on_near_end=lambda: schedule_next_page(),
+                                  empty_text="No workers found matching your criteria.")
+    worker_list.pack(fill="both", expand=True)
+
+    @profiled
+    def populate_cards(rows, append=False):
+        if append:
+            worker_list.append_rows(rows)
+        else:
+            worker_list.set_rows(rows)
             
-            tk.Label(price_rating_frame, text=f"₹{price}/hr", font=BOLD_FONT, bg=WHITE, fg=PRIMARY).pack(side="left")
-            tk.Label(price_rating_frame, text=f"• ⭐ {rating:.1f} Rating", font=BOLD_FONT, bg=WHITE, fg="#FBBC04").pack(side="left", padx=10)
-
-            btn_frame = tk.Frame(card, bg=WHITE)
-            btn_frame.grid(row=0, column=2, rowspan=4, padx=20)
-            
-            hire_btn = styled_button(btn_frame, "Hire Now", 
-                                     command=make_hire_now(wid, user_id, customer_details["address"]), 
-                                     width=12)
-            hire_btn.pack(pady=5)
-            
-            profile_btn = styled_button(btn_frame, "View Profile", command=make_view_profile(wid), width=12)
-            profile_btn.pack(pady=5)
-            
-    def do_search():
-        kw = search_entry.get().strip()
-        skill = skill_var.get()
-        avail = avail_var.get()
-        
-        results = database.search_workers(keyword=kw, skill=skill, availability=avail)
-        populate_cards(results)
+    def on_page(generation, result, first_page):
+        # Results from a search the user has since replaced are ignored
+        if generation != search_state["generation"]:
+            return
+        rows, next_token = result
+        search_state["page_token"] = next_token
+        search_state["done"] = next_token is None
+        search_state["pending"] = False
+        populate_cards(rows, append=not first_page)
+
+    def on_page_error(generation, error):
+        if generation != search_state["generation"]:
+            return
+        # Stop paging this search (a retry would fire again on the next
+        # render); searching again starts over
+        search_state["pending"] = False
+        search_state["done"] = True
+        messagebox.showerror("Search Error", f"Could not load workers: {error}", parent=root)
+
+    def fetch_page(filters, page_token, callback, on_error=None):
+        # A cached page comes back straight away, without touching SQLite
+        key = SearchCache.key(filters, page_token)
+        page = search_cache.get(key)
+        if page is not None:
+            callback(page)
+            return
+        token = search_cache.token
+
+        def on_fetched(result):
+            search_cache.put(key, result, token)
+            callback(result)
+        filters = dict(filters)
+        radius_km = filters.pop("radius_km")
+        if radius_km:
+            # Nearest first, one page of up to NEAREST_LIMIT workers
+            db.submit(database.search_workers, near=(customer_details["lat"], customer_details["lon"]),
+                      radius_km=radius_km, limit=database.NEAREST_LIMIT,
+                      callback=lambda rows: on_fetched((rows, None)), on_error=on_error, **filters)
+        else:
+            db.submit(database.search_workers_page, page_token=page_token, callback=on_fetched,
+                      on_error=on_error, **filters)
+
+    def schedule_next_page():
+        # Called from the scroll callback; "pending" stays set until the page arrives
+        if search_state["done"] or search_state["pending"]:
+            return
+        search_state["pending"] = True
+        generation = search_state["generation"]
+        fetch_page(search_state["filters"], search_state["page_token"],
+                   lambda result: on_page(generation, result, False),
+                   lambda error: on_page_error(generation, error))
+
+    def do_search(force=True):
+        distance = distance_var.get()
+        radius_km = distance.split()[0] if distance != "Any distance" else None
+        filters = normalize_search(search_entry.get(), skill_var.get(), avail_var.get(), radius_km)
+        if not force and filters == search_state["filters"]:
+            return   # e.g. an arrow key or a trailing space: same results
+        search_state["filters"] = filters
+        search_state["generation"] += 1
+        search_state["done"] = True
+        search_state["pending"] = False
+        generation = search_state["generation"]
+        fetch_page(filters, None, lambda result: on_page(generation, result, True),
+                   lambda error: on_page_error(generation, error))
+
+    # --- Live search: runs once typing pauses; results of older queries are ignored ---
+    def schedule_search(event=None):
+        if search_jobs["debounce"] is not None:
+            root.after_cancel(search_jobs["debounce"])
+        search_jobs["debounce"] = root.after(SEARCH_DEBOUNCE_MS, run_live_search)
+
+    def run_live_search():
+        search_jobs["debounce"] = None
+        do_search(force=False)
+
+    search_entry.bind("<KeyRelease>", schedule_search)
+    search_entry.bind("<Return>", lambda e: do_search())
+    skill_dd.bind("<<ComboboxSelected>>", schedule_search)
+    avail_dd.bind("<<ComboboxSelected>>", schedule_search)
+    distance_dd.bind("<<ComboboxSelected>>", schedule_search)
+
+    def check_worker_changes():
+        # One index lookup; any change to workers drops every cached page
+        db.submit(database.get_change_token, "workers", callback=search_cache.sync_token, key="workers-poll")
+        search_jobs["poll"] = root.after(5000, check_worker_changes)
+
+    def start_search(token):
+        search_cache.sync_token(token)
+        do_search()
+        check_worker_changes()
+
+    def cancel_search_jobs():
+        for name, job in search_jobs.items():
+            if job is not None:
+                root.after_cancel(job)
+                search_jobs[name] = None
 
     def make_view_profile(worker_id):
         def view():
-            row = database.get_worker_profile(worker_id)
+            db.submit(database.get_worker_profile, worker_id, callback=show_profile)
+
+        def show_profile(row):
             if not row:
                 messagebox.showerror("Error", "Worker data not found.")
                 return
@@ -197,7 +332,7 @@ Address: {row[8]}
 
             tk.Label(bpop, text="Service Date (YYYY-MM-DD HH:MM):", font=BOLD_FONT, bg=WHITE).pack(pady=(10,0))
             date_e = styled_entry(bpop, width=35)
-            date_e.insert(0, (datetime.datetime.now() + datetime.timedelta(days=1)).strftime("%Y-m-%d 10:00"))
+            date_e.insert(0, (datetime.datetime.now() + datetime.timedelta(days=1)).strftime("%Y-%m-%d 10:00"))
             date_e.pack()
 
             tk.Label(bpop, text="Service Address:", font=BOLD_FONT, bg=WHITE).pack(pady=(10,0))
@@ -218,13 +353,17 @@ Address: {row[8]}
                     messagebox.showwarning("Input Error", "Date and Address are required.", parent=bpop)
                     return
                 
-                ok, res_id = database.create_booking(customer_id, worker_id, s_date, s_addr, s_notes)
-                if ok:
-                    messagebox.showinfo("Success", f"Booking Requested! (ID: {res_id})\nThe worker has been notified.", parent=bpop)
-                    bpop.destroy()
-                    populate_cards(database.get_worker_list_for_search()) 
-                else:
-                    messagebox.showerror("Error", f"Booking failed: {res_id}", parent=bpop)
+                def on_booked(result):
+                    ok, res_id = result
+                    if ok:
+                        messagebox.showinfo("Success", f"Booking Requested! (ID: {res_id})\nThe worker has been notified.", parent=bpop)
+                        bpop.destroy()
+                        do_search() 
+                    else:
+                        messagebox.showerror("Error", f"Booking failed: {res_id}", parent=bpop)
+
+                db.submit(database.create_booking, customer_id, worker_id, s_date, s_addr, s_notes,
+                          callback=on_booked)
             
             confirm_btn = styled_button(bpop, "Confirm Booking", command=confirm_booking, width=20)
             confirm_btn.pack(pady=20)
@@ -239,6 +378,8 @@ Address: {row[8]}
         mb.transient(root)
         mb.grab_set()
 
+        mb_db = DatabaseExecutor(mb)
+
         title_label(mb, "My Booking History").pack(pady=15)
         
         cols = ("ID", "Worker", "Skill", "Date", "Status", "Address", "Action")
@@ -254,25 +395,31 @@ Address: {row[8]}
         tree.pack(fill="both", expand=True, padx=20, pady=10)
 
         def refresh_bookings():
+            mb_db.submit(database.get_customer_bookings_with_reviews, customer_id, callback=on_bookings)
+
+        def fill_bookings(data):
+            """Redraws the table and returns {booking_id: status}."""
             for item in tree.get_children():
                 tree.delete(item)
             
-            data = database.get_bookings_by_customer(customer_id)
+            status_map = {}
             for row in data:
                 booking_id = row[0]
                 status = row[5]
-                
-                reviewed = database.check_if_reviewed(booking_id)
+                reviewed = row[8]
+                status_map[booking_id] = status
                 
                 action_text = ""
                 if status == "Completed" and not reviewed:
                     action_text = "Leave Review"
                 elif reviewed:
-                    action_text = "Reviewed"
+                    action_text = f"Reviewed ({row[9]}★)" if row[9] is not None else "Reviewed"
                 
                 # Store (booking_id, worker_id, worker_name, skill, ... , action)
                 tree.insert("", "end", values=(row[0], row[2], row[3], row[4], row[5], row[6], action_text), tags=(row[1], row[2])) # Store worker_id, worker_name in tags
 
+            return status_map
+
         def open_review_popup(booking_id, worker_id):
             r_pop = tk.Toplevel(mb)
             r_pop.title("Leave a Review")
@@ -302,15 +449,18 @@ Address: {row[8]}
                     messagebox.showwarning("Input Error", "Please write a short review.", parent=r_pop)
                     return
                 
-                ok, err = database.add_review(booking_id, customer_id, worker_id, rating, review)
-                
-                if ok:
-                    messagebox.showinfo("Success", "Thank you for your review!", parent=r_pop)
-                    r_pop.destroy()
-                    refresh_bookings() 
-                    populate_cards(database.get_worker_list_for_search()) 
-                else:
-                    messagebox.showerror("Error", f"Failed to submit: {err}", parent=r_pop)
+                def on_reviewed(result):
+                    ok, err = result
+                    if ok:
+                        messagebox.showinfo("Success", "Thank you for your review!", parent=r_pop)
+                        r_pop.destroy()
+                        refresh_bookings() 
+                        do_search() 
+                    else:
+                        messagebox.showerror("Error", f"Failed to submit: {err}", parent=r_pop)
+
+                mb_db.submit(database.add_review, booking_id, customer_id, worker_id, rating, review,
+                             callback=on_reviewed)
             
             submit_btn = styled_button(r_pop, "Submit Review", command=submit_review, width=20)
             submit_btn.pack(pady=20)
@@ -351,36 +501,13 @@ Address: {row[8]}
         chat_btn.pack(side="left", padx=20, pady=(0, 15))
         # --- End U3 ---
 
+        change_scope = f"customer:{customer_id}"
+        change_token = 0
         last_status_map = {}
-        def refresh_and_get_map():
-            bookings_data = database.get_bookings_by_customer(customer_id)
-            new_map = {}
-            
-            # Clear tree first
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            # Repopulate tree and build map
-            for row in bookings_data:
-                booking_id = row[0]
-                status = row[5]
-                new_map[booking_id] = status
-                
-                reviewed = database.check_if_reviewed(booking_id)
-                action_text = "Reviewed" if reviewed else ("Leave Review" if status == "Completed" else "")
-                
-                tree.insert("", "end", values=(row[0], row[2], row[3], row[4], row[5], row[6], action_text), tags=(row[1], row[2]))
-            
-            return new_map
 
-        last_status_map = refresh_and_get_map()
-
-        def check_customer_notifications():
-            nonlocal last_status_map 
-            if not mb.winfo_exists(): 
-                return
-            
-            new_map = refresh_and_get_map()
+        def on_bookings(data):
+            nonlocal last_status_map
+            new_map = fill_bookings(data)
             
             for bid, status in new_map.items():
                 old_status = last_status_map.get(bid)
@@ -393,19 +520,40 @@ Address: {row[8]}
                         messagebox.showinfo("Booking Update", f"Booking #{bid} is now COMPLETE. Please leave a review.", parent=mb)
             
             last_status_map = new_map 
+
+        def on_token(token):
+            nonlocal change_token
+            if token == change_token:
+                return
+            change_token = token
+            refresh_bookings()
+
+        def check_customer_notifications():
+            if not mb.winfo_exists(): 
+                return
+            # Only reload the table when one of this customer's bookings changed
+            # One index lookup per tick
+            mb_db.submit(database.get_change_token, change_scope, callback=on_token, key="poll")
             mb.task_id = mb.after(5000, check_customer_notifications) 
 
-        check_customer_notifications() 
+        def start_polling(token):
+            nonlocal change_token
+            change_token = token
+            refresh_bookings()
+            check_customer_notifications()
+
+        mb_db.submit(database.get_change_token, change_scope, callback=start_polling)
 
         def on_close():
             if hasattr(mb, 'task_id'): 
                 mb.after_cancel(mb.task_id)
+            mb_db.close()
             mb.destroy()
-            populate_cards(database.get_worker_list_for_search()) 
+            do_search() 
         mb.protocol("WM_DELETE_WINDOW", on_close)
 
 
     # --- Initial Load ---
-    populate_cards(database.get_worker_list_for_search())
+    db.submit(database.get_change_token, "workers", callback=start_search)
     
     root.mainloop()
\ No newline at end of file
@@ -5,25 +5,250 @@ import sqlite3
 import hashlib
 import datetime
 import os
+import threading
+import queue
+import contextlib
+import atexit
+import json
+import base64
+import math
+import time
+import photo_store
+import db_trace
 
 DB_FILE = "village_service.db"
 
+# ---------- Connection Pool Settings ----------
+POOL_SIZE = 4                # max open connections per database file
+POOL_TIMEOUT = 10.0          # seconds to wait for a free connection
+STATEMENT_CACHE_SIZE = 128   # prepared statements kept per connection
+
+# ---------- Pragma Profiles ----------
+# Applied to every new connection. WAL lets the dashboards keep reading
+# while another window writes. "network_share" keeps the rollback journal
+# because WAL does not work when the .db file lives on a network drive.
+PRAGMA_PROFILES = {
+    "kiosk": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,          # ms
+        "mmap_size": 32 * 1024 * 1024,
+        "cache_size": -8000,           # negative = KiB, so ~8 MB
+        "temp_store": "MEMORY",
+    },
+    "server": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 10000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    },
+    "network_share": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 10000,
+        "mmap_size": 0,
+        "cache_size": -2000,
+        "temp_store": "DEFAULT",
+    },
+}
+
+PRAGMA_PROFILE = os.environ.get("VILLAGE_DB_PROFILE", "kiosk")
+_pragma_overrides = {}
+
+def get_pragma_profile():
+    """Returns the pragma settings new connections will be opened with."""
+    settings = dict(PRAGMA_PROFILES.get(PRAGMA_PROFILE, PRAGMA_PROFILES["kiosk"]))
+    settings.update(_pragma_overrides)
+    return settings
+
+def set_pragma_profile(name, **overrides):
+    """Switches to a named preset, optionally overriding single pragmas.
+
+    Pooled connections are closed so the next query reopens them with
+    the new settings.
+    """
+    global PRAGMA_PROFILE, _pragma_overrides
+    if name not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown pragma profile: {name}")
+    PRAGMA_PROFILE = name
+    _pragma_overrides = overrides
+    close_pool()
+
+def _apply_pragmas(conn):
+    for pragma, value in get_pragma_profile().items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+def get_active_pragmas():
+    """Reads the pragma values actually in effect, for diagnostics."""
+    with pooled_connection() as conn:
+        active = {"profile": PRAGMA_PROFILE}
+        for pragma in ("journal_mode", "synchronous", "busy_timeout", "mmap_size",
+                       "cache_size", "temp_store", "foreign_keys"):
+            active[pragma] = conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+        return active
+
 # ---------- Connection ----------
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    """Opens a new raw connection. Prefer pooled_connection() for queries."""
+    busy_seconds = get_pragma_profile().get("busy_timeout", 5000) / 1000
+    conn = sqlite3.connect(DB_FILE, timeout=busy_seconds,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False,
+                           factory=db_trace.connection_factory())
+    conn.execute("PRAGMA foreign_keys = ON;")
+    _apply_pragmas(conn)
+    return conn
+
+
+class ConnectionPool:
+    """Keeps a bounded set of long-lived connections to one database file.
+
+    Idle connections are handed out most-recently-used first so a busy
+    kiosk keeps reusing the same warm connection (and its statement cache).
+    When every connection is busy, callers wait for one to be released.
+    """
+
+    def __init__(self, db_file, max_connections=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_file = db_file
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+                self._in_use += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.max_connections
+            if can_open:
+                self._open += 1
+                self._misses += 1
+            else:
+                self._waits += 1
+
+        if can_open:
+            try:
+                conn = get_connection()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+        else:
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise sqlite3.OperationalError("Timed out waiting for a database connection.")
+
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            # Never hand a half-finished transaction to the next caller
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._open -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "db_file": self.db_file,
+                "max_connections": self.max_connections,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Returns the pool for the current DB_FILE, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.db_file != DB_FILE:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_FILE)
+        return _pool
+
+@contextlib.contextmanager
+def pooled_connection():
+    """Borrows a connection from the pool for the duration of a with-block.
+
+    Uncommitted work is rolled back when the block exits, so callers must
+    commit explicitly, just like with a plain sqlite3 connection.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+def get_pool_stats():
+    """Pool hits, waits and open-connection counts for diagnostics."""
+    return get_pool().stats()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+atexit.register(close_pool)
 
 # ---------- Password Hashing ----------
 def hash_password(plain: str) -> str:
     return hashlib.sha256(plain.encode("utf-8")).hexdigest()
 
-# ---------- Database Setup ----------
-def connect_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Enable foreign key constraints
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
+# ---------- Schema Migrations ----------
+# Each migration runs once, in order, inside its own transaction and
+# bumps PRAGMA user_version. Databases already in the field start at
+# version 0; migration 1 only uses IF NOT EXISTS so it upgrades them
+# in place without touching existing rows.
+def _migration_1_base_schema(cursor):
     # Customers table
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS users (
@@ -87,7 +312,7 @@ def connect_db():
         FOREIGN KEY(worker_id) REFERENCES workers(worker_id) ON DELETE SET NULL
     )
     """)
-    
+
     # Chat Messages Table
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS messages (
@@ -115,58 +340,646 @@ def connect_db():
         VALUES (?, ?)
     """, ("admin", hash_password("admin123")))
 
-    conn.commit()
-    conn.close()
+def _migration_2_hot_path_indexes(cursor):
+    # Booking lists per customer / worker, newest first
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_customer ON bookings(customer_id, booking_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_worker ON bookings(worker_id, booking_id)")
+    # Chat history per booking
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_booking ON messages(booking_id, message_id)")
+    # Covers AVG(rating) per worker
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_worker ON reviews(worker_id, rating)")
+    # search_workers filters
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_workers_search ON workers(skill, availability, price_per_hour)")
+    # Login by phone number
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_workers_phone ON workers(phone)")
+
+def _migration_3_worker_fts(cursor):
+    # Full-text index over the searchable worker columns. It is an
+    # external-content table, so triggers keep it in step with workers.
+    # Builds without FTS5 simply skip it and search falls back to LIKE.
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS workers_fts USING fts5(
+                name, skill, address,
+                content='workers', content_rowid='worker_id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 not available, keyword search will use LIKE: {e}")
+        return
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS workers_fts_ai AFTER INSERT ON workers BEGIN
+            INSERT INTO workers_fts(rowid, name, skill, address)
+            VALUES (new.worker_id, new.name, new.skill, new.address);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS workers_fts_ad AFTER DELETE ON workers BEGIN
+            INSERT INTO workers_fts(workers_fts, rowid, name, skill, address)
+            VALUES ('delete', old.worker_id, old.name, old.skill, old.address);
+        END
+    """)
+    # Only fire when searchable text changes, not on every rating update
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS workers_fts_au AFTER UPDATE OF name, skill, address ON workers BEGIN
+            INSERT INTO workers_fts(workers_fts, rowid, name, skill, address)
+            VALUES ('delete', old.worker_id, old.name, old.skill, old.address);
+            INSERT INTO workers_fts(rowid, name, skill, address)
+            VALUES (new.worker_id, new.name, new.skill, new.address);
+        END
+    """)
+    cursor.execute("INSERT INTO workers_fts(workers_fts) VALUES ('rebuild')")
+
+def _migration_4_rating_aggregates(cursor):
+    # Running totals so a new review is O(1) instead of AVG() over all
+    # of the worker's reviews. workers.rating stays the derived average.
+    cursor.execute("ALTER TABLE workers ADD COLUMN rating_sum INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE workers ADD COLUMN rating_count INTEGER NOT NULL DEFAULT 0")
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reviews_rating_ai AFTER INSERT ON reviews
+        WHEN new.rating IS NOT NULL BEGIN
+            UPDATE workers
+            SET rating_sum = rating_sum + new.rating,
+                rating_count = rating_count + 1,
+                rating = (rating_sum + new.rating) * 1.0 / (rating_count + 1)
+            WHERE worker_id = new.worker_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reviews_rating_ad AFTER DELETE ON reviews
+        WHEN old.rating IS NOT NULL BEGIN
+            UPDATE workers
+            SET rating_sum = rating_sum - old.rating,
+                rating_count = rating_count - 1,
+                rating = CASE WHEN rating_count > 1
+                              THEN (rating_sum - old.rating) * 1.0 / (rating_count - 1)
+                              ELSE 0 END
+            WHERE worker_id = old.worker_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reviews_rating_au AFTER UPDATE OF rating, worker_id ON reviews BEGIN
+            UPDATE workers
+            SET rating_sum = rating_sum - old.rating,
+                rating_count = rating_count - 1,
+                rating = CASE WHEN rating_count > 1
+                              THEN (rating_sum - old.rating) * 1.0 / (rating_count - 1)
+                              ELSE 0 END
+            WHERE worker_id = old.worker_id AND old.rating IS NOT NULL;
+            UPDATE workers
+            SET rating_sum = rating_sum + new.rating,
+                rating_count = rating_count + 1,
+                rating = (rating_sum + new.rating) * 1.0 / (rating_count + 1)
+            WHERE worker_id = new.worker_id AND new.rating IS NOT NULL;
+        END
+    """)
+    _rebuild_rating_aggregates(cursor)
+
+def _rebuild_rating_aggregates(cursor, worker_ids=None):
+    """Recomputes the rating totals from the reviews table (backfill / repair)."""
+    sql = """
+        UPDATE workers
+        SET rating_sum = COALESCE((SELECT SUM(r.rating) FROM reviews r
+                                   WHERE r.worker_id = workers.worker_id), 0),
+            rating_count = (SELECT COUNT(r.rating) FROM reviews r
+                            WHERE r.worker_id = workers.worker_id),
+            rating = COALESCE((SELECT AVG(r.rating) FROM reviews r
+                               WHERE r.worker_id = workers.worker_id), 0)
+    """
+    if worker_ids is None:
+        cursor.execute(sql)
+    else:
+        cursor.executemany(sql + " WHERE worker_id = ?", [(wid,) for wid in worker_ids])
+
+def _migration_5_worker_price_order(cursor):
+    # Keyset pages of the catalog walk this index instead of sorting
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_workers_price ON workers(IFNULL(price_per_hour, 0), worker_id)")
+
+def _migration_6_change_log(cursor):
+    # Append-only change feed filled by triggers. Each row belongs to a
+    # scope such as 'worker:7', 'customer:3', 'booking:12', 'workers',
+    # 'users' or 'bookings', so a poller can ask about just its own data.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT,
+            entity TEXT,
+            entity_id INTEGER,
+            op TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_scope ON change_log(scope, change_id)")
+    _create_change_triggers(cursor)
+
+def _create_change_triggers(cursor):
+    # Rows scoped to a worker, customer or booking are only written when
+    # that id is set: 'worker:' || NULL is a NULL scope no poller can ask for
+    for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        op = event.lower()
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS change_bookings_{op} AFTER {event} ON bookings BEGIN
+                INSERT INTO change_log (scope, entity, entity_id, op)
+                    SELECT 'worker:' || {row}.worker_id, 'booking', {row}.booking_id, '{op}'
+                    WHERE {row}.worker_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'customer:' || {row}.customer_id, 'booking', {row}.booking_id, '{op}'
+                    WHERE {row}.customer_id IS NOT NULL
+                    UNION ALL
+                    SELECT 'bookings', 'booking', {row}.booking_id, '{op}';
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS change_reviews_{op} AFTER {event} ON reviews
+            WHEN {row}.customer_id IS NOT NULL BEGIN
+                INSERT INTO change_log (scope, entity, entity_id, op) VALUES
+                    ('customer:' || {row}.customer_id, 'review', {row}.booking_id, '{op}');
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS change_workers_{op} AFTER {event} ON workers BEGIN
+                INSERT INTO change_log (scope, entity, entity_id, op) VALUES
+                    ('workers', 'worker', {row}.worker_id, '{op}');
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS change_users_{op} AFTER {event} ON users BEGIN
+                INSERT INTO change_log (scope, entity, entity_id, op) VALUES
+                    ('users', 'user', {row}.user_id, '{op}');
+            END
+        """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS change_messages_insert AFTER INSERT ON messages
+        WHEN new.booking_id IS NOT NULL BEGIN
+            INSERT INTO change_log (scope, entity, entity_id, op) VALUES
+                ('booking:' || new.booking_id, 'message', new.message_id, 'insert');
+        END
+    """)
+
+def _migration_7_photo_store(cursor):
+    # Reference counts for photo files, kept by triggers on workers.photo,
+    # so gc_photos() can tell which stored photos nobody points at.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS photo_refs (
+            path TEXT PRIMARY KEY,
+            ref_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS photo_refs_ai AFTER INSERT ON workers
+        WHEN new.photo IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO photo_refs (path) VALUES (new.photo);
+            UPDATE photo_refs SET ref_count = ref_count + 1 WHERE path = new.photo;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS photo_refs_ad AFTER DELETE ON workers
+        WHEN old.photo IS NOT NULL BEGIN
+            UPDATE photo_refs SET ref_count = ref_count - 1 WHERE path = old.photo;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS photo_refs_au AFTER UPDATE OF photo ON workers
+        WHEN new.photo IS NOT old.photo BEGIN
+            UPDATE photo_refs SET ref_count = ref_count - 1 WHERE path = old.photo;
+            INSERT OR IGNORE INTO photo_refs (path) SELECT new.photo WHERE new.photo IS NOT NULL;
+            UPDATE photo_refs SET ref_count = ref_count + 1 WHERE path = new.photo;
+        END
+    """)
+
+    # Existing uploads are copied into the store by store_legacy_photos(),
+    # after this commits: file copies don't belong under the write lock
+    _rebuild_photo_refs(cursor)
+
+def _rebuild_photo_refs(cursor):
+    """Recounts photo references from the workers table (backfill / repair)."""
+    cursor.execute("DELETE FROM photo_refs")
+    cursor.execute("""
+        INSERT INTO photo_refs (path, ref_count)
+        SELECT photo, COUNT(*) FROM workers WHERE photo IS NOT NULL GROUP BY photo
+    """)
+
+def _migration_8_app_counters(cursor):
+    # Row totals for the admin stats, kept by triggers so reading them is
+    # a handful of primary-key lookups instead of COUNT(*) scans. Names:
+    # 'users', 'workers', 'bookings', 'reviews' and 'bookings:<status>'.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS app_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in ("users", "workers", "bookings", "reviews"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS counters_{table}_insert AFTER INSERT ON {table} BEGIN
+                UPDATE app_counters SET value = value + 1 WHERE name = '{table}';
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS counters_{table}_delete AFTER DELETE ON {table} BEGIN
+                UPDATE app_counters SET value = value - 1 WHERE name = '{table}';
+            END
+        """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS counters_status_insert AFTER INSERT ON bookings
+        WHEN new.status IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO app_counters (name) VALUES ('bookings:' || new.status);
+            UPDATE app_counters SET value = value + 1 WHERE name = 'bookings:' || new.status;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS counters_status_delete AFTER DELETE ON bookings
+        WHEN old.status IS NOT NULL BEGIN
+            UPDATE app_counters SET value = value - 1 WHERE name = 'bookings:' || old.status;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS counters_status_update AFTER UPDATE OF status ON bookings
+        WHEN new.status IS NOT old.status BEGIN
+            UPDATE app_counters SET value = value - 1 WHERE name = 'bookings:' || old.status;
+            INSERT OR IGNORE INTO app_counters (name) SELECT 'bookings:' || new.status WHERE new.status IS NOT NULL;
+            UPDATE app_counters SET value = value + 1 WHERE name = 'bookings:' || new.status;
+        END
+    """)
+    _rebuild_app_counters(cursor)
+
+def _rebuild_app_counters(cursor):
+    """Recounts every counter from the tables (backfill / repair)."""
+    cursor.execute("DELETE FROM app_counters")
+    for table in ("users", "workers", "bookings", "reviews"):
+        cursor.execute(f"INSERT INTO app_counters (name, value) SELECT '{table}', COUNT(*) FROM {table}")
+    cursor.execute("""
+        INSERT INTO app_counters (name, value)
+        SELECT 'bookings:' || status, COUNT(*) FROM bookings
+        WHERE status IS NOT NULL GROUP BY status
+    """)
+
+def _migration_9_analytics_rollups(cursor):
+    # Daily rollups for the admin analytics tab. Triggers don't update
+    # the rollups directly (a booking's skill lives on its worker, which
+    # may be renamed or deleted); they only mark the affected days in
+    # rollup_dirty, and refresh_rollups() recomputes just those days.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_bookings (
+            day TEXT, skill TEXT, status TEXT, count INTEGER NOT NULL,
+            PRIMARY KEY (day, skill, status)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_signups (
+            day TEXT PRIMARY KEY, users INTEGER NOT NULL, workers INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_skill_ratings (
+            day TEXT, skill TEXT, rating_sum INTEGER NOT NULL, rating_count INTEGER NOT NULL,
+            PRIMARY KEY (day, skill)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS rollup_dirty (day TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    # Recomputing one day reads only that day's rows
+    for table in ("bookings", "reviews", "users", "workers"):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table}(created_at)")
+
+    _create_rollup_triggers(cursor)
+
+    # Backfill: every day that has data
+    for table in ("bookings", "reviews", "users", "workers"):
+        cursor.execute(f"""
+            INSERT INTO rollup_dirty (day)
+            SELECT DISTINCT substr(created_at, 1, 10) FROM {table} WHERE created_at IS NOT NULL
+            ON CONFLICT(day) DO NOTHING
+        """)
+    _refresh_rollup_days(cursor)
+
+def _create_rollup_triggers(cursor):
+    # ON CONFLICT DO NOTHING, not INSERT OR IGNORE: when a foreign key
+    # action (ON DELETE SET NULL) fires a trigger, the outer statement's
+    # ABORT policy overrides OR IGNORE and the delete fails.
+    mark = "INSERT INTO rollup_dirty (day) {select} ON CONFLICT(day) DO NOTHING;"
+    for table in ("bookings", "reviews", "users", "workers"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_{table}_insert AFTER INSERT ON {table}
+            WHEN new.created_at IS NOT NULL BEGIN
+                {mark.format(select="SELECT substr(new.created_at, 1, 10) WHERE true")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_{table}_delete AFTER DELETE ON {table}
+            WHEN old.created_at IS NOT NULL BEGIN
+                {mark.format(select="SELECT substr(old.created_at, 1, 10) WHERE true")}
+            END
+        """)
+    for table in ("bookings", "reviews"):
+        # Status changes, and worker_id going NULL when a worker is deleted
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_{table}_update AFTER UPDATE ON {table} BEGIN
+                {mark.format(select="SELECT substr(old.created_at, 1, 10) WHERE old.created_at IS NOT NULL")}
+                {mark.format(select="SELECT substr(new.created_at, 1, 10) WHERE new.created_at IS NOT NULL")}
+            END
+        """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS rollup_workers_skill AFTER UPDATE OF skill ON workers
+        WHEN new.skill IS NOT old.skill BEGIN
+            {mark.format(select="SELECT DISTINCT substr(created_at, 1, 10) FROM bookings WHERE worker_id = new.worker_id AND created_at IS NOT NULL")}
+            {mark.format(select="SELECT DISTINCT substr(created_at, 1, 10) FROM reviews WHERE worker_id = new.worker_id AND created_at IS NOT NULL")}
+        END
+    """)
+
+def _refresh_rollup_days(cursor):
+    """Recomputes the rollups for every day in rollup_dirty. Returns how many."""
+    cursor.execute("SELECT day FROM rollup_dirty")
+    days = [(day, day) for (day,) in cursor.fetchall()]
+    if not days:
+        return 0
+    # created_at is "YYYY-MM-DD HH:MM:SS", so one day is [day, day + 1)
+    in_day = "{col} >= ? AND {col} < date(?, '+1 day')"
+    for table in ("daily_bookings", "daily_signups", "daily_skill_ratings"):
+        cursor.executemany(f"DELETE FROM {table} WHERE day = ?", [(day,) for day, _ in days])
+    cursor.executemany(f"""
+        INSERT INTO daily_bookings (day, skill, status, count)
+        SELECT substr(b.created_at, 1, 10), IFNULL(w.skill, 'Unknown'), IFNULL(b.status, 'Unknown'), COUNT(*)
+        FROM bookings b LEFT JOIN workers w ON w.worker_id = b.worker_id
+        WHERE {in_day.format(col='b.created_at')}
+        GROUP BY 1, 2, 3
+    """, days)
+    one_day = in_day.format(col="created_at").replace("?", "?1")
+    cursor.executemany(f"""
+        INSERT INTO daily_signups (day, users, workers)
+        SELECT ?1, (SELECT COUNT(*) FROM users WHERE {one_day}),
+                   (SELECT COUNT(*) FROM workers WHERE {one_day})
+    """, [(day,) for day, _ in days])
+    cursor.executemany(f"""
+        INSERT INTO daily_skill_ratings (day, skill, rating_sum, rating_count)
+        SELECT substr(r.created_at, 1, 10), IFNULL(w.skill, 'Unknown'), SUM(r.rating), COUNT(r.rating)
+        FROM reviews r LEFT JOIN workers w ON w.worker_id = r.worker_id
+        WHERE {in_day.format(col='r.created_at')} AND r.rating IS NOT NULL
+        GROUP BY 1, 2
+    """, days)
+    cursor.execute("DELETE FROM daily_signups WHERE users = 0 AND workers = 0")
+    cursor.execute("DELETE FROM rollup_dirty")
+    return len(days)
+
+def _migration_10_geo(cursor):
+    # Offline gazetteer (village name -> coordinates). Addresses are
+    # geocoded against it in Python on every write, and each worker gets
+    # a grid bucket (geo_cell) so a proximity search only reads nearby
+    # buckets. AUTOINCREMENT: MAX(village_id) changes whenever the
+    # gazetteer does, which is how cached copies notice.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS villages (
+            village_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL UNIQUE,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL
+        )
+    """)
+    cursor.execute("ALTER TABLE users ADD COLUMN lat REAL")
+    cursor.execute("ALTER TABLE users ADD COLUMN lon REAL")
+    cursor.execute("ALTER TABLE workers ADD COLUMN lat REAL")
+    cursor.execute("ALTER TABLE workers ADD COLUMN lon REAL")
+    cursor.execute("ALTER TABLE workers ADD COLUMN geo_cell INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_workers_geo_cell ON workers(geo_cell)")
+
+def _create_calendar_check_trigger(cursor):
+    # Accepting (or moving) a booking onto a taken day fails the UPDATE.
+    # A booking that already held its day, and stays on it, isn't checked
+    # again: a same-day duplicate left off the calendar (by migration 11 or
+    # an import) can still be completed or cancelled.
+    new_day = _CALENDAR_DAY_SQL.format(row="new")
+    old_day = _CALENDAR_DAY_SQL.format(row="old")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS calendar_bookings_check BEFORE UPDATE OF status, service_date, worker_id ON bookings
+        WHEN new.status IN {CALENDAR_STATUSES} AND new.worker_id IS NOT NULL AND {new_day} IS NOT NULL
+             AND (old.status IS NULL OR old.status NOT IN {CALENDAR_STATUSES}
+                  OR new.worker_id IS NOT old.worker_id OR {new_day} IS NOT {old_day})
+             AND {_CALENDAR_CLASH_SQL.format(worker='new.worker_id', start=new_day,
+                                             end=f"date({new_day}, '+1 day')", booking='new.booking_id')}
+        BEGIN
+            SELECT RAISE(ABORT, 'The worker is already booked or unavailable on that day');
+        END
+    """)
+
+def _migration_11_worker_calendar(cursor):
+    # Per-worker busy intervals [start_at, end_at): one per Accepted or
+    # Completed booking (kept by the triggers below) and one per day the
+    # worker blocked. A worker's intervals never overlap, so the only one
+    # that can clash with a new interval is the last to start before it
+    # ends: a single seek on idx_calendar_worker.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS worker_calendar (
+            entry_id INTEGER PRIMARY KEY,
+            worker_id INTEGER NOT NULL,
+            start_at TEXT NOT NULL,
+            end_at TEXT NOT NULL,
+            kind TEXT NOT NULL, -- 'booked' or 'blocked'
+            booking_id INTEGER UNIQUE
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_calendar_worker ON worker_calendar(worker_id, start_at, end_at)")
+
+    # Existing bookings; when one day was accepted twice the first one wins
+    cursor.execute(f"""
+        INSERT INTO worker_calendar (worker_id, start_at, end_at, kind, booking_id)
+        SELECT worker_id, day, date(day, '+1 day'), 'booked', MIN(booking_id)
+        FROM (SELECT worker_id, booking_id, {_CALENDAR_DAY_SQL.format(row='bookings')} AS day
+              FROM bookings WHERE status IN {CALENDAR_STATUSES} AND worker_id IS NOT NULL)
+        WHERE day IS NOT NULL
+        GROUP BY worker_id, day
+    """)
+
+    new_day = _CALENDAR_DAY_SQL.format(row="new")
+    occupies = f"new.status IN {CALENDAR_STATUSES} AND new.worker_id IS NOT NULL AND {new_day} IS NOT NULL"
+    _create_calendar_check_trigger(cursor)
+    # Rows inserted already Accepted (imports, seeding) are not refused;
+    # one that clashes is just left off the calendar, and stays off when
+    # it is completed.
+    add_entry = f"""
+        INSERT INTO worker_calendar (worker_id, start_at, end_at, kind, booking_id)
+        SELECT new.worker_id, {new_day}, date({new_day}, '+1 day'), 'booked', new.booking_id
+        WHERE {occupies} AND NOT {_CALENDAR_CLASH_SQL.format(worker='new.worker_id', start=new_day,
+                                                             end=f"date({new_day}, '+1 day')", booking='new.booking_id')};
+    """
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS calendar_bookings_insert AFTER INSERT ON bookings BEGIN {add_entry} END")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS calendar_bookings_update AFTER UPDATE OF status, service_date, worker_id ON bookings BEGIN
+            DELETE FROM worker_calendar WHERE booking_id = old.booking_id;
+            {add_entry}
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS calendar_bookings_delete AFTER DELETE ON bookings BEGIN
+            DELETE FROM worker_calendar WHERE booking_id = old.booking_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS calendar_workers_delete AFTER DELETE ON workers BEGIN
+            DELETE FROM worker_calendar WHERE worker_id = old.worker_id;
+        END
+    """)
+
+def _migration_12_rollup_trigger_upsert(cursor):
+    # Databases from migration 9 have the INSERT OR IGNORE triggers,
+    # which made deleting a user or worker with bookings fail
+    for table in ("bookings", "reviews", "users", "workers"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS rollup_{table}_insert")
+        cursor.execute(f"DROP TRIGGER IF EXISTS rollup_{table}_delete")
+    for table in ("bookings", "reviews"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS rollup_{table}_update")
+    cursor.execute("DROP TRIGGER IF EXISTS rollup_workers_skill")
+    _create_rollup_triggers(cursor)
+
+def _migration_13_email_nocase(cursor):
+    # UNIQUE(email) is case-sensitive, so "Foo@x.com" could sign up next
+    # to "foo@x.com". Rows already in that state are left alone; new ones
+    # are refused, looked up through an index on lower(email).
+    for table in ("users", "workers"):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_email_lower ON {table}(lower(email))")
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_email_nocase BEFORE INSERT ON {table}
+            WHEN new.email IS NOT NULL
+                 AND EXISTS (SELECT 1 FROM {table} WHERE lower(email) = lower(new.email))
+            BEGIN
+                SELECT RAISE(ABORT, 'Email already exists');
+            END
+        """)
+
+def _migration_14_calendar_check_transitions(cursor):
+    # Migration 11's check also fired on Accepted -> Completed, so the
+    # second of two bookings accepted for one day before the calendar
+    # existed could never be completed
+    cursor.execute("DROP TRIGGER IF EXISTS calendar_bookings_check")
+    _create_calendar_check_trigger(cursor)
+
+def _migration_15_change_log_scopes(cursor):
+    # Migration 6's triggers logged bookings and reviews whose worker or
+    # customer was NULL (e.g. after an account was deleted) under a NULL
+    # scope, which nothing polls
+    for table in ("bookings", "reviews"):
+        for op in ("insert", "update", "delete"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS change_{table}_{op}")
+    cursor.execute("DROP TRIGGER IF EXISTS change_messages_insert")
+    _create_change_triggers(cursor)
+    cursor.execute("DELETE FROM change_log WHERE scope IS NULL")
+
+MIGRATIONS = [
+    (1, _migration_1_base_schema),
+    (2, _migration_2_hot_path_indexes),
+    (3, _migration_3_worker_fts),
+    (4, _migration_4_rating_aggregates),
+    (5, _migration_5_worker_price_order),
+    (6, _migration_6_change_log),
+    (7, _migration_7_photo_store),
+    (8, _migration_8_app_counters),
+    (9, _migration_9_analytics_rollups),
+    (10, _migration_10_geo),
+    (11, _migration_11_worker_calendar),
+    (12, _migration_12_rollup_trigger_upsert),
+    (13, _migration_13_email_nocase),
+    (14, _migration_14_calendar_check_transitions),
+    (15, _migration_15_change_log_scopes),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated_files = set()
+_fts_status = {}   # DB_FILE -> whether workers_fts exists
+
+def get_schema_version():
+    with pooled_connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_db():
+    """Applies every pending migration. Returns the list of versions applied."""
+    applied = []
+    with pooled_connection() as conn:
+        for version, migration in MIGRATIONS:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            cursor = conn.cursor()
+            # IMMEDIATE takes the write lock up front so two kiosks starting
+            # together can't both run the same migration.
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                if cursor.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+                applied.append(version)
+                _fts_status.pop(DB_FILE, None)
+            except Exception:
+                conn.rollback()
+                raise
+    return applied
+
+# ---------- Database Setup ----------
+def connect_db():
+    """Makes sure the schema is up to date. Cheap after the first call."""
+    if DB_FILE in _migrated_files:
+        return
+    if get_schema_version() < SCHEMA_VERSION and 7 in migrate_db():
+        _stored, skipped = store_legacy_photos()
+        for path, reason in skipped:
+            print(f"Photo not moved to the store: {path}: {reason}")
+    prune_change_log()
+    _migrated_files.add(DB_FILE)
 
 # ------------------------------------------------
 #                CUSTOMER FUNCTIONS
 # ------------------------------------------------
 def register_customer(name, email, phone, plain_password, address=""):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        hashed_pw = hash_password(plain_password)
-        created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            INSERT INTO users (name, email, phone, password, address, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (name, email, phone, hashed_pw, address, created))
-        conn.commit()
-        return True, None
-    except sqlite3.IntegrityError:
-        return False, "Email already exists!"
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            hashed_pw = hash_password(plain_password)
+            created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            lat, lon = _geocoder(conn)(address)
+            cursor.execute("""
+                INSERT INTO users (name, email, phone, password, address, created_at, lat, lon)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (name, email, phone, hashed_pw, address, created, lat, lon))
+            conn.commit()
+            return True, None
+        except sqlite3.IntegrityError:
+            return False, "Email already exists!"
+        except Exception as e:
+            return False, str(e)
 
 def verify_customer(email_or_phone, plain_password):
-    conn = get_connection()
-    cursor = conn.cursor()
-    hashed_pw = hash_password(plain_password)
-    cursor.execute("""
-        SELECT user_id, name, email, phone, address
-        FROM users
-        WHERE (email = ? OR phone = ?) AND password = ?
-    """, (email_or_phone, email_or_phone, hashed_pw))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        hashed_pw = hash_password(plain_password)
+        cursor.execute("""
+            SELECT user_id, name, email, phone, address
+            FROM users
+            WHERE (email = ? OR phone = ?) AND password = ?
+        """, (email_or_phone, email_or_phone, hashed_pw))
+        row = cursor.fetchone()
     if row:
         return True, {"user_id": row[0], "name": row[1], "email": row[2], "phone": row[3], "address": row[4]}
     return False, None
 
 def get_customer_details(user_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT user_id, name, email, phone, address
-        FROM users
-        WHERE user_id = ?
-    """, (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT user_id, name, email, phone, address, lat, lon
+            FROM users
+            WHERE user_id = ?
+        """, (user_id,))
+        row = cursor.fetchone()
     if row:
-        return {"user_id": row[0], "name": row[1], "email": row[2], "phone": row[3], "address": row[4]}
+        # lat/lon are None when the address matched no village in the gazetteer
+        return {"user_id": row[0], "name": row[1], "email": row[2], "phone": row[3], "address": row[4],
+                "lat": row[5], "lon": row[6]}
     return None
 
 # ------------------------------------------------
@@ -174,38 +987,36 @@ def get_customer_details(user_id):
 # ------------------------------------------------
 def register_worker(name, email, phone, plain_password, skill, exp, price_per_hour,
                     availability, address, photo_path):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        hashed_pw = hash_password(plain_password)
-        created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            INSERT INTO workers
-            (name, email, phone, password, skill, experience, price_per_hour,
-             availability, address, photo, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (name, email, phone, hashed_pw, skill, exp, price_per_hour,
-              availability, address, photo_path, created))
-        conn.commit()
-        return True, None
-    except sqlite3.IntegrityError:
-        return False, "Worker email already exists!"
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            hashed_pw = hash_password(plain_password)
+            created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            lat, lon = _geocoder(conn)(address)
+            cursor.execute("""
+                INSERT INTO workers
+                (name, email, phone, password, skill, experience, price_per_hour,
+                 availability, address, photo, created_at, lat, lon, geo_cell)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (name, email, phone, hashed_pw, skill, exp, price_per_hour,
+                  availability, address, photo_path, created, lat, lon, _geo_cell(lat, lon)))
+            conn.commit()
+            return True, None
+        except sqlite3.IntegrityError:
+            return False, "Worker email already exists!"
+        except Exception as e:
+            return False, str(e)
 
 def verify_worker(email_or_phone, plain_password):
-    conn = get_connection()
-    cursor = conn.cursor()
-    hashed_pw = hash_password(plain_password)
-    cursor.execute("""
-        SELECT worker_id, name, email, phone, skill, availability, price_per_hour
-        FROM workers
-        WHERE (email = ? OR phone = ?) AND password = ?
-    """, (email_or_phone, email_or_phone, hashed_pw))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        hashed_pw = hash_password(plain_password)
+        cursor.execute("""
+            SELECT worker_id, name, email, phone, skill, availability, price_per_hour
+            FROM workers
+            WHERE (email = ? OR phone = ?) AND password = ?
+        """, (email_or_phone, email_or_phone, hashed_pw))
+        row = cursor.fetchone()
     if row:
         return True, {"worker_id": row[0], "name": row[1], "email": row[2], "phone": row[3], "skill": row[4], "availability": row[5], "price_per_hour": row[6]}
     return False, None
@@ -214,296 +1025,1268 @@ def verify_worker(email_or_phone, plain_password):
 #                PROFILE FUNCTIONS
 # ------------------------------------------------
 def get_worker_profile(worker_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT worker_id, name, email, phone, skill, experience,
-               price_per_hour, availability, address, photo, rating
-        FROM workers WHERE worker_id = ?
-    """, (worker_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT worker_id, name, email, phone, skill, experience,
+                   price_per_hour, availability, address, photo, rating
+            FROM workers WHERE worker_id = ?
+        """, (worker_id,))
+        return cursor.fetchone()
 
 def update_worker_profile(worker_id, name, phone, skill, experience,
                           price_per_hour, availability, address, photo):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            UPDATE workers
-            SET name=?, phone=?, skill=?, experience=?, price_per_hour=?,
-                availability=?, address=?, photo=?
-            WHERE worker_id=?
-        """, (name, phone, skill, experience, price_per_hour,
-              availability, address, photo, worker_id))
-        conn.commit()
-        return True, None
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            lat, lon = _geocoder(conn)(address)
+            cursor.execute("""
+                UPDATE workers
+                SET name=?, phone=?, skill=?, experience=?, price_per_hour=?,
+                    availability=?, address=?, photo=?, lat=?, lon=?, geo_cell=?
+                WHERE worker_id=?
+            """, (name, phone, skill, experience, price_per_hour,
+                  availability, address, photo, lat, lon, _geo_cell(lat, lon), worker_id))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            return False, str(e)
+
+# ------------------------------------------------
+#                   BULK IMPORT
+# ------------------------------------------------
+# Used by bulk_import.py. Rows arrive already validated, with hashed
+# passwords, as dicts holding the columns below; each call is one
+# transaction, so the importer controls the chunk size.
+BULK_COLUMNS = {
+    "users": ("name", "email", "phone", "password", "address", "created_at"),
+    "workers": ("name", "email", "phone", "password", "skill", "experience",
+                "price_per_hour", "availability", "address", "photo", "created_at"),
+}
+# Filled in by bulk_insert() from the address, never by the caller
+BULK_GEO_COLUMNS = {
+    "users": ("lat", "lon"),
+    "workers": ("lat", "lon", "geo_cell"),
+}
+
+def bulk_insert(table, rows):
+    """Inserts rows into users or workers with one executemany.
+
+    Rows whose email is already taken (in any letter case) are skipped. Returns
+    (inserted_count, rejected) where rejected is a list of
+    (index_in_rows, reason).
+    """
+    columns = BULK_COLUMNS[table]
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            emails = [row["email"].lower() for row in rows if row.get("email")]
+            taken = set()
+            for i in range(0, len(emails), 500):   # stay under SQLite's variable limit
+                chunk = emails[i:i + 500]
+                cursor.execute(f"SELECT lower(email) FROM {table} WHERE lower(email) IN ({','.join('?' * len(chunk))})", chunk)
+                taken.update(email for (email,) in cursor.fetchall())
+
+            geocode = _geocoder(conn)
+            values, rejected = [], []
+            for index, row in enumerate(rows):
+                email = (row.get("email") or "").lower()
+                if email and email in taken:
+                    rejected.append((index, "Email already exists"))
+                    continue
+                if email:
+                    taken.add(email)
+                lat, lon = geocode(row.get("address"))
+                geo = (lat, lon, _geo_cell(lat, lon)) if table == "workers" else (lat, lon)
+                values.append(tuple(row.get(col) for col in columns) + geo)
+            columns += BULK_GEO_COLUMNS[table]
+
+            # The per-row FTS trigger is most of the cost of a worker insert.
+            # Inside this transaction it is swapped for one set-based insert
+            # into workers_fts; other connections never see it missing.
+            fts_trigger = None
+            if table == "workers" and values and _has_worker_fts(conn):
+                cursor.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name='workers_fts_ai'")
+                row = cursor.fetchone()
+                if row:
+                    fts_trigger = row[0]
+                    cursor.execute("SELECT IFNULL(MAX(worker_id), 0) FROM workers")
+                    first_new_id = cursor.fetchone()[0]
+                    cursor.execute("DROP TRIGGER workers_fts_ai")
+
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                               values)
+            if fts_trigger:
+                cursor.execute("""
+                    INSERT INTO workers_fts(rowid, name, skill, address)
+                    SELECT worker_id, name, skill, address FROM workers WHERE worker_id > ?
+                """, (first_new_id,))
+                cursor.execute(fts_trigger)
+            conn.commit()
+            return len(values), rejected
+        except Exception:
+            conn.rollback()
+            raise
+
+# ------------------------------------------------
+#              GAZETTEER & PROXIMITY
+# ------------------------------------------------
+# Addresses are free text ("Ward 3, Rampur"); the gazetteer maps village
+# names to coordinates. Workers are bucketed into a grid of GEO_CELL_DEG
+# squares, cell = row * GEO_CELL_COLS + col, indexed, so "nearest
+# workers" reads a handful of buckets instead of the whole table.
+GEO_CELL_DEG = 0.05          # ~5.5 km north-south
+GEO_CELL_COLS = 10000        # more than 360 / GEO_CELL_DEG
+EARTH_RADIUS_KM = 6371.0
+NEAREST_RADIUS_KM = 25.0
+NEAREST_LIMIT = 50
+NEAREST_FIRST_RING_KM = 3.0   # search starts this wide and doubles until `limit` are found
+
+_gazetteers = {}   # DB_FILE -> (MAX(village_id), {name_key: (lat, lon)}, longest name in words)
+
+def _name_key(text):
+    """Lower-case words only: "Ward 3, Ram-pur" -> "ward 3 ram pur"."""
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in (text or "").lower()).split())
+
+def _geo_cell(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return int((lat + 90) // GEO_CELL_DEG) * GEO_CELL_COLS + int((lon + 180) // GEO_CELL_DEG)
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _geocoder(conn):
+    """Returns geocode(address) -> (lat, lon), or (None, None) if no village matches.
+
+    The gazetteer is cached in memory per database file and reloaded
+    only when MAX(village_id) moves. The address is matched against
+    village names word by word from its end, longest name first, so
+    "Ward 3, Rampur 2" finds "Rampur 2" before "Rampur".
+    """
+    stamp = conn.execute("SELECT IFNULL(MAX(village_id), 0) FROM villages").fetchone()[0]
+    cached = _gazetteers.get(DB_FILE)
+    if cached is None or cached[0] != stamp:
+        names = {key: (lat, lon) for key, lat, lon in conn.execute("SELECT name_key, lat, lon FROM villages")}
+        longest = max((key.count(" ") + 1 for key in names), default=0)
+        cached = _gazetteers[DB_FILE] = (stamp, names, longest)
+    _, names, longest = cached
+
+    def geocode(address):
+        if not names or not address:
+            return None, None
+        words = _name_key(address).split()
+        for end in range(len(words), 0, -1):
+            for n in range(min(longest, end), 0, -1):
+                hit = names.get(" ".join(words[end - n:end]))
+                if hit:
+                    return hit
+        return None, None
+    return geocode
+
+def geocode_address(address):
+    """(lat, lon) of the village named in address, or (None, None)."""
+    with pooled_connection() as conn:
+        return _geocoder(conn)(address)
+
+def load_gazetteer(villages, replace=False):
+    """Adds (name, lat, lon) villages to the gazetteer, then re-geocodes every address.
+
+    A name already present gets the new coordinates; replace=True drops
+    the old gazetteer first. Returns (loaded_count, rejected) where
+    rejected is a list of (index, reason), like bulk_insert().
+    """
+    values, rejected, seen = [], [], set()
+    for index, village in enumerate(villages):
+        try:
+            name, lat, lon = village
+            key, lat, lon = _name_key(name), float(lat), float(lon)
+        except (TypeError, ValueError):
+            rejected.append((index, "Expected a name and numeric lat, lon"))
+            continue
+        if not key:
+            rejected.append((index, "Village name is empty"))
+        elif not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            rejected.append((index, f"Coordinates out of range: {lat}, {lon}"))
+        elif key in seen:
+            rejected.append((index, f"Duplicate village: {name}"))
+        else:
+            seen.add(key)
+            values.append((name.strip(), key, lat, lon))
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if replace:
+                cursor.execute("DELETE FROM villages")
+            # REPLACE gives a changed village a new id, so cached gazetteers reload
+            cursor.executemany("INSERT OR REPLACE INTO villages (name, name_key, lat, lon) VALUES (?, ?, ?, ?)", values)
+            _geocode_all(cursor, _geocoder(conn))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(values), rejected
+
+def _geocode_all(cursor, geocode):
+    """Re-geocodes users and workers, writing only the rows that moved."""
+    cursor.execute("SELECT user_id, address, lat, lon FROM users")
+    changed = [(lat, lon, user_id) for user_id, address, old_lat, old_lon in cursor.fetchall()
+               for lat, lon in [geocode(address)] if (lat, lon) != (old_lat, old_lon)]
+    cursor.executemany("UPDATE users SET lat = ?, lon = ? WHERE user_id = ?", changed)
+    cursor.execute("SELECT worker_id, address, lat, lon FROM workers")
+    changed = [(lat, lon, _geo_cell(lat, lon), worker_id) for worker_id, address, old_lat, old_lon in cursor.fetchall()
+               for lat, lon in [geocode(address)] if (lat, lon) != (old_lat, old_lon)]
+    cursor.executemany("UPDATE workers SET lat = ?, lon = ?, geo_cell = ? WHERE worker_id = ?", changed)
+
+def geocode_all():
+    """Re-geocodes every stored address (e.g. after editing villages by hand)."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            _geocode_all(cursor, _geocoder(conn))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def _cell_ranges(lat, lon, radius_km):
+    """geo_cell ranges covering the square around (lat, lon), one per grid row."""
+    dlat = radius_km / 111.2
+    dlon = radius_km / (111.2 * max(0.01, math.cos(math.radians(min(89.0, abs(lat) + dlat)))))
+    row0, row1 = int((max(-90.0, lat - dlat) + 90) // GEO_CELL_DEG), int((min(90.0, lat + dlat) + 90) // GEO_CELL_DEG)
+    col0, col1 = int((max(-180.0, lon - dlon) + 180) // GEO_CELL_DEG), int((min(180.0, lon + dlon) + 180) // GEO_CELL_DEG)
+    return [(row * GEO_CELL_COLS + col0, row * GEO_CELL_COLS + col1) for row in range(row0, row1 + 1)]
+
+def find_nearest_workers(near, radius_km=NEAREST_RADIUS_KM, limit=NEAREST_LIMIT, keyword="",
+                         skill=None, min_price=None, max_price=None, availability=None):
+    """The `limit` nearest workers within radius_km of near, as [(row, distance_km)].
+
+    near is (lat, lon) or a village name. Rows are the usual 8-column
+    search tuples. Each ring reads only the grid buckets around the
+    point; it widens until enough workers are in range, so dense areas
+    answer from one or two buckets.
+    """
+    with pooled_connection() as conn:
+        if isinstance(near, str):
+            near = _geocoder(conn)(near)
+        lat, lon = near
+        if lat is None or lon is None:
+            return []
+        lat, lon = float(lat), float(lon)
+
+        clauses, params = _search_filters(skill, min_price, max_price, availability)
+        fts_query = _fts_query(keyword) if keyword else ""
+        if fts_query and _has_worker_fts(conn):
+            clauses.append("w.worker_id IN (SELECT rowid FROM workers_fts WHERE workers_fts MATCH ?)")
+            params.append(fts_query)
+        elif keyword:
+            clauses.append("(w.name LIKE ? OR w.skill LIKE ? OR w.address LIKE ?)")
+            params.extend([f"%{keyword}%"] * 3)
+
+        radius = min(NEAREST_FIRST_RING_KM, radius_km)
+        while True:
+            ranges = _cell_ranges(lat, lon, radius)
+            cells = " OR ".join(["w.geo_cell BETWEEN ? AND ?"] * len(ranges))
+            # INDEXED BY: with a skill filter the planner would rather scan every worker with that skill
+            sql = f"SELECT {_SEARCH_COLUMNS}, w.lat, w.lon FROM workers w INDEXED BY idx_workers_geo_cell WHERE ({cells})"
+            for clause in clauses:
+                sql += f" AND {clause}"
+            found = []
+            for row in conn.execute(sql, [bound for pair in ranges for bound in pair] + params):
+                distance = _distance_km(lat, lon, row[8], row[9])
+                if distance <= radius:
+                    found.append((row[:8], round(distance, 3)))
+            # Everything within `radius` is exact, so once `limit` are in it they are the nearest
+            if len(found) >= limit or radius >= radius_km:
+                break
+            radius = min(radius * 2, radius_km)
+    found.sort(key=lambda item: (item[1], item[0][0]))
+    return found[:limit]
 
 # ------------------------------------------------
 #                 SEARCH FUNCTIONS
 # ------------------------------------------------
 def get_worker_list_for_search():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT worker_id, name, skill, price_per_hour, availability, photo, rating, address
-        FROM workers ORDER BY worker_id DESC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT worker_id, name, skill, price_per_hour, availability, photo, rating, address
+            FROM workers ORDER BY worker_id DESC
+        """)
+        return cursor.fetchall()
+
+def _has_worker_fts(conn):
+    if DB_FILE not in _fts_status:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE name='workers_fts'").fetchone()
+        _fts_status[DB_FILE] = row is not None
+    return _fts_status[DB_FILE]
+
+def _fts_query(keyword):
+    """Turns free text into an FTS5 query: every word, as a prefix, must match."""
+    words = []
+    for word in keyword.split():
+        word = "".join(ch for ch in word if ch.isalnum())
+        if word:
+            words.append(f'"{word}"*')
+    return " ".join(words)
 
-def search_workers(keyword="", skill=None, min_price=None, max_price=None, availability=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    base = "SELECT worker_id, name, skill, price_per_hour, availability, photo, rating, address FROM workers WHERE 1=1"
+def _search_filters(skill, min_price, max_price, availability):
+    clauses = []
     params = []
-    if keyword:
-        base += " AND (name LIKE ? OR skill LIKE ? OR address LIKE ?)"
-        kw = f"%{keyword}%"
-        params.extend([kw, kw, kw])
     if skill and skill != "All":
-        base += " AND skill = ?"
+        clauses.append("w.skill = ?")
         params.append(skill)
     if availability and availability != "All":
-        base += " AND availability = ?"
+        clauses.append("w.availability = ?")
         params.append(availability)
     if min_price is not None:
-        base += " AND price_per_hour >= ?"
+        clauses.append("w.price_per_hour >= ?")
         params.append(min_price)
     if max_price is not None:
-        base += " AND price_per_hour <= ?"
+        clauses.append("w.price_per_hour <= ?")
         params.append(max_price)
-    base += " ORDER BY price_per_hour ASC"
-    cursor.execute(base, tuple(params))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return clauses, params
+
+_SEARCH_COLUMNS = "w.worker_id, w.name, w.skill, w.price_per_hour, w.availability, w.photo, w.rating, w.address"
+
+def _worker_search_sql(conn, keyword, skill, min_price, max_price, availability, use_fts=True, rank=True):
+    """Builds the search as a sub-select with an extra sort_key column.
+
+    Returns (sql, params, mode). mode is "rank" for FTS5 keyword searches
+    (sort_key = weighted bm25, name > skill > address) and "price" otherwise
+    (sort_key = price). Either way rows sort by (sort_key, worker_id).
+    rank=False orders keyword matches by price too.
+    """
+    clauses, params = _search_filters(skill, min_price, max_price, availability)
+    fts_query = _fts_query(keyword) if keyword else ""
+
+    if use_fts and fts_query and _has_worker_fts(conn):
+        sort_key = "bm25(workers_fts, 10.0, 5.0, 1.0)" if rank else "IFNULL(w.price_per_hour, 0)"
+        sql = f"""
+            SELECT {_SEARCH_COLUMNS}, {sort_key} AS sort_key
+            FROM workers_fts
+            JOIN workers w ON w.worker_id = workers_fts.rowid
+            WHERE workers_fts MATCH ?
+        """
+        for clause in clauses:
+            sql += f" AND {clause}"
+        return sql, [fts_query, *params], "rank" if rank else "price"
+
+    sql = f"SELECT {_SEARCH_COLUMNS}, IFNULL(w.price_per_hour, 0) AS sort_key FROM workers w WHERE 1=1"
+    like_params = []
+    if keyword:
+        sql += " AND (w.name LIKE ? OR w.skill LIKE ? OR w.address LIKE ?)"
+        kw = f"%{keyword}%"
+        like_params.extend([kw, kw, kw])
+    for clause in clauses:
+        sql += f" AND {clause}"
+    return sql, [*like_params, *params], "price"
+
+def _run_worker_search(cursor, build, keyset=None, limit=None):
+    sql, params, mode = build
+    outer = f"SELECT worker_id, name, skill, price_per_hour, availability, photo, rating, address, sort_key FROM ({sql})"
+    if keyset is not None:
+        # The plain >= lets SQLite seek into the price index; the row
+        # value comparison then skips ties already shown.
+        outer += " WHERE sort_key >= ? AND (sort_key, worker_id) > (?, ?)"
+        params = [*params, keyset[0], *keyset]
+    outer += " ORDER BY sort_key, worker_id"
+    if limit is not None:
+        outer += " LIMIT ?"
+        params = [*params, limit]
+    cursor.execute(outer, tuple(params))
+    return cursor.fetchall()
+
+def search_workers(keyword="", skill=None, min_price=None, max_price=None, availability=None,
+                   near=None, radius_km=NEAREST_RADIUS_KM, limit=NEAREST_LIMIT):
+    """Filters workers. Keyword matches use the FTS5 index (word prefixes,
+    best bm25 match first) when available, otherwise a LIKE scan.
+
+    With near=(lat, lon) or near="<village name>", returns instead the
+    `limit` nearest matching workers within radius_km, nearest first
+    (see find_nearest_workers); workers without coordinates are left out.
+    """
+    if near is not None:
+        return [row for row, _ in find_nearest_workers(near, radius_km, limit, keyword, skill,
+                                                       min_price, max_price, availability)]
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        build = _worker_search_sql(conn, keyword, skill, min_price, max_price, availability)
+        try:
+            rows = _run_worker_search(cursor, build)
+        except sqlite3.OperationalError as e:
+            if build[2] != "rank":
+                raise
+            print(f"FTS search failed, falling back to LIKE: {e}")
+            build = _worker_search_sql(conn, keyword, skill, min_price, max_price, availability, use_fts=False)
+            rows = _run_worker_search(cursor, build)
+    return [row[:-1] for row in rows]
+
+# ---------- Paged Search ----------
+WORKER_PAGE_SIZE = 20
+
+def _encode_page_token(mode, sort_key, worker_id):
+    raw = json.dumps([mode, sort_key, worker_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_page_token(token):
+    try:
+        mode, sort_key, worker_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return mode, sort_key, int(worker_id)
+    except Exception:
+        raise ValueError("Invalid page token.")
+
+def search_workers_page(keyword="", skill=None, min_price=None, max_price=None, availability=None,
+                        page_size=WORKER_PAGE_SIZE, page_token=None):
+    """One page of search_workers() results using keyset pagination.
+
+    Returns (rows, next_page_token). Pass next_page_token back to get the
+    following page; it is None on the last page. Rows are the same
+    8-column tuples search_workers() returns, cheapest first even for
+    keyword searches: a bm25 score shifts as other rows change, so it
+    can't mark a place between pages. Pages stay stable while workers
+    are added, because each page starts after the last
+    (price, worker_id) seen rather than at an OFFSET.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        build = _worker_search_sql(conn, keyword, skill, min_price, max_price, availability, rank=False)
+        keyset = None
+        if page_token:
+            mode, sort_key, last_id = _decode_page_token(page_token)
+            if mode != build[2]:
+                raise ValueError("Page token does not belong to this search.")
+            keyset = (sort_key, last_id)
+        # One extra row tells us whether there is a next page
+        rows = _run_worker_search(cursor, build, keyset, page_size + 1)
+
+    next_token = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_token = _encode_page_token(build[2], last[-1], last[0])
+    return [row[:-1] for row in rows], next_token
 
 # ------------------------------------------------
 #                  BOOKING SYSTEM
 # ------------------------------------------------
 def create_booking(customer_id, worker_id, service_date, address, notes=""):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            INSERT INTO bookings (customer_id, worker_id, service_date, status, address, notes, created_at)
-            VALUES (?, ?, ?, 'Pending', ?, ?, ?)
-        """, (customer_id, worker_id, service_date, address, notes, created))
-        conn.commit()
-        return True, cursor.lastrowid
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+    day = _calendar_day(service_date)
+    if day is None:
+        return False, "Service date must start with a date like 2025-03-14."
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Only a hint for the customer: the day is claimed when the worker accepts
+            if _calendar_clash(cursor, worker_id, day, _next_day(day)):
+                return False, f"The worker is not available on {day}. Please pick another date."
+            created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                INSERT INTO bookings (customer_id, worker_id, service_date, status, address, notes, created_at)
+                VALUES (?, ?, ?, 'Pending', ?, ?, ?)
+            """, (customer_id, worker_id, service_date, address, notes, created))
+            conn.commit()
+            return True, cursor.lastrowid
+        except Exception as e:
+            return False, str(e)
 
 def get_bookings_by_customer(customer_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT b.booking_id, b.worker_id, w.name, w.skill, b.service_date, b.status, b.address, b.notes
-        FROM bookings b
-        LEFT JOIN workers w ON b.worker_id = w.worker_id
-        WHERE b.customer_id=?
-        ORDER BY b.booking_id DESC
-    """, (customer_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT b.booking_id, b.worker_id, w.name, w.skill, b.service_date, b.status, b.address, b.notes
+            FROM bookings b
+            LEFT JOIN workers w ON b.worker_id = w.worker_id
+            WHERE b.customer_id=?
+            ORDER BY b.booking_id DESC
+        """, (customer_id,))
+        return cursor.fetchall()
+
+def get_customer_bookings_with_reviews(customer_id):
+    """Customer booking history with review state, in one query.
+
+    Row: (booking_id, worker_id, worker_name, skill, service_date, status,
+          address, notes, reviewed, review_rating)
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT b.booking_id, b.worker_id, w.name, w.skill, b.service_date, b.status, b.address, b.notes,
+                   r.review_id IS NOT NULL, r.rating
+            FROM bookings b
+            LEFT JOIN workers w ON b.worker_id = w.worker_id
+            LEFT JOIN reviews r ON r.booking_id = b.booking_id
+            WHERE b.customer_id=?
+            ORDER BY b.booking_id DESC
+        """, (customer_id,))
+        return cursor.fetchall()
 
 def get_bookings_by_worker(worker_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT b.booking_id, b.customer_id, u.name, u.phone, b.service_date, b.status, b.address, b.notes
-        FROM bookings b
-        LEFT JOIN users u ON b.customer_id = u.user_id
-        WHERE b.worker_id=?
-        ORDER BY b.booking_id DESC
-    """, (worker_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT b.booking_id, b.customer_id, u.name, u.phone, b.service_date, b.status, b.address, b.notes
+            FROM bookings b
+            LEFT JOIN users u ON b.customer_id = u.user_id
+            WHERE b.worker_id=?
+            ORDER BY b.booking_id DESC
+        """, (worker_id,))
+        return cursor.fetchall()
 
 def update_booking_status(booking_id, status):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE bookings SET status=? WHERE booking_id=?", (status, booking_id))
-        conn.commit()
-        return True, None
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+    # Accepting onto a day that is already taken is refused by trigger
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE bookings SET status=? WHERE booking_id=?", (status, booking_id))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
 
 # ------------------------------------------------
-#                  RATING SYSTEM (U2)
+#                 WORKER CALENDAR
 # ------------------------------------------------
-def _update_worker_average_rating(worker_id):
-    conn = get_connection()
-    cursor = conn.cursor()
+CALENDAR_STATUSES = ("Accepted", "Completed")   # booking statuses that take the worker's day
+CALENDAR_MAX_DAYS = 366     # longest range block_days() and get_worker_calendar() accept
+FREE_WORKERS_LIMIT = 50
+
+# The day a booking is for ("2025-03-14 10:00" -> "2025-03-14"), NULL if unreadable
+_CALENDAR_DAY_SQL = "date(substr({row}.service_date, 1, 10))"
+# Does [start, end) overlap one of the worker's intervals (other than the booking's own)?
+# Intervals don't overlap each other, so only the last one starting before `end` can.
+_CALENDAR_CLASH_SQL = """EXISTS (
+    SELECT 1 FROM (SELECT end_at, booking_id FROM worker_calendar
+                   WHERE worker_id = {worker} AND start_at < {end}
+                   ORDER BY start_at DESC LIMIT 1)
+    WHERE end_at > {start} AND booking_id IS NOT {booking})"""
+
+def _calendar_day(value):
+    """'YYYY-MM-DD' for a date or a 'YYYY-MM-DD[ HH:MM]' string, None if it isn't one."""
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
     try:
-        cursor.execute("SELECT AVG(rating) FROM reviews WHERE worker_id=?", (worker_id,))
-        avg_rating = cursor.fetchone()[0]
-        if avg_rating is None:
-            avg_rating = 0
-        cursor.execute("UPDATE workers SET rating=? WHERE worker_id=?", (avg_rating, worker_id))
-        conn.commit()
-    except Exception as e:
-        print(f"Error updating rating: {e}")
-    finally:
-        conn.close()
+        return datetime.datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def _next_day(day):
+    return (datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat()
+
+def _day_range(first_day, last_day=None):
+    """(first, day after last, error) for an inclusive range of days."""
+    first = _calendar_day(first_day)
+    last = first if last_day is None else _calendar_day(last_day)
+    if first is None or last is None:
+        return None, None, "Dates must look like 2025-03-14."
+    if last < first:
+        return None, None, "The last day is before the first."
+    end = _next_day(last)
+    if (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(first)).days > CALENDAR_MAX_DAYS:
+        return None, None, f"Pick at most {CALENDAR_MAX_DAYS} days at a time."
+    return first, end, None
+
+def _calendar_clash(cursor, worker_id, start, end):
+    """(kind, booking_id, start_at) of the worker's interval overlapping [start, end), or None."""
+    cursor.execute("""
+        SELECT kind, booking_id, start_at, end_at FROM worker_calendar
+        WHERE worker_id = ? AND start_at < ?
+        ORDER BY start_at DESC LIMIT 1
+    """, (worker_id, end))
+    row = cursor.fetchone()
+    return row[:3] if row and row[3] > start else None
+
+def is_worker_free(worker_id, day):
+    """True unless the worker has an accepted booking on that day or blocked it."""
+    day = _calendar_day(day)
+    if day is None:
+        return False
+    with pooled_connection() as conn:
+        return _calendar_clash(conn.cursor(), worker_id, day, _next_day(day)) is None
+
+def get_worker_calendar(worker_id, first_day, days=31):
+    """The worker's taken days from first_day on: [(day, kind, booking_id)], kind 'booked' or 'blocked'.
+
+    Every interval is one day long, so a day's entry starts on that day.
+    """
+    first = _calendar_day(first_day)
+    if first is None:
+        return []
+    end = (datetime.date.fromisoformat(first) + datetime.timedelta(days=max(1, min(days, CALENDAR_MAX_DAYS)))).isoformat()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT start_at, kind, booking_id FROM worker_calendar
+            WHERE worker_id = ? AND start_at >= ? AND start_at < ?
+            ORDER BY start_at
+        """, (worker_id, first, end))
+        return cursor.fetchall()
+
+def block_days(worker_id, first_day, last_day=None):
+    """Marks first_day..last_day (inclusive) as days off. Refused if one of them is booked."""
+    first, end, err = _day_range(first_day, last_day)
+    if err:
+        return False, err
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # IMMEDIATE: nothing can be accepted between the check and the insert
+            cursor.execute("BEGIN IMMEDIATE")
+            taken = dict(cursor.execute("""
+                SELECT start_at, kind FROM worker_calendar
+                WHERE worker_id = ? AND start_at >= ? AND start_at < ?
+            """, (worker_id, first, end)).fetchall())
+            booked = sorted(day for day, kind in taken.items() if kind == "booked")
+            if booked:
+                conn.rollback()
+                return False, "You have accepted bookings on " + ", ".join(booked) + "."
+            days = []
+            day = first
+            while day < end:
+                if day not in taken:
+                    days.append((worker_id, day, _next_day(day)))
+                day = _next_day(day)
+            cursor.executemany("""
+                INSERT INTO worker_calendar (worker_id, start_at, end_at, kind)
+                VALUES (?, ?, ?, 'blocked')
+            """, days)
+            conn.commit()
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
 
+def unblock_days(worker_id, first_day, last_day=None):
+    """Makes blocked days in first_day..last_day (inclusive) workable again."""
+    first, end, err = _day_range(first_day, last_day)
+    if err:
+        return False, err
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                DELETE FROM worker_calendar
+                WHERE worker_id = ? AND start_at >= ? AND start_at < ? AND kind = 'blocked'
+            """, (worker_id, first, end))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
+
+def find_free_workers(day, skill=None, min_price=None, max_price=None, availability="Available",
+                      limit=FREE_WORKERS_LIMIT):
+    """Workers free on `day`, cheapest first, as the usual 8-column search tuples.
+
+    Walks the workers matching the filters in price order and checks each
+    one's calendar with a single index seek, stopping at `limit`; the
+    bookings table isn't read at all.
+    """
+    day = _calendar_day(day)
+    if day is None:
+        return []
+    clauses, params = _search_filters(skill, min_price, max_price, availability)
+    where = " AND ".join(clauses + ["""IFNULL((SELECT c.end_at FROM worker_calendar c
+                                               WHERE c.worker_id = w.worker_id AND c.start_at < ?
+                                               ORDER BY c.start_at DESC LIMIT 1), '') <= ?"""])
+    # Same order as the price index each case can walk
+    order = "w.price_per_hour, w.worker_id" if skill and skill != "All" else "IFNULL(w.price_per_hour, 0), w.worker_id"
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_SEARCH_COLUMNS} FROM workers w WHERE {where} ORDER BY {order} LIMIT ?",
+                       params + [_next_day(day), day, limit])
+        return cursor.fetchall()
+
+# ------------------------------------------------
+#                  RATING SYSTEM (U2)
+# ------------------------------------------------
 def add_review(booking_id, customer_id, worker_id, rating, review_text):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # The worker's rating totals are updated by trigger in the same transaction
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            created = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                INSERT INTO reviews (booking_id, customer_id, worker_id, rating, review_text, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (booking_id, customer_id, worker_id, rating, review_text, created))
+            conn.commit()
+            return True, None
+        except sqlite3.IntegrityError:
+            return False, "A review for this booking already exists."
+        except Exception as e:
+            return False, str(e)
+
+def check_rating_consistency(repair=False):
+    """Compares each worker's stored rating totals with the reviews table.
+
+    Returns a list of (worker_id, stored_sum, stored_count, actual_sum,
+    actual_count) for workers that have drifted. With repair=True those
+    workers are recomputed from their reviews.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO reviews (booking_id, customer_id, worker_id, rating, review_text, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (booking_id, customer_id, worker_id, rating, review_text, created))
-        conn.commit()
-        _update_worker_average_rating(worker_id)
-        return True, None
-    except sqlite3.IntegrityError:
-        return False, "A review for this booking already exists."
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+            SELECT w.worker_id, w.rating_sum, w.rating_count,
+                   COALESCE(r.actual_sum, 0), COALESCE(r.actual_count, 0)
+            FROM workers w
+            LEFT JOIN (SELECT worker_id, SUM(rating) AS actual_sum, COUNT(rating) AS actual_count
+                       FROM reviews GROUP BY worker_id) r ON r.worker_id = w.worker_id
+            WHERE w.rating_sum != COALESCE(r.actual_sum, 0)
+               OR w.rating_count != COALESCE(r.actual_count, 0)
+        """)
+        drifted = cursor.fetchall()
+        if repair and drifted:
+            _rebuild_rating_aggregates(cursor, [row[0] for row in drifted])
+            conn.commit()
+        return drifted
 
 def check_if_reviewed(booking_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM reviews WHERE booking_id=?", (booking_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM reviews WHERE booking_id=?", (booking_id,))
+        row = cursor.fetchone()
     return row is not None
 
 # ------------------------------------------------
 #                  CHAT SYSTEM (U3)
 # ------------------------------------------------
 def send_message(booking_id, sender_id, sender_type, message):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            INSERT INTO messages (booking_id, sender_id, sender_type, message_text, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (booking_id, sender_id, sender_type, message, ts))
-        conn.commit()
-        return True, None
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.execute("""
+                INSERT INTO messages (booking_id, sender_id, sender_type, message_text, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, (booking_id, sender_id, sender_type, message, ts))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            return False, str(e)
 
 def get_messages(booking_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT sender_id, sender_type, message_text, timestamp
-        FROM messages
-        WHERE booking_id = ?
-        ORDER BY timestamp ASC
-    """, (booking_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT sender_id, sender_type, message_text, timestamp
+            FROM messages
+            WHERE booking_id = ?
+            ORDER BY message_id ASC
+        """, (booking_id,))
+        return cursor.fetchall()
+
+def get_messages_since(booking_id, last_message_id=0):
+    """Messages on a booking newer than last_message_id, oldest first.
+
+    Row: (message_id, sender_id, sender_type, message_text, timestamp)
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT message_id, sender_id, sender_type, message_text, timestamp
+            FROM messages
+            WHERE booking_id = ? AND message_id > ?
+            ORDER BY message_id ASC
+        """, (booking_id, last_message_id))
+        return cursor.fetchall()
+
+# ------------------------------------------------
+#                  CHANGE FEED
+# ------------------------------------------------
+# Pollers keep a token (the last change_id they saw) and only refetch
+# when their scope moved: one get_change_token() or get_changes_since()
+# call per tick. Scopes:
+#   'worker:<id>'   bookings for that worker
+#   'customer:<id>' bookings and reviews for that customer
+#   'booking:<id>'  chat messages on that booking
+#   'workers' / 'users' / 'bookings'   whole-table changes (admin, catalog)
+# scope=None means any change at all.
+CHANGE_LOG_KEEP = 50000   # rows kept by prune_change_log()
+CHANGE_LOG_PRUNE_EVERY = 500   # polls between prune_change_log() runs; 0 turns it off
+
+_change_polls = {"count": 0}
+_change_polls_lock = threading.Lock()
+
+def _prune_due():
+    """Counts a poll; True once every CHANGE_LOG_PRUNE_EVERY polls.
+
+    connect_db() prunes once at start-up; this keeps the log bounded in a
+    kiosk that stays open for weeks.
+    """
+    if not CHANGE_LOG_PRUNE_EVERY:
+        return False
+    with _change_polls_lock:
+        _change_polls["count"] += 1
+        return _change_polls["count"] % CHANGE_LOG_PRUNE_EVERY == 0
+
+def _change_token(conn, scope):
+    if scope is None:
+        row = conn.execute("SELECT MAX(change_id) FROM change_log").fetchone()
+    else:
+        row = conn.execute("SELECT MAX(change_id) FROM change_log WHERE scope = ?", (scope,)).fetchone()
+    return row[0] or 0
+
+def get_change_token(scope=None):
+    """Current position of the change feed (0 if nothing has changed yet)."""
+    with pooled_connection() as conn:
+        token = _change_token(conn, scope)
+    if _prune_due():
+        prune_change_log()
+    return token
+
+def has_changes_since(token, scope=None):
+    """True if anything in scope changed after token. One index lookup."""
+    return get_change_token(scope) > token
+
+def get_changes_since(token, scope=None, limit=1000):
+    """Returns (changes, new_token).
+
+    changes is a list of (change_id, entity, entity_id, op) after token,
+    oldest first. It is None when token is older than the retained log
+    (see prune_change_log), meaning the caller should do a full reload.
+    """
+    if _prune_due():
+        # Before borrowing a connection, so one poll never holds two
+        prune_change_log()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        oldest = cursor.execute("SELECT MIN(change_id) FROM change_log").fetchone()[0]
+        if oldest is not None and token < oldest - 1:
+            # On this connection: borrowing a second one can drain the pool
+            return None, _change_token(conn, scope)
+        if scope is None:
+            cursor.execute("""
+                SELECT change_id, entity, entity_id, op FROM change_log
+                WHERE change_id > ? ORDER BY change_id LIMIT ?
+            """, (token, limit))
+        else:
+            cursor.execute("""
+                SELECT change_id, entity, entity_id, op FROM change_log
+                WHERE scope = ? AND change_id > ? ORDER BY change_id LIMIT ?
+            """, (scope, token, limit))
+        changes = cursor.fetchall()
+    new_token = changes[-1][0] if changes else token
+    return changes, new_token
+
+def prune_change_log(keep=CHANGE_LOG_KEEP):
+    """Drops all but the newest `keep` change rows."""
+    with pooled_connection() as conn:
+        try:
+            conn.execute("DELETE FROM change_log WHERE change_id <= (SELECT MAX(change_id) FROM change_log) - ?", (keep,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Change log prune skipped: {e}")
+
+# ------------------------------------------------
+#                 ANALYTICS ROLLUPS
+# ------------------------------------------------
+# Writes only mark days dirty; the rollups catch up here, either from
+# get_analytics() or from a periodic job calling refresh_rollups().
+
+def refresh_rollups():
+    """Brings the daily rollups up to date. Returns the number of days recomputed."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        if cursor.execute("SELECT 1 FROM rollup_dirty LIMIT 1").fetchone() is None:
+            return 0
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            count = _refresh_rollup_days(cursor)
+            conn.commit()
+            return count
+        except Exception:
+            conn.rollback()
+            raise
+
+def rebuild_rollups():
+    """Recomputes every day from the raw tables (repair)."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("bookings", "reviews", "users", "workers"):
+                cursor.execute(f"""
+                    INSERT INTO rollup_dirty (day)
+                    SELECT DISTINCT substr(created_at, 1, 10) FROM {table} WHERE created_at IS NOT NULL
+                    ON CONFLICT(day) DO NOTHING
+                """)
+            cursor.execute("""
+                INSERT INTO rollup_dirty (day)
+                SELECT day FROM (SELECT day FROM daily_bookings UNION SELECT day FROM daily_signups
+                                 UNION SELECT day FROM daily_skill_ratings) WHERE true
+                ON CONFLICT(day) DO NOTHING
+            """)
+            count = _refresh_rollup_days(cursor)
+            conn.commit()
+            return count
+        except Exception:
+            conn.rollback()
+            raise
+
+def get_analytics(days=365):
+    """Rollup figures for the last `days` days (today included).
+
+    Returns a dict with:
+      "start", "end"       -- the day range, as "YYYY-MM-DD"
+      "bookings_by_day"    -- [(day, count)]
+      "signups_by_day"     -- [(day, users, workers)]
+      "bookings_by_skill"  -- [(skill, status, count)]
+      "rating_by_skill"    -- [(skill, average, review_count)]
+    Only rollup tables are read, so the cost depends on the range, not
+    on the size of bookings/reviews.
+    """
+    refresh_rollups()
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=days - 1)
+    window = (start.isoformat(), end.isoformat())
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT day, SUM(count) FROM daily_bookings
+            WHERE day BETWEEN ? AND ? GROUP BY day ORDER BY day
+        """, window)
+        bookings_by_day = cursor.fetchall()
+        cursor.execute("""
+            SELECT day, users, workers FROM daily_signups
+            WHERE day BETWEEN ? AND ? ORDER BY day
+        """, window)
+        signups_by_day = cursor.fetchall()
+        cursor.execute("""
+            SELECT skill, status, SUM(count) FROM daily_bookings
+            WHERE day BETWEEN ? AND ? GROUP BY skill, status ORDER BY skill, status
+        """, window)
+        bookings_by_skill = cursor.fetchall()
+        cursor.execute("""
+            SELECT skill, SUM(rating_sum) * 1.0 / SUM(rating_count), SUM(rating_count)
+            FROM daily_skill_ratings
+            WHERE day BETWEEN ? AND ? GROUP BY skill ORDER BY skill
+        """, window)
+        rating_by_skill = cursor.fetchall()
+    return {
+        "start": window[0],
+        "end": window[1],
+        "bookings_by_day": bookings_by_day,
+        "signups_by_day": signups_by_day,
+        "bookings_by_skill": bookings_by_skill,
+        "rating_by_skill": rating_by_skill,
+    }
+
+# ------------------------------------------------
+#                     EXPORT
+# ------------------------------------------------
+# Streaming reads for export_data.py. Rows come off the cursor
+# fetch_size at a time, so memory stays flat however large the table.
+EXPORT_FETCH_SIZE = 1000
+
+# kind -> (columns, query, date column, booking status column, order).
+# The order follows an index (or the rowid) so rows stream without a sort.
+EXPORT_QUERIES = {
+    "bookings": (
+        ("booking_id", "customer_id", "customer_name", "worker_id", "worker_name", "skill",
+         "service_date", "status", "address", "notes", "created_at"),
+        """SELECT b.booking_id, b.customer_id, u.name, b.worker_id, w.name, w.skill,
+                  b.service_date, b.status, b.address, b.notes, b.created_at
+           FROM bookings b
+           LEFT JOIN users u ON u.user_id = b.customer_id
+           LEFT JOIN workers w ON w.worker_id = b.worker_id""",
+        "b.created_at", "b.status", "b.created_at, b.booking_id",
+    ),
+    "reviews": (
+        ("review_id", "booking_id", "customer_id", "worker_id", "worker_name", "skill",
+         "rating", "review_text", "booking_status", "created_at"),
+        """SELECT r.review_id, r.booking_id, r.customer_id, r.worker_id, w.name, w.skill,
+                  r.rating, r.review_text, b.status, r.created_at
+           FROM reviews r
+           LEFT JOIN workers w ON w.worker_id = r.worker_id
+           LEFT JOIN bookings b ON b.booking_id = r.booking_id""",
+        "r.created_at", "b.status", "r.created_at, r.review_id",
+    ),
+    "messages": (
+        ("message_id", "booking_id", "sender_type", "sender_id", "message_text",
+         "booking_status", "timestamp"),
+        """SELECT m.message_id, m.booking_id, m.sender_type, m.sender_id, m.message_text,
+                  b.status, m.timestamp
+           FROM messages m
+           LEFT JOIN bookings b ON b.booking_id = m.booking_id""",
+        "m.timestamp", "b.status", "m.message_id",
+    ),
+}
+
+def export_columns(kind):
+    return EXPORT_QUERIES[kind][0]
+
+def iter_export_rows(kind, start=None, end=None, status=None, fetch_size=EXPORT_FETCH_SIZE):
+    """Yields export rows of kind ("bookings", "reviews" or "messages").
+
+    start / end are inclusive "YYYY-MM-DD" days on the row's creation
+    time; status filters on the (related) booking's status. The pooled
+    connection is held until the generator is exhausted or closed, so
+    use it in a for loop or close() it when stopping early.
+    """
+    columns, sql, date_col, status_col, order = EXPORT_QUERIES[kind]
+    where, params = [], []
+    if start:
+        where.append(f"{date_col} >= ?")
+        params.append(start)
+    if end:
+        where.append(f"{date_col} < date(?, '+1 day')")
+        params.append(end)
+    if status:
+        where.append(f"{status_col} = ?")
+        params.append(status)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order}"
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+
+# ------------------------------------------------
+#                  PHOTO FUNCTIONS
+# ------------------------------------------------
+PHOTO_GC_GRACE = 24 * 3600   # seconds an unreferenced upload is kept
+
+def store_legacy_photos():
+    """Copies worker photos saved before the photo store into it and repoints the rows.
+
+    Safe to run again: rows already on a store path are left alone, so a
+    photo skipped once (missing file, unreadable) is tried on the next run.
+    The files are copied with no transaction open; the rows are then
+    updated in one short one. Returns (stored, skipped): the number of
+    worker rows moved and a list of (path, reason) left as they were.
+    """
+    with pooled_connection() as conn:
+        rows = conn.execute("SELECT worker_id, photo FROM workers WHERE photo IS NOT NULL").fetchall()
+    by_path = {}
+    for worker_id, path in rows:
+        if not photo_store.is_store_path(path.replace("\\", "/")):
+            by_path.setdefault(path, []).append(worker_id)
+
+    updates, skipped = [], []
+    for old_path, worker_ids in by_path.items():
+        source = photo_store.resolve(old_path)
+        if not os.path.isfile(source):
+            skipped.append((old_path, f"file not found ({source})"))
+            continue
+        try:
+            new_path = photo_store.store_photo(source)
+        except OSError as e:
+            skipped.append((old_path, str(e)))
+            continue
+        updates.extend((new_path, worker_id, old_path) for worker_id in worker_ids)
+
+    if updates:
+        # A copy whose update fails is unreferenced, and gc_photos() removes it
+        with pooled_connection() as conn:
+            try:
+                # The photo may have changed since it was read; those rows keep the new one
+                conn.executemany("UPDATE workers SET photo = ? WHERE worker_id = ? AND photo = ?", updates)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    return len(updates), skipped
+
+def gc_photos(grace_seconds=PHOTO_GC_GRACE, dry_run=False):
+    """Deletes photo files no worker references any more.
+
+    Files younger than grace_seconds are kept, so a photo picked in a
+    form that hasn't been saved yet isn't swept away. Returns
+    (removed_paths, freed_bytes).
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT path FROM photo_refs WHERE ref_count > 0")
+        # Older rows may carry Windows separators; files are listed with "/"
+        referenced = {row[0].replace("\\", "/") for row in cursor.fetchall()}
+
+        cutoff = time.time() - grace_seconds
+        removed, freed = [], 0
+        for path, mtime, size in list(photo_store.iter_photo_files()):
+            if path in referenced or mtime > cutoff:
+                continue
+            if not dry_run:
+                try:
+                    photo_store.remove_photo(path)
+                except OSError as e:
+                    print(f"Could not remove photo {path}: {e}")
+                    continue
+            removed.append(path)
+            freed += size
+
+        if not dry_run:
+            cursor.execute("DELETE FROM photo_refs WHERE ref_count <= 0")
+            conn.commit()
+        return removed, freed
 
 # ------------------------------------------------
 #                  ADMIN FUNCTIONS (U4)
 # ------------------------------------------------
+def verify_admin(username, plain_password):
+    """Checks admin credentials."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM admin WHERE username=? AND password=?",
+                       (username, hash_password(plain_password)))
+        return cursor.fetchone() is not None
+
+BOOKING_STATUSES = ("Pending", "Accepted", "Rejected", "Completed")
+
 def get_app_stats():
-    """Fetches count of users, workers, and bookings."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM workers")
-        worker_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM bookings")
-        booking_count = cursor.fetchone()[0]
-        return {"users": user_count, "workers": worker_count, "bookings": booking_count}
-    except Exception as e:
-        return {"users": 0, "workers": 0, "bookings": 0}
-    finally:
-        conn.close()
+    """Fetches count of users, workers, bookings and reviews.
+
+    Read from the trigger-maintained app_counters table. "by_status"
+    maps each booking status to its count.
+    """
+    stats = {"users": 0, "workers": 0, "bookings": 0, "reviews": 0,
+             "by_status": dict.fromkeys(BOOKING_STATUSES, 0)}
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT name, value FROM app_counters")
+            for name, value in cursor.fetchall():
+                if name.startswith("bookings:"):
+                    stats["by_status"][name[len("bookings:"):]] = value
+                else:
+                    stats[name] = value
+        except Exception as e:
+            print(f"Stats error: {e}")
+    return stats
+
+def rebuild_app_stats():
+    """Recounts the stats counters from the tables. Returns the corrected stats."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            _rebuild_app_counters(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_app_stats()
 
 def get_all_users():
     """Fetches all customer details for admin table."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT user_id, name, email, phone, address FROM users")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, name, email, phone, address FROM users")
+        return cursor.fetchall()
+
+ADMIN_PAGE_SIZE = 200
+
+def _admin_page(table, columns, offset, limit, after, before, newest_first=False):
+    """Rows of `table` ordered by its primary key (the first column). Returns (rows, total).
+
+    after / before page by keyset: the rows right after or right before
+    that key, in table order, read straight off the primary key. Only
+    a slice with neither (a jump) pays for OFFSET. The total comes from
+    app_counters instead of a COUNT(*) scan.
+    """
+    key = columns.split(",")[0].strip()
+    asc, desc = ("DESC", "ASC") if newest_first else ("ASC", "DESC")
+    later, earlier = ("<", ">") if newest_first else (">", "<")
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        row = cursor.execute("SELECT value FROM app_counters WHERE name = ?", (table,)).fetchone()
+        total = row[0] if row else cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if after is not None:
+            cursor.execute(f"SELECT {columns} FROM {table} WHERE {key} {later} ? ORDER BY {key} {asc} LIMIT ?",
+                           (after, limit))
+            return cursor.fetchall(), total
+        if before is not None:
+            cursor.execute(f"SELECT {columns} FROM {table} WHERE {key} {earlier} ? ORDER BY {key} {desc} LIMIT ?",
+                           (before, limit))
+            return cursor.fetchall()[::-1], total
+        cursor.execute(f"SELECT {columns} FROM {table} ORDER BY {key} {asc} LIMIT ? OFFSET ?", (limit, offset))
+        return cursor.fetchall(), total
+
+def get_users_page(offset=0, limit=ADMIN_PAGE_SIZE, after=None, before=None):
+    """One slice of the admin customer table. Returns (rows, total)."""
+    return _admin_page("users", "user_id, name, email, phone, address", offset, limit, after, before)
 
 def delete_user(user_id):
     """Deletes a user and all their related data (bookings, reviews)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("PRAGMA foreign_keys = ON;")
-        # Deleting user will set related fields in bookings/reviews to NULL (due to ON DELETE SET NULL)
-        cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-        # We also delete their messages
-        cursor.execute("DELETE FROM messages WHERE sender_id = ? AND sender_type = 'customer'", (user_id,))
-        conn.commit()
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Deleting user will set related fields in bookings/reviews to NULL (due to ON DELETE SET NULL)
+            cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            # We also delete their messages
+            cursor.execute("DELETE FROM messages WHERE sender_id = ? AND sender_type = 'customer'", (user_id,))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
 
 def get_all_workers():
     """Fetches all worker details for admin table."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT worker_id, name, skill, phone, rating, availability FROM workers")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT worker_id, name, skill, phone, rating, availability FROM workers")
+        return cursor.fetchall()
+
+def get_workers_page(offset=0, limit=ADMIN_PAGE_SIZE, after=None, before=None):
+    """One slice of the admin worker table. Returns (rows, total)."""
+    return _admin_page("workers", "worker_id, name, skill, phone, rating, availability", offset, limit, after, before)
 
 def delete_worker(worker_id):
     """Deletes a worker and all their related data."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("PRAGMA foreign_keys = ON;")
-        cursor.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
-        cursor.execute("DELETE FROM messages WHERE sender_id = ? AND sender_type = 'worker'", (worker_id,))
-        conn.commit()
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+            cursor.execute("DELETE FROM messages WHERE sender_id = ? AND sender_type = 'worker'", (worker_id,))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            return False, str(e)
 
 def get_all_bookings():
     """Fetches all booking details for admin table."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT booking_id, customer_id, worker_id, service_date, status, address FROM bookings")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT booking_id, customer_id, worker_id, service_date, status, address FROM bookings")
+        return cursor.fetchall()
+
+def get_bookings_page(offset=0, limit=ADMIN_PAGE_SIZE, after=None, before=None):
+    """One slice of the admin booking table, newest first. Returns (rows, total)."""
+    return _admin_page("bookings", "booking_id, customer_id, worker_id, service_date, status, address",
+                       offset, limit, after, before, newest_first=True)
+
+# ---------- Tracing (opt-in, see db_trace.py) ----------
+# Connection plumbing stays unwrapped; everything a screen calls is traced.
+_UNTRACED = {"get_connection", "get_pool", "pooled_connection", "close_pool",
+             "hash_password", "export_columns"}
 
+if db_trace.enabled():
+    db_trace.instrument(globals(), [
+        name for name, value in list(globals().items())
+        if callable(value) and not name.startswith("_") and name not in _UNTRACED
+        and getattr(value, "__module__", None) == __name__ and not isinstance(value, type)
+    ])
 
 # Auto init
 if __name__ == "__main__":
     connect_db()
-    print("Database initialized:", os.path.exists(DB_FILE))
\ No newline at end of file
+    print("Database initialized:", os.path.exists(DB_FILE))
+    print("Pragmas:", get_active_pragmas())
+    print("Connection pool:", get_pool_stats())
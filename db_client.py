@@ -0,0 +1,171 @@
+# db_client.py
+# Lets the Tk apps use server.py instead of opening the database file
+#
+# The apps do `from db_client import database`. With VILLAGE_DB_URL unset
+# that is the plain database module; with e.g.
+#   VILLAGE_DB_URL=http://192.168.1.10:8765
+# it is a RemoteDatabase whose functions make HTTP calls to the server.
+# If the server has a token, set the same VILLAGE_DB_TOKEN on the client.
+#
+# Load test (against a scratch database!):
+#   python server.py --db /tmp/load.db --quiet
+#   python db_client.py loadtest --url http://127.0.0.1:8765 --threads 16 --seconds 10
+
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import database as local_database
+from server import API_PREFIX, READ_FUNCTIONS, TOKEN_ENV, WRITE_FUNCTIONS, from_json, to_json
+
+SERVER_URL = os.environ.get("VILLAGE_DB_URL", "")
+SERVER_TOKEN = os.environ.get(TOKEN_ENV, "")
+
+class RemoteDatabaseError(Exception):
+    """The server answered with an error (or couldn't be reached)."""
+
+# ===================================================================
+# REMOTE DATABASE
+# ===================================================================
+class RemoteDatabase:
+    """Drop-in stand-in for the database module that talks to server.py.
+
+    Each thread keeps its own keep-alive connection. Exposed functions
+    become HTTP calls and return the same values, tuples included (the
+    server tags them, see server.to_json). Upper-case constants such as
+    BOOKING_STATUSES still come from the local module; any other name
+    the server doesn't expose raises AttributeError rather than quietly
+    using the local database file. connect_db() is a no-op, the server
+    migrates.
+    """
+
+    def __init__(self, url, timeout=30, token=SERVER_TOKEN):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._headers = {"Content-Type": "application/json"}
+        if token:
+            self._headers["Authorization"] = f"Bearer {token}"
+        self._local = threading.local()
+
+    def _connection(self, fresh=False):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _post(self, conn, name, body):
+        conn.request("POST", API_PREFIX + name, body, self._headers)
+        response = conn.getresponse()
+        return json.loads(response.read())
+
+    def call(self, name, *args, **kwargs):
+        body = json.dumps(to_json({"args": list(args), "kwargs": kwargs}))
+        try:
+            try:
+                payload = self._post(self._connection(), name, body)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # A kept-alive socket the server has since dropped. Writes
+                # aren't retried: the first attempt may already have run.
+                if name in WRITE_FUNCTIONS:
+                    raise
+                payload = self._post(self._connection(fresh=True), name, body)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            self._connection(fresh=True)
+            raise RemoteDatabaseError(f"{name}: server unreachable ({e})") from e
+        if not payload.get("ok"):
+            raise RemoteDatabaseError(f"{name}: {payload.get('error')}")
+        return from_json(payload["result"])
+
+    def connect_db(self):
+        pass
+
+    def __getattr__(self, name):
+        if name in READ_FUNCTIONS or name in WRITE_FUNCTIONS:
+            def remote(*args, **kwargs):
+                return self.call(name, *args, **kwargs)
+            remote.__name__ = name
+            setattr(self, name, remote)   # later lookups skip __getattr__
+            return remote
+        if name.isupper() and hasattr(local_database, name):
+            return getattr(local_database, name)
+        raise AttributeError(f"{name} is not available through the server")
+
+def get_database(url=SERVER_URL):
+    """The database API to use: remote if a server URL is configured."""
+    return RemoteDatabase(url) if url else local_database
+
+database = get_database()
+
+# ===================================================================
+# LOAD TEST
+# ===================================================================
+def _load_worker(db, deadline, write_ratio, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if random.random() < write_ratio:
+                tag = uuid.uuid4().hex[:12]
+                db.register_customer(f"Load {tag}", f"{tag}@load.test", tag, "load")
+            else:
+                op = random.random()
+                if op < 0.5:
+                    db.search_workers_page(keyword=random.choice(["", "plumb", "carp", "elec"]))
+                elif op < 0.8:
+                    db.get_change_token("workers")
+                else:
+                    db.get_app_stats()
+            latencies.append(time.perf_counter() - start)
+        except RemoteDatabaseError as e:
+            errors.append(str(e))
+
+def load_test(url, threads=8, seconds=10, write_ratio=0.05):
+    """Hammers a server with a search-heavy mix. Returns a summary dict."""
+    db = RemoteDatabase(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=_load_worker, args=(db, deadline, write_ratio, latencies, errors))
+               for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "first_error": errors[0] if errors else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Client tools for server.py.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    lt = sub.add_parser("loadtest", help="run a load test against a server")
+    lt.add_argument("--url", default=SERVER_URL or "http://127.0.0.1:8765")
+    lt.add_argument("--threads", type=int, default=8)
+    lt.add_argument("--seconds", type=float, default=10)
+    lt.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        print(load_test(args.url, args.threads, args.seconds, args.write_ratio))
+
+if __name__ == "__main__":
+    main()
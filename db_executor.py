@@ -0,0 +1,118 @@
+# db_executor.py
+# Runs database.* calls off the Tk main thread and hands results back to Tk
+
+import queue
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from db_client import database
+import ui_profile
+
+# One shared set of worker threads for every window. Sized to the
+# connection pool so threads never queue up waiting for a connection.
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+
+def _get_thread_pool():
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=database.POOL_SIZE,
+                                              thread_name_prefix="db")
+        return _thread_pool
+
+
+# ===================================================================
+# PER-WINDOW EXECUTOR
+# ===================================================================
+class DatabaseExecutor:
+    """Background runner for one Tk window.
+
+    submit() runs func(*args) on a worker thread. When it finishes, the
+    result goes into a thread-safe queue which this window drains every
+    poll_ms with after(), so callback(result) / on_error(exc) always run
+    on the Tk thread. At most max_in_flight calls run at once; extra
+    submissions wait in order, unless they pass a key that is already
+    running or queued, in which case they are dropped (handy for polls).
+    close() cancels anything not yet started and silences callbacks, so
+    a closed window never gets touched by a late result.
+    """
+
+    def __init__(self, widget, max_in_flight=4, poll_ms=30):
+        self.widget = widget
+        self.max_in_flight = max_in_flight
+        self.poll_ms = poll_ms
+        self._results = queue.Queue()
+        self._waiting = collections.deque()
+        self._running = {}       # future -> key
+        self._keys = set()
+        self._closed = False
+        self._drain_job = None
+
+    def submit(self, func, *args, callback=None, on_error=None, key=None, **kwargs):
+        """Queues func(*args, **kwargs). Returns False if it was dropped."""
+        if self._closed or (key is not None and key in self._keys):
+            return False
+        if key is not None:
+            self._keys.add(key)
+        self._waiting.append((func, args, kwargs, callback, on_error, key))
+        self._start_waiting()
+        return True
+
+    def close(self):
+        self._closed = True
+        self._waiting.clear()
+        for future in list(self._running):
+            future.cancel()
+        self._running.clear()
+        self._keys.clear()
+        if self._drain_job is not None:
+            try:
+                self.widget.after_cancel(self._drain_job)
+            except Exception:
+                pass
+            self._drain_job = None
+
+    # ---------- Internals ----------
+    def _start_waiting(self):
+        while self._waiting and len(self._running) < self.max_in_flight:
+            func, args, kwargs, callback, on_error, key = self._waiting.popleft()
+            future = _get_thread_pool().submit(func, *args, **kwargs)
+            self._running[future] = key
+            future.add_done_callback(
+                lambda f, cb=callback, eb=on_error: self._results.put((f, cb, eb)))
+        self._schedule_drain()
+
+    def _schedule_drain(self):
+        if self._drain_job is None and self._running and not self._closed:
+            self._drain_job = self.widget.after(self.poll_ms, self._drain)
+
+    def _drain(self):
+        self._drain_job = None
+        if self._closed:
+            return
+        while True:
+            try:
+                future, callback, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            key = self._running.pop(future, None)
+            self._keys.discard(key)
+            if future.cancelled():
+                continue
+            error = future.exception()
+            try:
+                if error is not None:
+                    if on_error:
+                        on_error(error)
+                    else:
+                        print(f"Background database call failed: {error}")
+                elif callback:
+                    with ui_profile.measure(callback):
+                        callback(future.result())
+            except Exception as e:
+                print(f"Error in database callback: {e}")
+            if self._closed:
+                return
+        self._start_waiting()
@@ -0,0 +1,279 @@
+# db_trace.py
+# Opt-in query tracing and slow-query log for database.py
+#
+# Off unless VILLAGE_DB_TRACE is set (to anything but "0"):
+#   VILLAGE_DB_TRACE=1            turn tracing on
+#   VILLAGE_DB_SLOW_MS=50         slow-query threshold in ms (default 100)
+#   VILLAGE_DB_SLOW_LOG=slow.log  slow-query log file (default slow_queries.log)
+#   VILLAGE_DB_TRACE_REPORT=f     write the stats as JSON here at exit
+#
+# When off, database.py opens plain sqlite3 connections and leaves its
+# functions unwrapped, so the only cost is one check at import time.
+
+import atexit
+import bisect
+import datetime
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+TRACE_ENABLED = os.environ.get("VILLAGE_DB_TRACE", "") not in ("", "0")
+SLOW_MS = float(os.environ.get("VILLAGE_DB_SLOW_MS", "100"))
+SLOW_LOG = os.environ.get("VILLAGE_DB_SLOW_LOG", "slow_queries.log")
+TRACE_REPORT = os.environ.get("VILLAGE_DB_TRACE_REPORT", "")
+
+# Upper bounds (ms) of the latency histogram buckets; the last is open-ended
+HISTOGRAM_BOUNDS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+_lock = threading.Lock()
+_functions = {}    # function name -> stats
+_statements = {}   # normalised SQL -> stats
+_current = threading.local()   # stack of traced function names per thread
+
+def enabled():
+    return TRACE_ENABLED
+
+# ===================================================================
+# STATS
+# ===================================================================
+def _new_stats():
+    return {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+            "histogram": [0] * (len(HISTOGRAM_BOUNDS) + 1)}
+
+def _record(table, key, elapsed_ms, rows):
+    with _lock:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = _new_stats()
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["rows"] += rows
+        stats["histogram"][bisect.bisect_left(HISTOGRAM_BOUNDS, elapsed_ms)] += 1
+
+def _normalize_sql(sql):
+    return " ".join(sql.split())
+
+def get_trace_stats():
+    """Copy of the collected stats: {"enabled", "functions", "statements", "histogram_ms"}."""
+    with _lock:
+        functions = {k: dict(v, histogram=list(v["histogram"])) for k, v in _functions.items()}
+        statements = {k: dict(v, histogram=list(v["histogram"])) for k, v in _statements.items()}
+    for stats in list(functions.values()) + list(statements.values()):
+        stats["total_ms"] = round(stats["total_ms"], 3)
+        stats["max_ms"] = round(stats["max_ms"], 3)
+        stats["mean_ms"] = round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0
+    return {
+        "enabled": TRACE_ENABLED,
+        "histogram_ms": list(HISTOGRAM_BOUNDS) + ["inf"],
+        "functions": functions,
+        "statements": statements,
+    }
+
+def reset_trace_stats():
+    with _lock:
+        _functions.clear()
+        _statements.clear()
+
+def write_trace_report(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(get_trace_stats(), f, indent=2)
+
+# ===================================================================
+# SLOW-QUERY LOG
+# ===================================================================
+_PLANNABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+def _explain(conn, sql, params):
+    if not sql.lstrip().upper().startswith(_PLANNABLE):
+        return []
+    try:
+        # A plain Cursor, so the EXPLAIN itself isn't traced
+        cursor = sqlite3.Cursor(conn)
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+
+def _log_slow(conn, sql, params, elapsed_ms, rows):
+    function = getattr(_current, "stack", None)
+    lines = [f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} {elapsed_ms:.1f} ms, {rows} rows"
+             f" in {function[-1] if function else '?'}()",
+             "  " + _normalize_sql(sql)]
+    lines += ["  plan: " + step for step in _explain(conn, sql, params)]
+    with _lock:
+        try:
+            with open(SLOW_LOG, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"Slow query log write failed: {e}")
+
+# ===================================================================
+# TRACED CONNECTIONS
+# ===================================================================
+class TracedCursor(sqlite3.Cursor):
+    """Times each statement from execute() until its rows are read.
+
+    A statement is finished by the next execute(), by fetchall(), by a
+    fetch that runs out of rows, or by close(); whichever comes first.
+    """
+
+    _pending = None   # [sql, params, elapsed seconds, rows]
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, elapsed, rows = pending
+        elapsed_ms = elapsed * 1000
+        _record(_statements, _normalize_sql(sql), elapsed_ms, rows)
+        if elapsed_ms >= SLOW_MS:
+            _log_slow(self.connection, sql, params, elapsed_ms, rows)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - start
+
+    def execute(self, sql, params=()):
+        self._finish()
+        self._pending = [sql, params, 0.0, 0]
+        self._timed(super().execute, sql, params)
+        if self.description is None:   # not a query: nothing to fetch
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        self._pending = [sql, (), 0.0, 0]
+        self._timed(super().executemany, sql, seq_of_params)
+        self._pending[3] = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            if not rows or len(rows) < (self.arraysize if size is None else size):
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            self._finish()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) are traced."""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+def connection_factory():
+    """The sqlite3 connection class database.get_connection() should use."""
+    return TracedConnection if TRACE_ENABLED else sqlite3.Connection
+
+# ===================================================================
+# TRACED FUNCTIONS
+# ===================================================================
+def _count_rows(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return 1 if result is not None else 0
+
+def trace_function(func):
+    """Wraps a database function to record its calls, latency and rows."""
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            stack = _current.__dict__.setdefault("stack", [])
+            start, rows = time.perf_counter(), 0
+            gen = func(*args, **kwargs)
+            try:
+                while True:
+                    # Only while the generator body runs is it "the" function
+                    stack.append(name)
+                    try:
+                        row = next(gen)
+                    except StopIteration:
+                        break
+                    finally:
+                        stack.pop()
+                    rows += 1
+                    yield row
+            finally:
+                gen.close()
+                _record(_functions, name, (time.perf_counter() - start) * 1000, rows)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _current.__dict__.setdefault("stack", [])
+        stack.append(name)
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = func(*args, **kwargs)
+            rows = _count_rows(result)
+            return result
+        finally:
+            stack.pop()
+            _record(_functions, name, (time.perf_counter() - start) * 1000, rows)
+    return wrapper
+
+def instrument(namespace, names):
+    """Replaces each named function in namespace (a module's globals()) with a traced one."""
+    for name in names:
+        namespace[name] = trace_function(namespace[name])
+
+if TRACE_ENABLED and TRACE_REPORT:
+    atexit.register(lambda: write_trace_report(TRACE_REPORT))
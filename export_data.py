@@ -0,0 +1,92 @@
+# export_data.py
+# Streaming export of bookings, reviews and chat logs to CSV / JSONL
+#
+# Usage:
+#   python export_data.py bookings --from 2025-04-01 --to 2026-03-31 -o bookings.csv
+#   python export_data.py reviews --status Completed --format jsonl > reviews.jsonl
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import database
+
+# ===================================================================
+# WRITERS
+# ===================================================================
+# Both take an iterable of rows and write each one as it arrives.
+def write_csv(columns, rows, out):
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+def write_jsonl(columns, rows, out):
+    count = 0
+    for row in rows:
+        out.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+# ===================================================================
+# EXPORT
+# ===================================================================
+def export(kind, out, fmt="csv", start=None, end=None, status=None):
+    """Streams one export to the open text file `out`. Returns the row count."""
+    database.connect_db()
+    rows = database.iter_export_rows(kind, start=start, end=end, status=status)
+    try:
+        return WRITERS[fmt](database.export_columns(kind), rows, out)
+    finally:
+        rows.close()   # hands the connection back even if writing failed
+
+def export_to_file(kind, path, fmt=None, start=None, end=None, status=None):
+    """Like export() but opens path itself; fmt defaults to the extension."""
+    fmt = fmt or ("jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv")
+    with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as out:
+        return export(kind, out, fmt, start, end, status)
+
+# ===================================================================
+# COMMAND LINE
+# ===================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export bookings, reviews or chat messages.")
+    parser.add_argument("kind", choices=sorted(database.EXPORT_QUERIES))
+    parser.add_argument("--from", dest="start", metavar="YYYY-MM-DD", help="first day to include")
+    parser.add_argument("--to", dest="end", metavar="YYYY-MM-DD", help="last day to include")
+    parser.add_argument("--status", help="only rows whose booking has this status")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="default: from -o extension, else csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--db", help=f"database file (default: {database.DB_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_FILE = args.db
+
+    if args.output:
+        count = export_to_file(args.kind, args.output, args.format, args.start, args.end, args.status)
+        print(f"Exported {count} {args.kind} to {args.output}", file=sys.stderr)
+    else:
+        fmt = args.format or "csv"
+        if fmt == "csv":
+            sys.stdout.reconfigure(newline="")   # csv writes its own line endings
+        try:
+            count = export(args.kind, sys.stdout, fmt, args.start, args.end, args.status)
+        except BrokenPipeError:
+            # Reader went away (e.g. piped into head); stop quietly and keep
+            # Python from complaining when it flushes stdout at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        print(f"Exported {count} {args.kind}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# gazetteer.py
+# Loads the offline village gazetteer used for "workers near you"
+#
+# Usage:
+#   python gazetteer.py load villages.csv            # columns: name, lat, lon
+#   python gazetteer.py load census.jsonl --replace  # drop the old list first
+#   python gazetteer.py geocode "Ward 3, Rampur"
+#
+# Loading re-geocodes every customer and worker address, so addresses
+# entered before their village was known get coordinates too.
+
+import argparse
+import sys
+
+import database
+from bulk_import import read_records
+
+# Other spellings of the three columns
+GAZETTEER_ALIASES = {
+    "village": "name", "village_name": "name",
+    "latitude": "lat", "y": "lat",
+    "longitude": "lon", "lng": "lon", "long": "lon", "x": "lon",
+}
+
+def read_villages(path, fmt=None):
+    """Returns ([(line_number, (name, lat, lon))], [(line_number, reason)]) from a CSV / JSONL file."""
+    villages, problems = [], []
+    for line_no, record in read_records(path, fmt):
+        if "_error" in record:
+            problems.append((line_no, record["_error"]))
+            continue
+        record = {GAZETTEER_ALIASES.get(k, k): v for k, v in record.items()}
+        villages.append((line_no, (record.get("name", ""), record.get("lat"), record.get("lon"))))
+    return villages, problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the offline village gazetteer.")
+    parser.add_argument("--db", help=f"database file (default: {database.DB_FILE})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="add villages from a CSV or JSONL file")
+    load.add_argument("path")
+    load.add_argument("--format", choices=["csv", "jsonl"])
+    load.add_argument("--replace", action="store_true", help="drop the current gazetteer first")
+    geocode = sub.add_parser("geocode", help="show the coordinates an address resolves to")
+    geocode.add_argument("address")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_FILE = args.db
+    database.connect_db()
+
+    if args.command == "load":
+        try:
+            villages, problems = read_villages(args.path, args.format)
+        except OSError as e:
+            print(f"Error: {e}")
+            return 1
+        loaded, rejected = database.load_gazetteer([village for _, village in villages], replace=args.replace)
+        problems += [(villages[index][0], reason) for index, reason in rejected]
+        for line_no, reason in sorted(problems):
+            print(f"  line {line_no}: {reason}")
+        print(f"Loaded {loaded} villages, rejected {len(problems)}.")
+    else:
+        lat, lon = database.geocode_address(args.address)
+        print("No village found in that address." if lat is None else f"{lat}, {lon}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
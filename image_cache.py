@@ -0,0 +1,101 @@
+# image_cache.py
+# Memory-bounded LRU cache for resized worker photos (Tkinter / PIL)
+
+import os
+import collections
+from PIL import Image, ImageTk
+
+import photo_store
+
+# About 32 MB of decoded RGBA pixels; a 100x100 card photo is ~40 KB
+IMAGE_CACHE_BYTES = 32 * 1024 * 1024
+# Files that failed to decode, remembered so they aren't re-read every render
+IMAGE_CACHE_FAILURES = 256
+
+# ===================================================================
+# IMAGE CACHE
+# ===================================================================
+class ImageCache:
+    """Keeps decoded + resized PhotoImages, least recently used first out.
+
+    Entries are keyed on (path, mtime, file size, target size), so a photo
+    that is replaced on disk is decoded again instead of served stale.
+    Memory is counted as width * height * 4 bytes per image and the oldest
+    entries are evicted once max_bytes is exceeded. Files that fail to
+    load are remembered in a separate LRU of at most max_failures keys,
+    outside the byte budget.
+
+    PhotoImages belong to one Tk interpreter, so create one cache per
+    Tk() root and drop it when that window closes.
+    """
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES, max_failures=IMAGE_CACHE_FAILURES):
+        self.max_bytes = max_bytes
+        self.max_failures = max_failures
+        self._entries = collections.OrderedDict()   # key -> (image, cost)
+        self._failed = collections.OrderedDict()    # key -> None
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path, size=(100, 100)):
+        """Returns a PhotoImage for path resized to size, or None."""
+        if not path:
+            return None
+        path = photo_store.resolve(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (path, st.st_mtime_ns, st.st_size, tuple(size))
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if key in self._failed:
+            self._failed.move_to_end(key)
+            self.hits += 1
+            return None
+
+        self.misses += 1
+        try:
+            img = Image.open(path)
+            img = img.resize(size, Image.LANCZOS)
+            photo = ImageTk.PhotoImage(img)
+        except Exception as e:
+            print(f"Error loading image {path}: {e}")
+            # The key has the file's mtime and size, so a fixed file is retried
+            self._failed[key] = None
+            while len(self._failed) > self.max_failures:
+                self._failed.popitem(last=False)
+            return None
+        cost = size[0] * size[1] * 4
+        self._entries[key] = (photo, cost)
+        self.bytes_used += cost
+        self._evict()
+        return photo
+
+    def _evict(self):
+        while self.bytes_used > self.max_bytes and len(self._entries) > 1:
+            _, (_, cost) = self._entries.popitem(last=False)
+            self.bytes_used -= cost
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._failed.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "failed": len(self._failed),
+            "bytes": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import database
+from db_client import database
 from ui_style import *
+import ui_profile
 
 # Import dashboard functions
 try:
@@ -118,15 +119,7 @@ def open_login_window():
         
         # --- ADMIN LOGIN (U4.3 UPDATE) ---
         elif user_type == "Admin":
-            conn = database.get_connection()
-            cursor = conn.cursor()
-            hashed_pw = database.hash_password(password) 
-            
-            cursor.execute("SELECT * FROM admin WHERE username=? AND password=?", (login_id, hashed_pw))
-            row = cursor.fetchone()
-            conn.close()
-
-            if row:
+            if database.verify_admin(login_id, password):
                 # --- UPDATE ---
                 root.destroy()
                 open_admin_dashboard() # Open the admin dashboard
@@ -157,4 +150,5 @@ def open_login_window():
 # RUN THE APP
 # ===================================================================
 if __name__ == "__main__":
+    ui_profile.install()   # no-op unless VILLAGE_UI_PROFILE is set
     open_login_window()
\ No newline at end of file
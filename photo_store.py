@@ -0,0 +1,97 @@
+# photo_store.py
+# Content-addressed storage for worker profile photos
+
+import os
+import hashlib
+import tempfile
+
+# Stored paths are relative to the app directory, not the working
+# directory the app happened to be started from
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PHOTO_DIR = "assets/photos"
+_HASH_CHUNK = 1024 * 1024
+
+# ===================================================================
+# STORE
+# ===================================================================
+# Every photo is saved once under its SHA-256, sharded two levels deep:
+#   assets/photos/3f/a2/3fa2...e9.jpg
+# Uploading the same picture again returns the same path, and no shard
+# directory ever holds more than a few hundred files. Paths always use
+# "/" so the string stored in workers.photo is the same on every OS.
+
+def resolve(path):
+    """The file a stored photo path refers to (relative paths are under APP_DIR)."""
+    return path if os.path.isabs(path) else os.path.join(APP_DIR, path)
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def path_for(content_hash, ext):
+    return f"{PHOTO_DIR}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{ext}"
+
+def is_store_path(path):
+    """True if path is already a content-addressed store path."""
+    if not path or not path.startswith(PHOTO_DIR + "/"):
+        return False
+    parts = path[len(PHOTO_DIR) + 1:].split("/")
+    return len(parts) == 3 and parts[2].startswith(parts[0] + parts[1])
+
+def store_photo(src_path):
+    """Copies src_path into the store (once) and returns its store path."""
+    ext = os.path.splitext(src_path)[1].lower()
+    dest_path = path_for(file_hash(src_path), ext)
+    dest_file = resolve(dest_path)
+    if os.path.exists(dest_file):
+        return dest_path
+
+    shard_dir = os.path.dirname(dest_file)
+    os.makedirs(shard_dir, exist_ok=True)
+    # Write to a temp file and rename, so a half-copied photo never
+    # appears under its final name
+    fd, tmp_path = tempfile.mkstemp(dir=shard_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out, open(src_path, "rb") as src:
+            for chunk in iter(lambda: src.read(_HASH_CHUNK), b""):
+                out.write(chunk)
+        os.replace(tmp_path, dest_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest_path
+
+def iter_photo_files():
+    """Yields (path, mtime, size) for every file under PHOTO_DIR, paths in stored form.
+
+    Covers both store files and legacy flat uploads left in PHOTO_DIR.
+    """
+    root = resolve(PHOTO_DIR)
+    if not os.path.isdir(root):
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            path = PHOTO_DIR + "/" + os.path.relpath(file_path, root).replace(os.sep, "/")
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            yield path, st.st_mtime, st.st_size
+
+def remove_photo(path):
+    """Deletes a photo file and any shard directories it leaves empty."""
+    os.remove(resolve(path))
+    shard_dir = os.path.dirname(resolve(path))
+    for _ in range(2):
+        if shard_dir == resolve(PHOTO_DIR) or not is_store_path(path):
+            break
+        try:
+            os.rmdir(shard_dir)
+        except OSError:
+            break
+        shard_dir = os.path.dirname(shard_dir)
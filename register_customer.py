@@ -3,7 +3,7 @@
 
 import tkinter as tk
 from tkinter import messagebox
-import database
+from db_client import database
 from ui_style import *
 
 # ===================================================================
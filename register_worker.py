@@ -3,11 +3,10 @@
 
 import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
-import database
+from db_client import database
 from ui_style import *
 import os
-import shutil # For copying the file
-import datetime # For unique filenames
+import photo_store
 
 # ===================================================================
 # WORKER REGISTRATION WINDOW
@@ -102,9 +101,6 @@ def open_worker_registration(parent_root):
     photo_path_var = tk.StringVar(value="No photo selected.")
     
     def select_photo():
-        assets_dir = "assets/photos"
-        os.makedirs(assets_dir, exist_ok=True)
-        
         filepath = filedialog.askopenfilename(
             title="Select Profile Photo",
             filetypes=[("Image Files", "*.png *.jpg *.jpeg")],
@@ -114,12 +110,11 @@ def open_worker_registration(parent_root):
             return
 
         try:
-            filename = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.path.basename(filepath)}"
-            dest_path = os.path.join(assets_dir, filename)
-            shutil.copy(filepath, dest_path)
+            # Identical uploads share one stored copy
+            dest_path = photo_store.store_photo(filepath)
             
             photo_path_var.set(dest_path) 
-            photo_status_label.config(text=f"Selected: {filename}", fg="green")
+            photo_status_label.config(text=f"Selected: {os.path.basename(filepath)}", fg="green")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save photo: {e}", parent=win)
             photo_path_var.set("No photo selected.")
@@ -0,0 +1,92 @@
+# search_cache.py
+# LRU cache of worker search pages, dropped whenever the workers table changes
+
+import collections
+
+SEARCH_CACHE_ENTRIES = 256   # pages; a page is WORKER_PAGE_SIZE short tuples
+SEARCH_DEBOUNCE_MS = 250     # live search waits this long after the last keystroke
+
+def normalize_search(keyword="", skill=None, availability=None, radius_km=None):
+    """The filters as search_workers_page() kwargs plus radius_km, spelled one way.
+
+    Case and extra spaces in the keyword don't change the results (FTS
+    and LIKE both ignore case), and "All" means no filter, so "Plumber ",
+    "plumber" and "  PLUMBER" all share one cache entry.
+    """
+    keyword = " ".join((keyword or "").split()).lower()
+    return {
+        "keyword": keyword,
+        "skill": None if skill in (None, "", "All") else skill,
+        "availability": None if availability in (None, "", "All") else availability,
+        "radius_km": float(radius_km) if radius_km else None,
+    }
+
+# ===================================================================
+# SEARCH CACHE
+# ===================================================================
+class SearchCache:
+    """Least-recently-used (rows, next_page_token) pages by filters + page token.
+
+    Entries belong to one position of the 'workers' change feed. Call
+    sync_token() with the latest token; if workers changed since, the
+    whole cache is dropped. put() takes the token the search was started
+    under, so a page fetched before a change can't slip in after it.
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.token = None
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(filters, page_token=None):
+        return (filters["keyword"], filters["skill"], filters["availability"], filters["radius_km"], page_token)
+
+    def get(self, key):
+        """The cached page, or None."""
+        page = self._entries.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return page
+
+    def put(self, key, page, token):
+        if token != self.token:
+            return   # fetched under an older token
+        self._entries[key] = page
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def sync_token(self, token):
+        """Adopts the latest change token. Returns True if the cache was dropped."""
+        if token == self.token:
+            return False
+        dropped = self.token is not None
+        if dropped:
+            self._entries.clear()
+            self.invalidations += 1
+        self.token = token
+        return dropped
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
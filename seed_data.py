@@ -0,0 +1,264 @@
+# seed_data.py
+# Synthetic villages, workers, customers, bookings, reviews and chats
+#
+# Usage:
+#   python seed_data.py --db bench.db --workers 100000 --customers 200000 \
+#       --bookings 1000000 --messages 5000000 --seed 42
+#
+# The same --seed, sizes and --start-date always produce the same data,
+# whatever day it is run on. Everyone gets
+# the password SEED_PASSWORD; emails are worker<N>@seed.test and
+# customer<N>@seed.test, so benchmark.py can log in as them.
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+import database
+
+SEED_PASSWORD = "password"
+WORKER_EMAIL = "worker{}@seed.test"
+CUSTOMER_EMAIL = "customer{}@seed.test"
+CHUNK = 20000
+# First day of the generated history; fixed so runs on different days match
+SEED_START_DATE = datetime.date(2025, 1, 1)
+
+VILLAGE_PARTS = ["Ram", "Shiv", "Sita", "Krishna", "Ganga", "Lakshmi", "Hanuman", "Durga",
+                 "Chandan", "Amrit", "Bhim", "Kesar", "Mohan", "Sundar", "Hari", "Gopal"]
+VILLAGE_SUFFIXES = ["pur", "nagar", "gaon", "wadi", "palli", "khera", "garh", "ganj"]
+FIRST_NAMES = ["Ramesh", "Suresh", "Mahesh", "Ganesh", "Raju", "Anil", "Sunil", "Vijay", "Ajay",
+               "Sanjay", "Ravi", "Mohan", "Sita", "Geeta", "Kavita", "Sunita", "Anita", "Pooja",
+               "Priya", "Lakshmi", "Rekha", "Manoj", "Deepak", "Arjun", "Kiran", "Meena"]
+LAST_NAMES = ["Kumar", "Singh", "Yadav", "Patel", "Sharma", "Verma", "Gupta", "Reddy", "Naik",
+              "Das", "Pawar", "Jadhav", "Patil", "Rao", "Mishra", "Chauhan"]
+# skill -> (min, max) price per hour in rupees, and how common it is
+SKILLS = {
+    "Carpenter": ((150, 450), 18),
+    "Plumber": ((150, 500), 18),
+    "Electrician": ((200, 600), 20),
+    "Painter": ((120, 350), 14),
+    "Mechanic": ((200, 550), 12),
+    "Cook": ((100, 300), 18),
+}
+BOOKING_STATUS_WEIGHTS = {"Pending": 10, "Accepted": 20, "Rejected": 10, "Completed": 60}
+CHAT_LINES = {
+    "customer": ["Hello", "Are you coming today?", "What time can you come?", "Please bring your tools.",
+                 "The address is near the temple.", "How much will it cost?", "Thank you!", "Ok"],
+    "worker": ["On the way.", "I will reach in 30 minutes.", "Yes, I can come tomorrow.",
+               "Please share the exact location.", "Work is done.", "Ok", "Thank you, sir."],
+}
+# Villages are scattered over a square this many degrees wide around
+# REGION_CENTER (roughly a district and its neighbours in Maharashtra)
+REGION_CENTER = (18.5, 74.5)
+REGION_SPAN_DEG = 2.0
+REVIEW_TEXTS = ["Good work.", "Came on time, very polite.", "Excellent job!", "Average work.",
+                "Late but did the job well.", "Not happy with the work.", "Highly recommended."]
+
+# ===================================================================
+# GENERATORS
+# ===================================================================
+# Each yields one row at a time in insert order, so nothing large is
+# ever held in memory; created_at values walk forward through `days` days.
+def make_villages(rng, count):
+    base = [part + suffix for part in VILLAGE_PARTS for suffix in VILLAGE_SUFFIXES]
+    rng.shuffle(base)
+    # Past 128 villages the names repeat with a number: "Rampur 2"
+    return [base[i % len(base)] + (f" {i // len(base) + 1}" if i >= len(base) else "") for i in range(count)]
+
+def make_gazetteer(rng, names):
+    """(name, lat, lon) for each village, for database.load_gazetteer()."""
+    half = REGION_SPAN_DEG / 2
+    return [(name, round(REGION_CENTER[0] + rng.uniform(-half, half), 5),
+             round(REGION_CENTER[1] + rng.uniform(-half, half), 5)) for name in names]
+
+def _timestamp(start, days, i, total):
+    seconds = int(days * 86400 * i / max(total, 1))
+    return (start + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def _address(rng, villages):
+    return f"Ward {rng.randint(1, 12)}, {rng.choice(villages)}"
+
+def gen_customers(rng, count, villages, start, days):
+    for i in range(count):
+        yield {"name": _name(rng), "email": CUSTOMER_EMAIL.format(i + 1), "phone": f"9{rng.randrange(10 ** 9):09d}",
+               "password": None,
+               "address": _address(rng, villages), "created_at": _timestamp(start, days, i, count)}
+
+def gen_workers(rng, count, villages, start, days):
+    skills = list(SKILLS)
+    weights = [SKILLS[s][1] for s in skills]
+    for i in range(count):
+        skill = rng.choices(skills, weights)[0]
+        low, high = SKILLS[skill][0]
+        yield {"name": _name(rng), "email": WORKER_EMAIL.format(i + 1), "phone": f"8{rng.randrange(10 ** 9):09d}",
+               "password": None, "skill": skill, "experience": rng.randint(0, 30),
+               "price_per_hour": float(rng.randrange(low, high + 1, 10)),
+               "availability": "Available" if rng.random() < 0.7 else "Not Available",
+               "address": _address(rng, villages), "photo": None,
+               "created_at": _timestamp(start, days, i, count)}
+
+def gen_bookings(rng, count, customers, workers, villages, start, days):
+    statuses = list(BOOKING_STATUS_WEIGHTS)
+    weights = list(BOOKING_STATUS_WEIGHTS.values())
+    for i in range(count):
+        created = _timestamp(start, days, i, count)
+        service = (datetime.datetime.strptime(created[:10], "%Y-%m-%d")
+                   + datetime.timedelta(days=rng.randint(0, 14))).strftime("%Y-%m-%d")
+        # A few popular workers get a large share of the work
+        worker_id = int(rng.paretovariate(1.2)) % workers + 1 if rng.random() < 0.3 else rng.randint(1, workers)
+        yield (rng.randint(1, customers), worker_id, service, rng.choices(statuses, weights)[0],
+               _address(rng, villages), rng.choice(["", "", "Urgent", "Bring ladder", "Call before coming"]), created)
+
+# ===================================================================
+# SEEDING
+# ===================================================================
+def _insert_chunks(sql, rows, label):
+    """executemany in CHUNK-sized transactions. Returns the row count."""
+    total, chunk = 0, []
+    def flush():
+        with database.pooled_connection() as conn:
+            conn.executemany(sql, chunk)
+            conn.commit()
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            flush()
+            total += len(chunk)
+            chunk = []
+            print(f"  {label}: {total}", end="\r", flush=True)
+    if chunk:
+        flush()
+        total += len(chunk)
+    print(f"  {label}: {total}")
+    return total
+
+def _bulk_people(table, rows, label):
+    hashed = database.hash_password(SEED_PASSWORD)
+    total, chunk = 0, []
+    for row in rows:
+        row["password"] = hashed
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            total += database.bulk_insert(table, chunk)[0]
+            chunk = []
+            print(f"  {label}: {total}", end="\r", flush=True)
+    if chunk:
+        total += database.bulk_insert(table, chunk)[0]
+    print(f"  {label}: {total}")
+    return total
+
+def seed(workers=1000, customers=2000, bookings=10000, messages=50000, review_ratio=0.7,
+         villages=40, days=365, seed=42, start_date=SEED_START_DATE):
+    """Fills an empty database with `days` days of history from start_date. Returns the number of rows per table."""
+    rng = random.Random(seed)
+    database.connect_db()
+    with database.pooled_connection() as conn:
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM workers UNION ALL SELECT 1 FROM users)").fetchone()[0]:
+            raise ValueError(f"{database.DB_FILE} already has users or workers; seed an empty database")
+
+    start = datetime.datetime.combine(start_date, datetime.time())
+    village_names = make_villages(rng, villages)
+    counts = {}
+    # Before the people, so their addresses are geocoded as they go in
+    counts["villages"] = database.load_gazetteer(make_gazetteer(rng, village_names))[0]
+    counts["users"] = _bulk_people("users", gen_customers(rng, customers, village_names, start, days), "customers")
+    counts["workers"] = _bulk_people("workers", gen_workers(rng, workers, village_names, start, days), "workers")
+    counts["bookings"] = _insert_chunks(
+        "INSERT INTO bookings (customer_id, worker_id, service_date, status, address, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        gen_bookings(rng, bookings, customers, workers, village_names, start, days), "bookings")
+
+    # Reviews for a share of completed bookings, skewed towards 4-5 stars
+    def gen_reviews():
+        with database.pooled_connection() as conn:
+            cursor = conn.execute("SELECT booking_id, customer_id, worker_id, created_at FROM bookings WHERE status = 'Completed' ORDER BY booking_id")
+            while True:
+                batch = cursor.fetchmany(CHUNK)
+                if not batch:
+                    break
+                for booking_id, customer_id, worker_id, created in batch:
+                    if rng.random() < review_ratio:
+                        yield (booking_id, customer_id, worker_id, rng.choices([1, 2, 3, 4, 5], [3, 5, 12, 35, 45])[0],
+                               rng.choice(REVIEW_TEXTS), created)
+    counts["reviews"] = _insert_chunks(
+        "INSERT INTO reviews (booking_id, customer_id, worker_id, rating, review_text, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        gen_reviews(), "reviews")
+
+    # Chats: spread `messages` over the bookings, a few bookings get long threads
+    def gen_messages():
+        remaining = messages
+        booking_id = 0
+        while remaining > 0 and bookings:
+            booking_id = booking_id % bookings + 1
+            length = min(remaining, max(1, int(rng.expovariate(bookings / max(messages, 1)))))
+            sender_type = "customer"
+            for n in range(length):
+                yield (booking_id, 0, sender_type, rng.choice(CHAT_LINES[sender_type]), n)
+                if rng.random() < 0.6:
+                    sender_type = "worker" if sender_type == "customer" else "customer"
+            remaining -= length
+
+    def with_details(rows):
+        # sender ids and timestamps come from the booking
+        with database.pooled_connection() as conn:
+            cursor = conn.cursor()
+            cache_id, details = None, None
+            for booking_id, _, sender_type, text, n in rows:
+                if booking_id != cache_id:
+                    cursor.execute("SELECT customer_id, worker_id, created_at FROM bookings WHERE booking_id = ?", (booking_id,))
+                    details, cache_id = cursor.fetchone(), booking_id
+                sender_id = details[0] if sender_type == "customer" else details[1]
+                sent = (datetime.datetime.strptime(details[2], "%Y-%m-%d %H:%M:%S")
+                        + datetime.timedelta(minutes=5 * n)).strftime("%Y-%m-%d %H:%M:%S")
+                yield (booking_id, sender_id, sender_type, text, sent)
+    counts["messages"] = _insert_chunks(
+        "INSERT INTO messages (booking_id, sender_id, sender_type, message_text, timestamp) VALUES (?, ?, ?, ?, ?)",
+        with_details(gen_messages()), "messages")
+
+    database.prune_change_log()
+    database.refresh_rollups()
+    return counts
+
+# ===================================================================
+# COMMAND LINE
+# ===================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic village service database.")
+    parser.add_argument("--db", default="bench.db", help="database file to create (default: bench.db)")
+    parser.add_argument("--workers", type=int, default=1000)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--review-ratio", type=float, default=0.7, help="share of completed bookings with a review")
+    parser.add_argument("--villages", type=int, default=40)
+    parser.add_argument("--days", type=int, default=365, help="history length in days")
+    parser.add_argument("--start-date", default=SEED_START_DATE.isoformat(),
+                        help=f"first day of the history, YYYY-MM-DD (default: {SEED_START_DATE.isoformat()})")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    try:
+        start_date = datetime.date.fromisoformat(args.start_date)
+    except ValueError:
+        parser.error(f"--start-date must look like 2025-01-01, not {args.start_date!r}")
+
+    if os.path.abspath(args.db) == os.path.abspath(database.DB_FILE):
+        parser.error(f"refusing to seed the live database {database.DB_FILE}")
+    database.DB_FILE = args.db
+
+    start = time.perf_counter()
+    try:
+        counts = seed(args.workers, args.customers, args.bookings, args.messages, args.review_ratio,
+                      args.villages, args.days, args.seed, start_date)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Seeded {args.db} in {time.perf_counter() - start:.1f}s: {counts}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+# server.py
+# Headless JSON-over-HTTP service wrapping database.py
+#
+# Usage:
+#   python server.py                       # 127.0.0.1:8765, village_service.db
+#   VILLAGE_DB_TOKEN=<secret> python server.py --host 0.0.0.0 --port 9000 --db /srv/village.db
+#   VILLAGE_DB_TOKEN=<secret> python server.py --admin   # also serve the admin dashboard
+#
+# Every call is  POST /api/<function>  with body {"args": [...], "kwargs": {...}}
+# and answers {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+# Tuples travel as {"__tuple__": [...]} so clients get back exactly what
+# database.py returned (plain JSON would turn them into lists).
+# GET /health returns server and pool statistics, GET /trace the query
+# stats collected when VILLAGE_DB_TRACE is set (see db_trace.py).
+#
+# With a token set (VILLAGE_DB_TOKEN or --token), every request must send
+# "Authorization: Bearer <token>". Listening on anything but loopback
+# requires one. Admin and destructive functions (ADMIN_FUNCTIONS) are
+# only served with --admin, which also requires a token.
+
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import database
+import db_trace
+
+# ===================================================================
+# EXPOSED OPERATIONS
+# ===================================================================
+# Reads run on the request thread and share the connection pool.
+READ_FUNCTIONS = {
+    # login
+    "verify_customer", "verify_worker", "verify_admin",
+    # profiles and search
+    "get_customer_details", "get_worker_profile", "get_worker_list_for_search",
+    "search_workers", "search_workers_page", "find_nearest_workers", "geocode_address",
+    # bookings and reviews
+    "get_bookings_by_customer", "get_customer_bookings_with_reviews",
+    "get_bookings_by_worker", "check_if_reviewed",
+    # calendar
+    "is_worker_free", "get_worker_calendar", "find_free_workers",
+    # chat
+    "get_messages", "get_messages_since",
+    # change feed
+    "get_change_token", "has_changes_since", "get_changes_since",
+    # admin
+    "get_app_stats", "get_all_users", "get_users_page", "get_all_workers",
+    "get_workers_page", "get_all_bookings", "get_bookings_page",
+}
+
+# Anything that can write goes through one writer thread, so writers
+# never fight over SQLite's lock.
+WRITE_FUNCTIONS = {
+    "register_customer", "register_worker", "update_worker_profile",
+    "create_booking", "update_booking_status", "add_review", "send_message",
+    "block_days", "unblock_days",
+    "delete_user", "delete_worker",
+    "check_rating_consistency", "rebuild_app_stats",
+    # refresh the rollups before reading them
+    "get_analytics", "refresh_rollups", "rebuild_rollups",
+    "gc_photos", "store_legacy_photos",
+}
+
+# Customer / worker lists (personal data), deletes and repair jobs: off
+# unless the server is started with --admin
+ADMIN_FUNCTIONS = {
+    "get_all_users", "get_users_page", "get_all_workers", "get_workers_page",
+    "get_all_bookings", "get_bookings_page",
+    "delete_user", "delete_worker",
+    "check_rating_consistency", "rebuild_app_stats", "rebuild_rollups", "gc_photos",
+    "store_legacy_photos",
+}
+
+API_PREFIX = "/api/"
+MAX_BODY = 1024 * 1024
+TOKEN_ENV = "VILLAGE_DB_TOKEN"
+CHANGE_LOG_PRUNE_SECONDS = 600
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_stopping = threading.Event()
+_settings = {"token": "", "admin": False}
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "errors": 0, "reads": 0, "writes": 0, "started": time.time()}
+
+def _count(*keys):
+    with _stats_lock:
+        for key in keys:
+            _stats[key] += 1
+
+def to_json(value):
+    """Result -> JSON-able value, tuples tagged so from_json() can restore them."""
+    if isinstance(value, tuple):
+        return {"__tuple__": [to_json(v) for v in value]}
+    if isinstance(value, list):
+        return [to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    return value
+
+def from_json(value):
+    if isinstance(value, dict):
+        if set(value) == {"__tuple__"}:
+            return tuple(from_json(v) for v in value["__tuple__"])
+        return {k: from_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [from_json(v) for v in value]
+    return value
+
+def is_exposed(name):
+    if name in ADMIN_FUNCTIONS and not _settings["admin"]:
+        return False
+    return name in READ_FUNCTIONS or name in WRITE_FUNCTIONS
+
+def call(name, args=(), kwargs=None):
+    """Runs one exposed database function, writes on the writer thread."""
+    func = getattr(database, name)
+    kwargs = kwargs or {}
+    if name in WRITE_FUNCTIONS:
+        _count("writes")
+        return _writer.submit(func, *args, **kwargs).result()
+    _count("reads")
+    return func(*args, **kwargs)
+
+def _prune_change_log_periodically():
+    # Trims the change feed on the writer thread, like any other write
+    while not _stopping.wait(CHANGE_LOG_PRUNE_SECONDS):
+        _writer.submit(database.prune_change_log)
+
+def get_server_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["uptime"] = round(time.time() - stats.pop("started"), 1)
+    stats["pool"] = database.get_pool_stats()
+    stats["schema_version"] = database.SCHEMA_VERSION
+    return stats
+
+# ===================================================================
+# HTTP HANDLER
+# ===================================================================
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so clients reuse one socket
+    quiet = False
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        token = _settings["token"]
+        if not token:
+            return True
+        sent = self.headers.get("Authorization", "")
+        if hmac.compare_digest(sent.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            return True
+        _count("errors")
+        self.close_connection = True
+        self._send_json(401, {"ok": False, "error": "Missing or wrong token"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/health":
+            self._send_json(200, {"ok": True, "result": get_server_stats()})
+        elif self.path == "/trace":
+            self._send_json(200, {"ok": True, "result": db_trace.get_trace_stats()})
+        else:
+            self._send_json(404, {"ok": False, "error": "Not found"})
+
+    def do_POST(self):
+        _count("requests")
+        name = self.path[len(API_PREFIX):] if self.path.startswith(API_PREFIX) else ""
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body can't be skipped, so the connection can't be reused
+            _count("errors")
+            self.close_connection = True
+            self._send_json(400, {"ok": False, "error": "Bad Content-Length"})
+            return
+        if length > MAX_BODY:
+            _count("errors")
+            self.close_connection = True
+            self._send_json(413, {"ok": False, "error": "Request too large"})
+            return
+        raw = self.rfile.read(length) if length else b""
+
+        if not is_exposed(name):
+            _count("errors")
+            error = (f"{name} needs a server started with --admin" if name in ADMIN_FUNCTIONS
+                     else f"Unknown operation: {name}")
+            self._send_json(404, {"ok": False, "error": error})
+            return
+        try:
+            body = from_json(json.loads(raw or b"{}"))
+            args = body.get("args", [])
+            kwargs = body.get("kwargs", {})
+            if not isinstance(args, list) or not isinstance(kwargs, dict):
+                raise ValueError("args must be a list and kwargs an object")
+        except ValueError as e:
+            _count("errors")
+            self._send_json(400, {"ok": False, "error": f"Bad request: {e}"})
+            return
+
+        try:
+            result = call(name, args, kwargs)
+        except Exception as e:
+            _count("errors")
+            self._send_json(500, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, {"ok": True, "result": to_json(result)})
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+# ===================================================================
+# ENTRY POINT
+# ===================================================================
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def make_server(host="127.0.0.1", port=8765, quiet=False, token=None, admin=False):
+    """The HTTP server, not yet serving. Raises ValueError for an unsafe setup."""
+    token = os.environ.get(TOKEN_ENV, "") if token is None else token
+    if not token and not _is_loopback(host):
+        raise ValueError(f"Listening on {host} needs a token: set {TOKEN_ENV} or pass --token.")
+    if admin and not token:
+        raise ValueError(f"--admin needs a token: set {TOKEN_ENV} or pass --token.")
+    _settings.update(token=token, admin=admin)
+    database.connect_db()
+    ApiHandler.quiet = quiet
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve database.py over JSON HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", help=f"database file (default: {database.DB_FILE})")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    parser.add_argument("--token", help=f"shared secret clients must send (default: ${TOKEN_ENV})")
+    parser.add_argument("--admin", action="store_true", help="also serve the admin and delete functions")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_FILE = args.db
+    try:
+        server = make_server(args.host, args.port, args.quiet, args.token, args.admin)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Serving {database.DB_FILE} on http://{args.host}:{args.port}{API_PREFIX}"
+          + (" (admin functions on)" if args.admin else ""))
+    # Polls arrive on request threads; prune from the writer instead
+    database.CHANGE_LOG_PRUNE_EVERY = 0
+    threading.Thread(target=_prune_change_log_periodically, name="change-log-prune", daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _stopping.set()
+        _writer.shutdown(wait=True)
+        database.close_pool()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# conftest.py
+# Fixtures: a throwaway copy of the shipped database, migrated to the latest schema
+
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import database  # noqa: E402
+
+BASELINE_DB = os.path.join(REPO_DIR, "village_service.db")
+
+def _use_db(monkeypatch, path):
+    database.close_pool()
+    monkeypatch.setattr(database, "DB_FILE", str(path))
+    monkeypatch.setattr(database, "_migrated_files", set())
+    monkeypatch.setattr(database, "_fts_status", {})
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """The shipped village_service.db (pre-migration schema), migrated in a temp dir."""
+    path = tmp_path / "baseline.db"
+    shutil.copyfile(BASELINE_DB, path)
+    _use_db(monkeypatch, path)
+    database.connect_db()
+    yield path
+    database.close_pool()
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """An empty database created by the migrations alone."""
+    path = tmp_path / "fresh.db"
+    _use_db(monkeypatch, path)
+    database.connect_db()
+    yield path
+    database.close_pool()
+
+def make_customer(tag="a"):
+    assert database.register_customer(f"Customer {tag}", f"{tag}@example.test", "9000000000", "pw", "Rampur")[0]
+    return query("SELECT user_id FROM users WHERE email = ?", (f"{tag}@example.test",))[0][0]
+
+def make_worker(tag="w", skill="Plumber", price=300.0):
+    assert database.register_worker(f"Worker {tag}", f"{tag}@example.test", "8000000000", "pw", skill,
+                                     3, price, "Available", "Rampur", None)[0]
+    return query("SELECT worker_id FROM workers WHERE email = ?", (f"{tag}@example.test",))[0][0]
+
+def make_booking(customer_id, worker_id, service_date="2030-01-01 10:00", status=None):
+    ok, booking_id = database.create_booking(customer_id, worker_id, service_date, "Rampur")
+    assert ok, booking_id
+    if status:
+        assert database.update_booking_status(booking_id, status) == (True, None)
+    return booking_id
+
+def query(sql, params=()):
+    with database.pooled_connection() as conn:
+        return conn.execute(sql, params).fetchall()
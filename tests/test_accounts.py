@@ -0,0 +1,18 @@
+# test_accounts.py
+# Registration and bulk import: one account per email, whatever its case
+
+import database
+
+def test_register_refuses_email_in_other_case(fresh_db):
+    assert database.register_customer("A", "foo@x.test", "1", "pw") == (True, None)
+    assert database.register_customer("B", "Foo@X.test", "2", "pw") == (False, "Email already exists!")
+    assert database.register_worker("W", "w@x.test", "3", "pw", "Plumber", 1, 100.0, "Available", "", None)[0]
+    assert not database.register_worker("V", "W@x.TEST", "4", "pw", "Plumber", 1, 100.0, "Available", "", None)[0]
+
+def test_bulk_insert_rejects_email_in_other_case(fresh_db):
+    database.register_customer("A", "foo@x.test", "1", "pw")
+    rows = [{"name": name, "email": email, "phone": "9", "password": "x", "address": "", "created_at": None}
+            for name, email in [("B", "Foo@x.test"), ("C", "bar@x.test"), ("D", "BAR@x.test")]]
+    inserted, rejected = database.bulk_insert("users", rows)
+    assert inserted == 1
+    assert [index for index, _ in rejected] == [0, 2]
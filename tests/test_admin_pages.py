@@ -0,0 +1,24 @@
+# test_admin_pages.py
+# Keyset slices for the admin virtual tables
+
+import database
+from conftest import make_booking, make_customer, make_worker
+
+def test_keyset_slices_match_offset_slices(fresh_db):
+    customers = [make_customer(f"c{i}") for i in range(7)]
+    worker_id = make_worker()
+    for i, customer_id in enumerate(customers):
+        make_booking(customer_id, worker_id, f"2030-01-{i + 1:02d}")
+
+    for get_page in (database.get_users_page, database.get_bookings_page):
+        first, total = get_page(0, 3)
+        second, _ = get_page(3, 3)
+        assert total == 7
+        assert get_page(0, 3, after=first[-1][0]) == (second, 7)
+        assert get_page(0, 3, before=second[0][0]) == (first, 7)
+
+def test_page_total_tracks_deletes(fresh_db):
+    customers = [make_customer(f"c{i}") for i in range(3)]
+    database.delete_user(customers[0])
+    rows, total = database.get_users_page()
+    assert total == 2 and [row[0] for row in rows] == customers[1:]
@@ -0,0 +1,87 @@
+# test_calendar.py
+# The worker calendar: triggers that keep it, and the checks that read it
+
+import shutil
+import sqlite3
+
+import database
+from conftest import BASELINE_DB, _use_db, make_booking, make_customer, make_worker, query
+
+DAY = "2030-01-01"
+
+def test_accepting_a_taken_day_is_refused(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    # Both requested while the day was still free
+    first = make_booking(user_id, worker_id)
+    second = make_booking(make_customer("b"), worker_id, "2030-01-01 15:00")
+    assert database.update_booking_status(first, "Accepted") == (True, None)
+    ok, err = database.update_booking_status(second, "Accepted")
+    assert not ok and "already booked" in err
+    assert database.get_worker_calendar(worker_id, DAY) == [(DAY, "booked", first)]
+
+    # Once the first is cancelled the day is free again
+    assert database.update_booking_status(first, "Cancelled") == (True, None)
+    assert database.is_worker_free(worker_id, DAY)
+    assert database.update_booking_status(second, "Accepted") == (True, None)
+    assert database.update_booking_status(second, "Completed") == (True, None)
+    assert database.get_worker_calendar(worker_id, DAY) == [(DAY, "booked", second)]
+
+def test_create_booking_refuses_taken_day(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    make_booking(user_id, worker_id, status="Accepted")
+    ok, err = database.create_booking(user_id, worker_id, "2030-01-01 12:00", "Rampur")
+    assert not ok and DAY in err
+    assert database.create_booking(user_id, worker_id, "2030-01-02 12:00", "Rampur")[0]
+
+def test_block_and_unblock_days(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    booking_id = make_booking(user_id, worker_id, "2030-01-03 10:00", status="Accepted")
+    ok, err = database.block_days(worker_id, "2030-01-01", "2030-01-05")
+    assert not ok and "2030-01-03" in err
+
+    assert database.block_days(worker_id, "2030-01-01", "2030-01-02") == (True, None)
+    assert not database.is_worker_free(worker_id, "2030-01-02")
+    assert [w[0] for w in database.find_free_workers("2030-01-02")] == []
+    assert database.unblock_days(worker_id, "2030-01-02") == (True, None)
+    assert [w[0] for w in database.find_free_workers("2030-01-02")] == [worker_id]
+    assert database.get_worker_calendar(worker_id, DAY) == [
+        (DAY, "blocked", None), ("2030-01-03", "booked", booking_id)]
+
+def test_deleting_worker_clears_calendar(fresh_db):
+    worker_id = make_worker()
+    make_booking(make_customer(), worker_id, status="Accepted")
+    database.block_days(worker_id, "2030-02-01")
+    assert database.delete_worker(worker_id) == (True, None)
+    assert query("SELECT COUNT(*) FROM worker_calendar")[0][0] == 0
+
+def test_same_day_duplicates_from_before_migration(tmp_path, monkeypatch):
+    # Two bookings accepted for one day before the calendar existed: the
+    # migration keeps the first, and the second must still be completable
+    path = tmp_path / "baseline.db"
+    shutil.copyfile(BASELINE_DB, path)
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO bookings (booking_id, customer_id, worker_id, service_date, status, address, notes, created_at)
+        VALUES (?, 1, 2, ?, 'Accepted', 'Rampur', '', '2025-11-01 09:00:00')
+    """, [(10, "2025-12-01 10:00"), (11, "2025-12-01 14:00")])
+    conn.commit()
+    conn.close()
+    _use_db(monkeypatch, path)
+    try:
+        database.connect_db()
+        assert database.get_worker_calendar(2, "2025-12-01", 1) == [("2025-12-01", "booked", 10)]
+        assert database.update_booking_status(11, "Completed") == (True, None)
+        assert database.update_booking_status(10, "Completed") == (True, None)
+        assert database.get_worker_calendar(2, "2025-12-01", 1) == [("2025-12-01", "booked", 10)]
+
+        # Moving the duplicate to another taken day is still checked
+        assert database.update_booking_status(11, "Accepted") == (True, None)
+        with database.pooled_connection() as db:
+            try:
+                db.execute("UPDATE bookings SET service_date = '2025-11-15 10:00' WHERE booking_id = 11")
+                assert False, "moved onto a booked day"
+            except sqlite3.IntegrityError as e:
+                assert "already booked" in str(e)
+            db.rollback()
+    finally:
+        database.close_pool()
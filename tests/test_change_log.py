@@ -0,0 +1,53 @@
+# test_change_log.py
+# The trigger-fed change feed the dashboards poll
+
+import database
+from conftest import make_booking, make_customer, make_worker, query
+
+def test_scopes_see_their_own_changes(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    worker_token = database.get_change_token(f"worker:{worker_id}")
+    customer_token = database.get_change_token(f"customer:{user_id}")
+
+    booking_id = make_booking(user_id, worker_id)
+    changes, worker_token = database.get_changes_since(worker_token, f"worker:{worker_id}")
+    assert [(entity, entity_id, op) for _, entity, entity_id, op in changes] == [("booking", booking_id, "insert")]
+    assert database.has_changes_since(customer_token, f"customer:{user_id}")
+
+    database.send_message(booking_id, user_id, "customer", "Hello")
+    assert not database.has_changes_since(worker_token, f"worker:{worker_id}")
+    assert database.has_changes_since(0, f"booking:{booking_id}")
+
+def test_pruned_token_asks_for_reload_on_one_connection(fresh_db):
+    for i in range(5):
+        make_customer(f"c{i}")
+    database.prune_change_log(keep=2)
+
+    # One connection, so a second borrow would time out instead of succeeding
+    database.close_pool()
+    pool = database.get_pool()
+    pool.max_connections, pool.timeout = 1, 0.2
+    changes, token = database.get_changes_since(0, "users")
+    assert changes is None and token == database.get_change_token("users")
+
+def test_unscoped_rows_are_not_logged(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    booking_id = make_booking(user_id, worker_id, status="Completed")
+    database.add_review(booking_id, user_id, worker_id, 5, "Good")
+    # SET NULL on the booking and review, then more changes to them
+    database.delete_user(user_id)
+    database.update_booking_status(booking_id, "Accepted")
+    assert query("SELECT COUNT(*) FROM change_log WHERE scope IS NULL")[0][0] == 0
+    changes, _ = database.get_changes_since(0, f"worker:{worker_id}")
+    assert [op for _, _, _, op in changes] == ["insert", "update", "update", "update"]
+
+def test_polling_prunes_the_log(fresh_db, monkeypatch):
+    pruned = []
+    monkeypatch.setattr(database, "prune_change_log", lambda: pruned.append(True))
+    monkeypatch.setattr(database, "CHANGE_LOG_PRUNE_EVERY", 3)
+    monkeypatch.setitem(database._change_polls, "count", 0)
+    database.get_change_token("users")
+    database.get_changes_since(0, "users")
+    assert pruned == []
+    database.get_change_token("users")
+    assert pruned == [True]
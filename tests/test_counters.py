@@ -0,0 +1,44 @@
+# test_counters.py
+# The trigger-maintained app_counters behind get_app_stats()
+
+import database
+from conftest import make_booking, make_customer, make_worker, query
+
+def _counted():
+    stats = {"users": 0, "workers": 0, "bookings": 0, "reviews": 0,
+             "by_status": dict.fromkeys(database.BOOKING_STATUSES, 0)}
+    for table in ("users", "workers", "bookings", "reviews"):
+        stats[table] = query(f"SELECT COUNT(*) FROM {table}")[0][0]
+    for status, count in query("SELECT status, COUNT(*) FROM bookings WHERE status IS NOT NULL GROUP BY status"):
+        stats["by_status"][status] = count
+    return stats
+
+def test_baseline_counters_match_tables(baseline_db):
+    assert database.get_app_stats() == _counted()
+
+def test_counters_follow_writes(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    other_id = make_customer("b")
+    first = make_booking(user_id, worker_id)
+    second = make_booking(other_id, worker_id, "2030-01-02 10:00", status="Completed")
+    assert database.add_review(second, other_id, worker_id, 4, "Fine")[0]
+    stats = database.get_app_stats()
+    assert (stats["users"], stats["workers"], stats["bookings"], stats["reviews"]) == (2, 1, 2, 1)
+    assert stats["by_status"]["Pending"] == 1 and stats["by_status"]["Completed"] == 1
+
+    database.update_booking_status(first, "Cancelled")
+    assert database.delete_user(user_id) == (True, None)
+    stats = database.get_app_stats()
+    assert stats == _counted()
+    assert stats["users"] == 1 and stats["by_status"]["Pending"] == 0 and stats["by_status"]["Cancelled"] == 1
+
+    assert database.delete_worker(worker_id) == (True, None)
+    assert database.get_app_stats() == _counted()
+
+def test_rebuild_repairs_drift(fresh_db):
+    make_booking(make_customer(), make_worker())
+    with database.pooled_connection() as conn:
+        conn.execute("UPDATE app_counters SET value = 99")
+        conn.commit()
+    assert database.get_app_stats()["users"] == 99
+    assert database.rebuild_app_stats() == _counted()
@@ -0,0 +1,85 @@
+# test_migrations.py
+# Behaviour of the migrated schema: triggers, aggregates and feeds
+
+import database
+from conftest import make_booking, make_customer, make_worker, query
+
+def test_baseline_migrates_to_latest(baseline_db):
+    assert database.get_schema_version() == database.SCHEMA_VERSION
+
+# ===================================================================
+# ANALYTICS ROLLUPS
+# ===================================================================
+def test_delete_user_with_bookings(fresh_db):
+    # The rollup triggers used to turn the ON DELETE SET NULL update into
+    # "UNIQUE constraint failed: rollup_dirty.day"
+    user_id, worker_id = make_customer(), make_worker()
+    make_booking(user_id, worker_id)
+    make_booking(user_id, worker_id, "2030-01-02 10:00")
+    assert database.delete_user(user_id) == (True, None)
+    assert query("SELECT customer_id FROM bookings") == [(None,), (None,)]
+
+def test_delete_worker_with_bookings_and_reviews(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    booking_id = make_booking(user_id, worker_id, status="Completed")
+    assert database.add_review(booking_id, user_id, worker_id, 5, "Good")[0]
+    assert database.delete_worker(worker_id) == (True, None)
+    assert query("SELECT worker_id FROM bookings") == [(None,)]
+    assert query("SELECT worker_id FROM reviews") == [(None,)]
+
+def test_rollups_follow_writes(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    booking_id = make_booking(user_id, worker_id)
+    database.refresh_rollups()
+    assert query("SELECT status, count FROM daily_bookings") == [("Pending", 1)]
+
+    database.update_booking_status(booking_id, "Accepted")
+    assert query("SELECT COUNT(*) FROM rollup_dirty")[0][0] == 1
+    database.refresh_rollups()
+    assert query("SELECT status, count FROM daily_bookings") == [("Accepted", 1)]
+
+def _rollups():
+    return {table: query(f"SELECT * FROM {table} ORDER BY 1, 2")
+            for table in ("daily_bookings", "daily_signups", "daily_skill_ratings")}
+
+def _assert_rollups_match_rebuild():
+    database.refresh_rollups()
+    incremental = _rollups()
+    database.rebuild_rollups()
+    assert incremental == _rollups()
+
+def test_rollups_follow_booking_deletes(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    first = make_booking(user_id, worker_id)
+    make_booking(user_id, worker_id, "2030-01-02 10:00")
+    database.refresh_rollups()
+    with database.pooled_connection() as conn:
+        conn.execute("DELETE FROM bookings WHERE booking_id = ?", (first,))
+        conn.commit()
+    database.refresh_rollups()
+    assert query("SELECT skill, status, count FROM daily_bookings") == [("Plumber", "Pending", 1)]
+    with database.pooled_connection() as conn:
+        conn.execute("DELETE FROM bookings")
+        conn.commit()
+    database.refresh_rollups()
+    assert query("SELECT COUNT(*) FROM daily_bookings")[0][0] == 0
+
+def test_rollups_match_a_rebuild_after_each_write(fresh_db):
+    user_id, worker_id = make_customer(), make_worker()
+    booking_id = make_booking(user_id, worker_id, status="Completed")
+    _assert_rollups_match_rebuild()
+    database.add_review(booking_id, user_id, worker_id, 4, "Good")
+    _assert_rollups_match_rebuild()
+    assert query("SELECT skill, rating_sum, rating_count FROM daily_skill_ratings") == [("Plumber", 4, 1)]
+
+    # A booking's skill is its worker's: a new skill moves its counts
+    with database.pooled_connection() as conn:
+        conn.execute("UPDATE workers SET skill = 'Electrician' WHERE worker_id = ?", (worker_id,))
+        conn.commit()
+    _assert_rollups_match_rebuild()
+    assert query("SELECT skill FROM daily_bookings") == [("Electrician",)]
+
+    database.delete_worker(worker_id)
+    _assert_rollups_match_rebuild()
+    assert query("SELECT skill, count FROM daily_bookings") == [("Unknown", 1)]
+    assert query("SELECT users, workers FROM daily_signups") == [(1, 0)]
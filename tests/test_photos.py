@@ -0,0 +1,121 @@
+# test_photos.py
+# The content-addressed photo store and the photo_refs counts
+
+import os
+import sqlite3
+
+import pytest
+
+import database
+import photo_store
+from conftest import make_worker, query
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """A temporary app directory for the store, away from the working directory."""
+    path = tmp_path / "app"
+    path.mkdir()
+    monkeypatch.setattr(photo_store, "APP_DIR", str(path))
+    monkeypatch.chdir(tmp_path)
+    return path
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def _set_photo(worker_id, photo):
+    with database.pooled_connection() as conn:
+        conn.execute("UPDATE workers SET photo = ? WHERE worker_id = ?", (photo, worker_id))
+        conn.commit()
+
+def _refs():
+    return dict(query("SELECT path, ref_count FROM photo_refs WHERE ref_count > 0"))
+
+def test_same_picture_is_stored_once(app_dir, tmp_path):
+    first = photo_store.store_photo(_write(tmp_path / "a.JPG", b"same bytes"))
+    second = photo_store.store_photo(_write(tmp_path / "b.jpg", b"same bytes"))
+    other = photo_store.store_photo(_write(tmp_path / "c.jpg", b"other bytes"))
+    assert first == second != other
+    assert photo_store.is_store_path(first) and first.endswith(".jpg")
+    assert sorted(path for path, _, _ in photo_store.iter_photo_files()) == sorted([first, other])
+
+def test_photo_refs_follow_workers(fresh_db, app_dir, tmp_path):
+    path = photo_store.store_photo(_write(tmp_path / "a.jpg", b"shared"))
+    other = photo_store.store_photo(_write(tmp_path / "b.jpg", b"own"))
+    first, second = make_worker("a"), make_worker("b")
+    _set_photo(first, path)
+    _set_photo(second, path)
+    assert _refs() == {path: 2}
+
+    _set_photo(second, other)
+    assert _refs() == {path: 1, other: 1}
+    database.delete_worker(first)
+    assert _refs() == {other: 1}
+
+def test_gc_removes_only_old_unreferenced_files(fresh_db, app_dir, tmp_path):
+    kept = photo_store.store_photo(_write(tmp_path / "a.jpg", b"kept"))
+    dropped = photo_store.store_photo(_write(tmp_path / "b.jpg", b"dropped"))
+    fresh = photo_store.store_photo(_write(tmp_path / "c.jpg", b"just uploaded"))
+    worker_id = make_worker()
+    _set_photo(worker_id, dropped)
+    _set_photo(worker_id, kept)
+    old = os.path.getmtime(photo_store.resolve(kept)) - 2 * database.PHOTO_GC_GRACE
+    for path in (kept, dropped):
+        os.utime(photo_store.resolve(path), (old, old))
+
+    assert database.gc_photos(dry_run=True)[0] == [dropped]
+    assert os.path.exists(photo_store.resolve(dropped))
+    removed, freed = database.gc_photos()
+    assert (removed, freed) == ([dropped], len(b"dropped"))
+    assert not os.path.exists(photo_store.resolve(dropped))
+    # Its now-empty shard directories go too
+    assert not os.path.exists(os.path.dirname(photo_store.resolve(dropped)))
+    assert sorted(path for path, _, _ in photo_store.iter_photo_files()) == sorted([kept, fresh])
+    assert _refs() == {kept: 1}
+
+def test_legacy_photos_move_after_migration(fresh_db, app_dir):
+    # Saved before the store: a relative path under the app directory
+    _write(app_dir / "assets" / "photos" / "old.jpg", b"old photo")
+    first, second, missing = make_worker("a"), make_worker("b"), make_worker("c")
+    _set_photo(first, "assets/photos/old.jpg")
+    _set_photo(second, "assets/photos/old.jpg")
+    _set_photo(missing, "assets/photos/gone.jpg")
+
+    stored, skipped = database.store_legacy_photos()
+    assert stored == 2
+    assert [path for path, _ in skipped] == ["assets/photos/gone.jpg"]
+    (new_path,) = {row[0] for row in query("SELECT photo FROM workers WHERE worker_id IN (?, ?)", (first, second))}
+    assert photo_store.is_store_path(new_path)
+    assert (app_dir / new_path).read_bytes() == b"old photo"
+    assert _refs() == {"assets/photos/gone.jpg": 1, new_path: 2}
+
+    # Re-running retries what was skipped and leaves the rest alone
+    _write(app_dir / "assets" / "photos" / "gone.jpg", b"found it")
+    stored, skipped = database.store_legacy_photos()
+    assert (stored, skipped) == (1, [])
+    assert database.store_legacy_photos() == (0, [])
+
+def test_migration_does_not_copy_files(tmp_path, monkeypatch, app_dir):
+    # A pre-store database: migration 7 only rebuilds the refs, the copy
+    # runs afterwards, outside the migration's transaction
+    db_path = tmp_path / "old.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE workers (worker_id INTEGER PRIMARY KEY, photo TEXT)")
+    conn.execute("INSERT INTO workers (photo) VALUES ('assets/photos/old.jpg')")
+    conn.execute("PRAGMA user_version = 6")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(database, "DB_FILE", str(db_path))
+    # Findable from the working directory too, as the old migration looked
+    _write(app_dir / "assets" / "photos" / "old.jpg", b"old photo")
+    _write(tmp_path / "assets" / "photos" / "old.jpg", b"old photo")
+    try:
+        with database.pooled_connection() as conn:
+            cursor = conn.cursor()
+            database._migration_7_photo_store(cursor)
+            assert cursor.execute("SELECT photo FROM workers").fetchall() == [("assets/photos/old.jpg",)]
+            conn.rollback()
+    finally:
+        database.close_pool()
@@ -0,0 +1,100 @@
+# test_search.py
+# Keyword ranking and keyset paging of the worker search
+
+import pytest
+
+import database
+from conftest import make_worker
+
+def _set_text(worker_id, name, address):
+    with database.pooled_connection() as conn:
+        conn.execute("UPDATE workers SET name = ?, address = ? WHERE worker_id = ?", (name, address, worker_id))
+        conn.commit()
+
+def _drop_fts():
+    with database.pooled_connection() as conn:
+        for trigger in ("workers_fts_ai", "workers_fts_ad", "workers_fts_au"):
+            conn.execute(f"DROP TRIGGER {trigger}")
+        conn.execute("DROP TABLE workers_fts")
+        conn.commit()
+
+# ===================================================================
+# KEYWORD RANKING
+# ===================================================================
+def test_keyword_ranks_name_over_skill_over_address(fresh_db):
+    by_address = make_worker("a", skill="Painter")
+    by_name = make_worker("b", skill="Painter")
+    by_skill = make_worker("c", skill="Ganesh Works")
+    _set_text(by_address, "Ravi Rao", "Near Ganesh Temple")
+    _set_text(by_name, "Ganesh Patil", "Rampur")
+    _set_text(by_skill, "Anil Das", "Rampur")
+    # Word prefixes match too
+    assert [row[0] for row in database.search_workers(keyword="gane")] == [by_name, by_skill, by_address]
+    assert database.search_workers(keyword="temple ravi") == database.search_workers(keyword="ravi temple")
+
+def test_keyword_falls_back_to_like_without_fts(fresh_db, monkeypatch):
+    matched = make_worker("a", skill="Electrician")
+    make_worker("b", skill="Painter")
+    _drop_fts()
+    # Built without FTS5: the table was never created
+    monkeypatch.setitem(database._fts_status, database.DB_FILE, False)
+    assert [row[0] for row in database.search_workers(keyword="lectric")] == [matched]
+    # The table is expected but the query fails: LIKE instead of an error
+    monkeypatch.setitem(database._fts_status, database.DB_FILE, True)
+    assert [row[0] for row in database.search_workers(keyword="lectric")] == [matched]
+
+# ===================================================================
+# KEYSET PAGES
+# ===================================================================
+
+def _all_pages(page_size, between_pages=None, **filters):
+    seen, token = [], None
+    while True:
+        rows, token = database.search_workers_page(page_size=page_size, page_token=token, **filters)
+        seen += [row[0] for row in rows]
+        if token is None:
+            return seen
+        if between_pages:
+            between_pages()
+
+def test_keyword_pages_survive_inserts(fresh_db):
+    # New matches change every bm25 score; the pages must neither skip nor repeat
+    originals = [make_worker(f"plumber{i}", price=100.0 + 10 * (i % 3)) for i in range(7)]
+    added = iter(range(100))
+    def add_match():
+        make_worker(f"extra{next(added)}", skill="Plumber Plumber", price=999.0)
+
+    seen = _all_pages(2, add_match, keyword="plumber")
+    assert len(seen) == len(set(seen))
+    assert set(originals) <= set(seen)
+
+def test_keyword_pages_are_cheapest_first(fresh_db):
+    for i, price in enumerate([300.0, 100.0, 200.0, 100.0]):
+        make_worker(f"p{i}", price=price)
+    rows, _ = database.search_workers_page(keyword="worker", page_size=10)
+    assert [row[3] for row in rows] == [100.0, 100.0, 200.0, 300.0]
+    assert rows[0][0] < rows[1][0]
+
+def test_equal_prices_page_by_worker_id(fresh_db):
+    # Ties on price are broken by worker_id, so no row is skipped or repeated
+    prices = {make_worker(f"w{i}", price=price): price for i, price in enumerate([250.0, 150.0] * 4 + [150.0])}
+    seen = _all_pages(2)
+    assert seen == sorted(prices, key=lambda worker_id: (prices[worker_id], worker_id))
+    assert _all_pages(4, skill="Plumber") == seen
+
+def test_page_token_round_trip(fresh_db):
+    ids = [make_worker(f"w{i}", price=100.0) for i in range(5)]
+    rows, token = database.search_workers_page(page_size=2)
+    assert database._decode_page_token(token) == ("price", 100.0, rows[-1][0])
+    # The same token always continues at the same place
+    assert database.search_workers_page(page_size=2, page_token=token) == \
+        database.search_workers_page(page_size=2, page_token=token)
+    rebuilt = database._encode_page_token(*database._decode_page_token(token))
+    assert [row[0] for row in database.search_workers_page(page_size=10, page_token=rebuilt)[0]] == ids[2:]
+
+def test_bad_page_token_is_refused(fresh_db):
+    make_worker()
+    with pytest.raises(ValueError):
+        database.search_workers_page(page_token="not a token")
+    with pytest.raises(ValueError):
+        database.search_workers_page(page_token=database._encode_page_token("rank", -1.5, 1))
@@ -0,0 +1,85 @@
+# test_server.py
+# server.py and the RemoteDatabase client against it
+
+import http.client
+import threading
+import urllib.parse
+
+import pytest
+
+import db_client
+import server
+from conftest import make_booking, make_customer, make_worker
+
+@pytest.fixture
+def serve(fresh_db):
+    """Starts a server on a free port; returns start(token=..., admin=...) -> url."""
+    running = []
+
+    def start(token="", admin=False):
+        httpd = server.make_server("127.0.0.1", 0, quiet=True, token=token, admin=admin)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        running.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    yield start
+    for httpd in running:
+        httpd.shutdown()
+        httpd.server_close()
+    server._settings.update(token="", admin=False)
+
+def test_remote_results_keep_tuples(serve):
+    user_id, worker_id = make_customer(), make_worker()
+    make_booking(user_id, worker_id)
+    remote = db_client.RemoteDatabase(serve())
+    assert remote.create_booking(user_id, worker_id, "2030-02-01", "Rampur")[0] is True
+    page = remote.search_workers_page()
+    assert isinstance(page, tuple) and isinstance(page[0][0], tuple)
+    assert remote.get_bookings_by_worker(worker_id) == server.database.get_bookings_by_worker(worker_id)
+
+def test_unexposed_names_raise(serve):
+    remote = db_client.RemoteDatabase(serve())
+    with pytest.raises(AttributeError):
+        remote.bulk_insert
+    assert remote.WORKER_PAGE_SIZE == server.database.WORKER_PAGE_SIZE
+
+def test_token_is_required(serve):
+    url = serve(token="secret")
+    with pytest.raises(db_client.RemoteDatabaseError):
+        db_client.RemoteDatabase(url, token="").get_change_token()
+    with pytest.raises(db_client.RemoteDatabaseError):
+        db_client.RemoteDatabase(url, token="wrong").get_change_token()
+    assert db_client.RemoteDatabase(url, token="secret").get_change_token() == 0
+
+def test_admin_functions_need_admin_mode(serve):
+    user_id = make_customer()
+    with pytest.raises(db_client.RemoteDatabaseError, match="--admin"):
+        db_client.RemoteDatabase(serve()).delete_user(user_id)
+
+def test_unsafe_setups_are_refused(fresh_db):
+    with pytest.raises(ValueError):
+        server.make_server("0.0.0.0", 0, token="")
+    with pytest.raises(ValueError):
+        server.make_server("127.0.0.1", 0, token="", admin=True)
+
+def _post(url, headers, body=b""):
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+    try:
+        conn.putrequest("POST", "/api/get_change_token")
+        for name, value in headers.items():
+            conn.putheader(name, value)
+        conn.endheaders(body)
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+def test_bad_content_length_is_rejected(serve):
+    url = serve(token="secret")
+    auth = {"Authorization": "Bearer secret"}
+    assert _post(url, {**auth, "Content-Length": "abc"}) == 400
+    # Would otherwise read until the client hangs up
+    assert _post(url, {**auth, "Content-Length": "-1"}) == 400
+    # Authentication comes first, whatever the body looks like
+    assert _post(url, {"Content-Length": "abc"}) == 401
+    assert _post(url, {**auth, "Content-Length": "2"}, b"{}") == 200
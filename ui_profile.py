@@ -0,0 +1,456 @@
+# ui_profile.py
+# Measures how long Tk handlers block the event loop
+#
+# Off unless VILLAGE_UI_PROFILE is set (to anything but "0"):
+#   VILLAGE_UI_PROFILE=1              time every button command, binding and after() callback
+#   VILLAGE_UI_BUDGET_MS=16           frame budget; handlers and lag above it are logged (default 16)
+#   VILLAGE_UI_PROFILE_LOG=ui.log     rotating log of slow handlers (default ui_profile.log)
+#   VILLAGE_UI_OVERLAY=1              open the debug overlay with every window (F12 toggles it)
+#   VILLAGE_UI_PROFILE_REPORT=f       write the stats as JSON here at exit
+#
+# Headless benchmark against a seeded database (needs a display, e.g. Xvfb):
+#   xvfb-run -a python ui_profile.py bench --db bench.db --seconds 20 -o ui_bench.json
+
+import argparse
+import atexit
+import bisect
+import contextlib
+import datetime
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+
+PROFILE_ENABLED = os.environ.get("VILLAGE_UI_PROFILE", "") not in ("", "0")
+BUDGET_MS = float(os.environ.get("VILLAGE_UI_BUDGET_MS", "16"))
+PROFILE_LOG = os.environ.get("VILLAGE_UI_PROFILE_LOG", "ui_profile.log")
+SHOW_OVERLAY = os.environ.get("VILLAGE_UI_OVERLAY", "") not in ("", "0")
+PROFILE_REPORT = os.environ.get("VILLAGE_UI_PROFILE_REPORT", "")
+
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+HEARTBEAT_MS = 50        # how often each window checks its event-loop lag
+OVERLAY_REFRESH_MS = 500
+OVERLAY_KEY = "<F12>"
+
+# Upper bounds (ms) of the histogram buckets, in frames; the last is open-ended
+HISTOGRAM_BOUNDS = (1, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+
+_lock = threading.Lock()
+_handlers = {}     # handler label -> stats
+_lag = None        # event-loop lag stats, all windows together
+_stack = []        # labels of the handlers running right now (Tk thread only)
+_logger = None
+_installed = False
+_original_call = tk.CallWrapper.__call__
+_original_after = tk.Misc.after
+_original_tk_init = tk.Tk.__init__
+_root_hooks = []   # called with every new Tk root (the benchmark drives windows this way)
+_sources = {}      # name -> function returning a dict of extra counters (caches etc.)
+
+def enabled():
+    return PROFILE_ENABLED
+
+# ===================================================================
+# STATS
+# ===================================================================
+def _new_stats():
+    return {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "over_budget": 0,
+            "histogram": [0] * (len(HISTOGRAM_BOUNDS) + 1)}
+
+def _add(stats, elapsed_ms):
+    stats["calls"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    if elapsed_ms > BUDGET_MS:
+        stats["over_budget"] += 1
+    stats["histogram"][bisect.bisect_left(HISTOGRAM_BOUNDS, elapsed_ms)] += 1
+
+def _finish_stats(stats):
+    stats = dict(stats, histogram=list(stats["histogram"]))
+    stats["total_ms"] = round(stats["total_ms"], 3)
+    stats["max_ms"] = round(stats["max_ms"], 3)
+    stats["mean_ms"] = round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0
+    return stats
+
+def get_profile_stats():
+    """Copy of the collected stats: {"enabled", "budget_ms", "histogram_ms", "handlers", "lag"}."""
+    with _lock:
+        handlers = {k: _finish_stats(v) for k, v in _handlers.items()}
+        lag = _finish_stats(_lag) if _lag else _finish_stats(_new_stats())
+    return {
+        "enabled": PROFILE_ENABLED,
+        "budget_ms": BUDGET_MS,
+        "histogram_ms": list(HISTOGRAM_BOUNDS) + ["inf"],
+        "handlers": handlers,
+        "lag": lag,
+        "counters": {name: source() for name, source in list(_sources.items())},
+    }
+
+def register_stats(name, source):
+    """Adds source()'s dict (e.g. a cache's stats) to the report and overlay. No-op when off."""
+    if PROFILE_ENABLED:
+        _sources[name] = source
+
+def reset_profile_stats():
+    global _lag
+    with _lock:
+        _handlers.clear()
+        _lag = None
+
+def write_profile_report(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(get_profile_stats(), f, indent=2)
+
+# ===================================================================
+# SLOW HANDLER LOG
+# ===================================================================
+def _get_logger():
+    global _logger
+    if _logger is None:
+        _logger = logging.getLogger("village.ui_profile")
+        _logger.propagate = False
+        _logger.setLevel(logging.INFO)
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                PROFILE_LOG, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+        except OSError as e:
+            print(f"UI profile log unavailable: {e}")
+            handler = logging.NullHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+        _logger.addHandler(handler)
+    return _logger
+
+# ===================================================================
+# MEASURING
+# ===================================================================
+def describe(func):
+    """Readable name for a callback: module.function, or module:line for lambdas."""
+    name = getattr(func, "__ui_profile_label__", None)
+    if name:
+        return name
+    target = getattr(func, "func", None) if isinstance(func, functools.partial) else func
+    code = getattr(target, "__code__", None)
+    if code is None:
+        return type(func).__name__
+    module = (getattr(target, "__module__", None) or "?").rsplit(".", 1)[-1]
+    if code.co_name == "<lambda>":
+        return f"{module}:{code.co_firstlineno} <lambda>"
+    # open_customer_dashboard.<locals>.populate_cards -> customer_dashboard.populate_cards
+    return f"{module}.{target.__qualname__.rsplit('<locals>.', 1)[-1]}"
+
+@contextlib.contextmanager
+def _measuring(label):
+    _stack.append(label)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _stack.pop()
+        with _lock:
+            stats = _handlers.get(label)
+            if stats is None:
+                stats = _handlers[label] = _new_stats()
+            _add(stats, elapsed_ms)
+        if elapsed_ms > BUDGET_MS:
+            inside = f" (inside {_stack[-1]})" if _stack else ""
+            _get_logger().info(f"SLOW handler {elapsed_ms:.1f} ms {label}{inside}")
+
+def measure(target):
+    """Context manager timing one handler; target is a label or the callable itself."""
+    if not PROFILE_ENABLED:
+        return contextlib.nullcontext()
+    return _measuring(target if isinstance(target, str) else describe(target))
+
+def profiled(func):
+    """Decorator for handlers worth their own line in the stats (no-op when off)."""
+    if not PROFILE_ENABLED:
+        return func
+    label = describe(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _measuring(label):
+            return func(*args, **kwargs)
+    wrapper.__ui_profile_label__ = label
+    return wrapper
+
+# ===================================================================
+# TK HOOKS
+# ===================================================================
+# Every command, binding and after() callback Tk runs goes through a
+# CallWrapper, so timing CallWrapper.__call__ covers all of them.
+_INTERNAL_PREFIX = "_ui_profile_"
+
+def _profiled_call(self, *args):
+    label = self.__dict__.get("_label")
+    if label is None:
+        name = getattr(self.func, "__name__", "")
+        if name.startswith(_INTERNAL_PREFIX):
+            label = ""
+        elif getattr(self.func, "__qualname__", "").endswith("after.<locals>.callit"):
+            label = name          # after() copies the callback's name onto callit
+        else:
+            label = describe(self.func)
+        self._label = label
+    if not label:
+        return _original_call(self, *args)
+    with _measuring(label):
+        return _original_call(self, *args)
+
+def _profiled_after(self, ms, func=None, *args):
+    if func is None or getattr(func, "__name__", "").startswith(_INTERNAL_PREFIX):
+        return _original_after(self, ms, func, *args)
+
+    def labelled(*call_args):
+        return func(*call_args)
+    labelled.__name__ = "after " + describe(func)
+    return _original_after(self, ms, labelled, *args)
+
+def _profiled_tk_init(self, *args, **kwargs):
+    _original_tk_init(self, *args, **kwargs)
+    attach(self)
+
+def attach(root):
+    """Starts lag sampling on a Tk root and binds the overlay key (install() does this for every root)."""
+    expected = [time.perf_counter() + HEARTBEAT_MS / 1000]
+
+    def _ui_profile_heartbeat():
+        global _lag
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - expected[0]) * 1000)
+        with _lock:
+            if _lag is None:
+                _lag = _new_stats()
+            _add(_lag, lag_ms)
+        if lag_ms > BUDGET_MS:
+            _get_logger().info(f"LAG event loop {lag_ms:.1f} ms late in {root.title() or 'window'}")
+        expected[0] = time.perf_counter() + HEARTBEAT_MS / 1000
+        try:
+            _original_after(root, HEARTBEAT_MS, _ui_profile_heartbeat)
+        except tk.TclError:
+            pass   # window destroyed
+
+    _original_after(root, HEARTBEAT_MS, _ui_profile_heartbeat)
+
+    def _ui_profile_toggle(event=None):
+        ProfileOverlay.toggle(root)
+    root.bind_all(OVERLAY_KEY, _ui_profile_toggle)
+    if SHOW_OVERLAY:
+        ProfileOverlay.toggle(root)
+    for hook in list(_root_hooks):
+        hook(root)
+
+def install():
+    """Hooks the profiler into tkinter. Does nothing unless profiling is enabled."""
+    global _installed
+    if not PROFILE_ENABLED or _installed:
+        return
+    _installed = True
+    tk.CallWrapper.__call__ = _profiled_call
+    tk.Misc.after = _profiled_after
+    tk.Tk.__init__ = _profiled_tk_init
+    if PROFILE_REPORT:
+        atexit.register(lambda: write_profile_report(PROFILE_REPORT))
+
+# ===================================================================
+# DEBUG OVERLAY
+# ===================================================================
+class ProfileOverlay(tk.Toplevel):
+    """Small always-on-top window listing the slowest handlers and the event-loop lag."""
+
+    _open = {}   # root -> overlay
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.title("UI profile")
+        self.geometry("560x320")
+        self.attributes("-topmost", True)
+        self.text = tk.Text(self, font=("Consolas", 9), bg="#202124", fg="#E8EAED", bd=0)
+        self.text.pack(fill="both", expand=True)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self._job = None
+        self._ui_profile_refresh()
+
+    @classmethod
+    def toggle(cls, root):
+        overlay = cls._open.get(root)
+        if overlay is not None:
+            overlay.close()
+        else:
+            cls._open[root] = cls(root)
+
+    def close(self):
+        self._open.pop(self.master, None)
+        if self._job is not None:
+            self.after_cancel(self._job)
+        self.destroy()
+
+    def _ui_profile_refresh(self):
+        stats = get_profile_stats()
+        lag = stats["lag"]
+        lines = [f"budget {BUDGET_MS:g} ms   lag max {lag['max_ms']:.1f} ms, mean {lag['mean_ms']:.1f} ms,"
+                 f" {lag['over_budget']} late ticks",
+                 "",
+                 f"{'handler':<40}{'calls':>6}{'mean':>8}{'max':>8}{'slow':>6}"]
+        slowest = sorted(stats["handlers"].items(), key=lambda kv: -kv[1]["max_ms"])[:15]
+        for label, s in slowest:
+            lines.append(f"{label[-40:]:<40}{s['calls']:>6}{s['mean_ms']:>8.1f}{s['max_ms']:>8.1f}{s['over_budget']:>6}")
+        for name, counters in stats["counters"].items():
+            lines += ["", name + ": " + ", ".join(f"{k} {v}" for k, v in counters.items())]
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        self._job = _original_after(self, OVERLAY_REFRESH_MS, self._ui_profile_refresh)
+
+# ===================================================================
+# HEADLESS BENCHMARK
+# ===================================================================
+# Opens the customer and worker dashboards against a seeded database and
+# clicks through them on a timer while the profiler records everything.
+def _walk(widget):
+    for child in widget.winfo_children():
+        yield child
+        yield from _walk(child)
+
+def _find(root, kind, text=None):
+    for widget in _walk(root):
+        if isinstance(widget, kind) and (text is None or widget.cget("text") == text):
+            return widget
+    return None
+
+def _close_window(root):
+    # Through the window's own close handler, so its executor shuts down
+    handler = root.protocol("WM_DELETE_WINDOW")
+    if handler:
+        root.tk.call(handler)
+    else:
+        root.destroy()
+
+def _drive(root, steps, seconds, interval_ms=400):
+    """Runs steps[i % len(steps)](root) every interval_ms, then closes the window."""
+    deadline = time.perf_counter() + seconds
+    tick = [0]
+
+    def _ui_profile_step():
+        if time.perf_counter() >= deadline:
+            _close_window(root)
+            return
+        try:
+            steps[tick[0] % len(steps)](root)
+        except tk.TclError as e:
+            print(f"Benchmark step failed: {e}")
+        tick[0] += 1
+        _original_after(root, interval_ms, _ui_profile_step)
+    _original_after(root, interval_ms, _ui_profile_step)
+
+def _customer_steps():
+    keywords = ["", "plumb", "Ram", "carp", "elec", ""]
+
+    def search(root):
+        entry = _find(root, tk.Entry)
+        entry.delete(0, tk.END)
+        entry.insert(0, keywords[search.n % len(keywords)])
+        search.n += 1
+        _find(root, tk.Button, "Search").invoke()
+    search.n = 0
+
+    def scroll(root):
+        from card_list import VirtualCardList
+        cards = _find(root, VirtualCardList)
+        cards.scroll_to(cards.top_px + cards.winfo_height())   # a page down; near the end loads more
+    return [search, scroll, scroll, scroll]
+
+def _worker_steps(worker_id):
+    from chat_window import open_chat_window
+    from tkinter import ttk
+
+    def refresh(root):
+        _find(root, tk.Button, "Refresh Requests").invoke()
+
+    def chat(root):
+        tree = _find(root, ttk.Treeview)
+        items = tree.get_children()
+        if not items:
+            return
+        values = tree.item(items[0])
+        open_chat_window(root, values["values"][0], worker_id, "worker", values["tags"][1])
+        # Leave it open for a few ticks so its history loads, then close it
+        for top in root.winfo_children():
+            if isinstance(top, tk.Toplevel) and top.title().startswith("Chat with"):
+                _original_after(root, 1500, lambda t=top: _close_window(t) if t.winfo_exists() else None)
+    return [refresh, refresh, chat, refresh]
+
+def run_benchmark(db_path, seconds=20):
+    """Clicks through both dashboards for `seconds` each. Returns get_profile_stats()."""
+    global PROFILE_ENABLED
+    PROFILE_ENABLED = True
+    install()
+    import database
+    database.DB_FILE = db_path
+    from customer_dashboard import open_customer_dashboard
+    from worker_dashboard import open_worker_dashboard
+
+    with database.pooled_connection() as conn:
+        customer = conn.execute("SELECT user_id, name FROM users ORDER BY user_id LIMIT 1").fetchone()
+        worker = conn.execute(
+            "SELECT w.worker_id, w.name FROM workers w JOIN bookings b ON b.worker_id = w.worker_id "
+            "GROUP BY w.worker_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    if not customer or not worker:
+        raise ValueError(f"{db_path} has no customers or booked workers; run seed_data.py first")
+
+    def drive(steps):
+        def hook(root):
+            _root_hooks.remove(hook)
+            _drive(root, steps, seconds)
+        _root_hooks.append(hook)
+
+    reset_profile_stats()
+    drive(_customer_steps())
+    open_customer_dashboard(*customer)
+    drive(_worker_steps(worker[0]))
+    open_worker_dashboard(*worker)
+    return get_profile_stats()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tk responsiveness profiling tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="click through the dashboards and report handler timings")
+    bench.add_argument("--db", default="bench.db", help="seeded database (see seed_data.py)")
+    bench.add_argument("--seconds", type=float, default=20, help="time spent in each dashboard")
+    bench.add_argument("-o", "--output", default="ui_bench.json")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        if not os.path.exists(args.db):
+            parser.error(f"{args.db} not found; create it with seed_data.py")
+        try:
+            stats = run_benchmark(args.db, args.seconds)
+        except tk.TclError as e:
+            print(f"Error: no display ({e}); run under xvfb-run")
+            return 1
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        stats["meta"] = {"db": args.db, "seconds": args.seconds,
+                         "finished": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        slowest = sorted(stats["handlers"].items(), key=lambda kv: -kv[1]["max_ms"])[:10]
+        print(f"Event-loop lag: max {stats['lag']['max_ms']:.1f} ms, {stats['lag']['over_budget']} ticks over budget")
+        for name, counters in stats["counters"].items():
+            print(f"  {name}: {counters}")
+        for label, s in slowest:
+            print(f"  {label:<50} {s['calls']:>5} calls  mean {s['mean_ms']:>7.1f} ms  max {s['max_ms']:>7.1f} ms")
+        print(f"Wrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    # Run the imported copy, so the dashboards share its hooks and stats
+    import ui_profile
+    sys.exit(ui_profile.main())
@@ -147,4 +147,73 @@ def scrollable_frame(parent):
     frame.bind("<Configure>",
                lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
 
-    return frame
\ No newline at end of file
+    return frame
+
+
+# -----------------------------
+# BAR CHARTS (drawn on a Canvas)
+# -----------------------------
+CHART_COLORS = [PRIMARY, "#34A853", "#FBBC04", "#EA4335"]
+
+def draw_bar_chart(canvas, title, labels, series, colors=CHART_COLORS, legend=None):
+    """Vertical bars, one per label; several series are stacked.
+
+    series is a list of value lists, each as long as labels. Only the
+    first and last labels are printed, so it works for a year of days.
+    """
+    canvas.delete("all")
+    canvas.update_idletasks()
+    w = max(canvas.winfo_width(), int(canvas.cget("width")))
+    h = max(canvas.winfo_height(), int(canvas.cget("height")))
+    left, right, top, bottom = 40, 10, 30, 25
+
+    canvas.create_text(left, 12, text=title, anchor="w", font=BOLD_FONT, fill=TEXT_DARK)
+    totals = [sum(values) for values in zip(*series)] if series else []
+    peak = max(totals, default=0)
+    canvas.create_line(left, h - bottom, w - right, h - bottom, fill=CARD_SHADOW)
+    if not labels or peak == 0:
+        canvas.create_text(w // 2, h // 2, text="No data", font=NORMAL_FONT, fill=TEXT_LIGHT)
+        return
+
+    canvas.create_text(left - 5, top, text=str(peak), anchor="e", font=("Segoe UI", 8), fill=TEXT_LIGHT)
+    bar_w = (w - left - right) / len(labels)
+    scale = (h - top - bottom) / peak
+    for i in range(len(labels)):
+        x0 = left + i * bar_w
+        y = h - bottom
+        for values, color in zip(series, colors):
+            if values[i]:
+                y_top = y - values[i] * scale
+                canvas.create_rectangle(x0, y_top, x0 + max(bar_w - 1, 1), y, fill=color, width=0)
+                y = y_top
+    canvas.create_text(left, h - bottom + 12, text=labels[0], anchor="w", font=("Segoe UI", 8), fill=TEXT_LIGHT)
+    canvas.create_text(w - right, h - bottom + 12, text=labels[-1], anchor="e", font=("Segoe UI", 8), fill=TEXT_LIGHT)
+
+    if legend:
+        x = w - right
+        for name, color in reversed(list(zip(legend, colors))):
+            item = canvas.create_text(x, 12, text=name, anchor="e", font=("Segoe UI", 9), fill=TEXT_DARK)
+            x = canvas.bbox(item)[0] - 4
+            canvas.create_rectangle(x - 10, 7, x, 17, fill=color, width=0)
+            x -= 18
+
+
+def draw_hbar_chart(canvas, title, items, max_value=None, fmt="{:.1f}", color=PRIMARY):
+    """Horizontal bars for (label, value, note) items, note printed after the value."""
+    canvas.delete("all")
+    canvas.update_idletasks()
+    w = max(canvas.winfo_width(), int(canvas.cget("width")))
+    left, right, top, row_h = 100, 90, 30, 24
+
+    canvas.create_text(10, 12, text=title, anchor="w", font=BOLD_FONT, fill=TEXT_DARK)
+    if not items:
+        canvas.create_text(w // 2, top + row_h, text="No data", font=NORMAL_FONT, fill=TEXT_LIGHT)
+        return
+    peak = max_value or max(value for _, value, _ in items) or 1
+    for i, (label, value, note) in enumerate(items):
+        y = top + i * row_h
+        canvas.create_text(left - 8, y + row_h / 2, text=label, anchor="e", font=NORMAL_FONT, fill=TEXT_DARK)
+        bar_end = left + (w - left - right) * value / peak
+        canvas.create_rectangle(left, y + 4, bar_end, y + row_h - 4, fill=color, width=0)
+        text = fmt.format(value) + (f"  {note}" if note else "")
+        canvas.create_text(bar_end + 6, y + row_h / 2, text=text, anchor="w", font=("Segoe UI", 9), fill=TEXT_LIGHT)
@@ -0,0 +1,216 @@
+# virtual_table.py
+# Virtual-scrolling table for large admin lists (Tkinter)
+
+import tkinter as tk
+from tkinter import ttk
+
+# ===================================================================
+# VIRTUAL TABLE
+# ===================================================================
+class VirtualTable(tk.Frame):
+    """A Treeview that only ever holds the rows on screen.
+
+    fetch_page(offset, limit, after=None, before=None) must return
+    (rows, total), rows keyed by their first column. When a neighbouring
+    chunk is cached its edge key is passed as after / before, so the
+    fetch can seek by key instead of counting `offset` rows; only a jump
+    loads by offset. Rows are fetched in chunks of chunk_size and cached;
+    the chunk on screen is loaded straight away and the neighbouring
+    chunks (prefetch_chunks either side) stream in afterwards through
+    after(), nearest first, one per event-loop turn. Chunks outside that
+    window are dropped, so memory stays bounded no matter how many rows
+    the table has.
+
+    The Treeview items are a fixed set of slots whose values are swapped
+    as the user scrolls. Selection and focus are cleared whenever the
+    slots move to other rows; use selected_row() to read the selection.
+
+    With an executor (db_executor.DatabaseExecutor) every fetch runs in
+    the background: rows not loaded yet show blank and fill in when
+    their chunk arrives. A failed fetch is passed to on_error(exc), once
+    per refresh(); the chunk is tried again the next time it is needed.
+    """
+
+    def __init__(self, parent, columns, fetch_page, visible_rows=25,
+                 chunk_size=100, prefetch_chunks=2, column_width=150, executor=None, on_error=None):
+        super().__init__(parent, bg=parent.cget("bg"))
+        self.fetch_page = fetch_page
+        self.executor = executor
+        self.on_error = on_error
+        self.visible_rows = visible_rows
+        self.chunk_size = chunk_size
+        self.prefetch_chunks = prefetch_chunks
+
+        self.total = 0
+        self.top = 0
+        self._chunks = {}
+        self._loading = set()
+        self._generation = 0
+        self._error_generation = None   # last generation whose failure was reported
+        self._rendered_top = 0
+        self._prefetch_job = None
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=visible_rows)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=column_width)
+        self.tree.pack(fill="both", expand=True, side="left")
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self._slots = [self.tree.insert("", "end", values=()) for _ in range(visible_rows)]
+
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.top - 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.top + 3))
+
+    # ---------- Public ----------
+    def refresh(self):
+        """Drops cached rows and reloads the current position."""
+        self._chunks.clear()
+        self._loading.clear()
+        self._generation += 1
+        self._clear_selection()
+        if self._load_chunk(self.top // self.chunk_size):
+            self.scroll_to(self.top)
+
+    def selected_row(self):
+        """Values of the selected row, or None (nothing selected, or still loading)."""
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        values = self.tree.item(selection[0])["values"]
+        return values or None
+
+    def scroll_to(self, row_index):
+        max_top = max(0, self.total - self.visible_rows)
+        self.top = max(0, min(int(row_index), max_top))
+        self._render()
+        self._schedule_prefetch()
+
+    # ---------- Data ----------
+    def _load_chunk(self, index):
+        """Loads a chunk. Returns True if it is available right away."""
+        offset = index * self.chunk_size
+        keys = self._neighbour_keys(index)
+        if self.executor is None:
+            self._store_chunk(index, self.fetch_page(offset, self.chunk_size, **keys))
+            return True
+        if index not in self._loading:
+            self._loading.add(index)
+            generation = self._generation
+            self.executor.submit(self.fetch_page, offset, self.chunk_size, **keys,
+                                 callback=lambda result: self._on_chunk(generation, index, result),
+                                 on_error=lambda error: self._on_chunk_error(generation, index, error))
+        return False
+
+    def _neighbour_keys(self, index):
+        """after= / before= for a chunk next to a full cached one, else nothing."""
+        previous, following = self._chunks.get(index - 1), self._chunks.get(index + 1)
+        if previous and len(previous) == self.chunk_size:
+            return {"after": previous[-1][0]}
+        if following:
+            return {"before": following[0][0]}
+        return {}
+
+    def _store_chunk(self, index, result):
+        rows, total = result
+        self._chunks[index] = rows
+        self.total = total
+
+    def _on_chunk(self, generation, index, result):
+        if generation != self._generation:
+            return   # fetched before a refresh()
+        self._loading.discard(index)
+        self._store_chunk(index, result)
+        self.scroll_to(self.top)
+
+    def _on_chunk_error(self, generation, index, error):
+        if generation != self._generation:
+            return
+        self._loading.discard(index)
+        if self._error_generation == generation:
+            return   # already reported; the other chunks failed the same way
+        self._error_generation = generation
+        if self.on_error:
+            self.on_error(error)
+        else:
+            print(f"Table load failed: {error}")
+
+    def _row(self, row_index):
+        index, pos = divmod(row_index, self.chunk_size)
+        if index not in self._chunks and not self._load_chunk(index):
+            return ()   # still loading, show a blank row for now
+        rows = self._chunks[index]
+        return rows[pos] if pos < len(rows) else None
+
+    def _wanted_chunks(self):
+        first = self.top // self.chunk_size
+        last = (self.top + self.visible_rows - 1) // self.chunk_size
+        lo = max(0, first - self.prefetch_chunks)
+        hi = min((max(self.total, 1) - 1) // self.chunk_size, last + self.prefetch_chunks)
+        return range(lo, hi + 1)
+
+    def _schedule_prefetch(self):
+        if self._prefetch_job is None:
+            self._prefetch_job = self.after(1, self._prefetch_step)
+
+    def _prefetch_step(self):
+        self._prefetch_job = None
+        wanted = self._wanted_chunks()
+        for index in list(self._chunks):
+            if index not in wanted:
+                del self._chunks[index]
+        # Outwards from the chunk on screen, each once its inner neighbour
+        # is in, so it can be fetched by key; _on_chunk() comes back here
+        centre = self.top // self.chunk_size
+        for index in sorted(wanted, key=lambda i: abs(i - centre)):
+            if index in self._chunks:
+                continue
+            inner = index - 1 if index > centre else index + 1
+            if index != centre and inner not in self._chunks:
+                continue
+            if index not in self._loading:
+                self._load_chunk(index)
+                # One chunk per turn of the event loop keeps the UI responsive
+                self._schedule_prefetch()
+                return
+
+    # ---------- View ----------
+    def _clear_selection(self):
+        self.tree.selection_remove(self.tree.selection())
+        self.tree.focus("")   # "" is the root item, i.e. no row
+
+    def _render(self):
+        # Slot ids stay the same, so after scrolling a selection (or the
+        # focus) would point at a different row
+        if self.top != self._rendered_top:
+            self._clear_selection()
+            self._rendered_top = self.top
+        for slot, item in enumerate(self._slots):
+            row_index = self.top + slot
+            row = self._row(row_index) if row_index < self.total else None
+            self.tree.item(item, values=row if row is not None else ())
+            if row is None:
+                self.tree.detach(item)
+            else:
+                self.tree.move(item, "", slot)
+
+        if self.total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / self.total, (self.top + self.visible_rows) / self.total)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.visible_rows
+            self.scroll_to(self.top + step)
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.top + (-3 if event.delta > 0 else 3))
+        return "break"
@@ -4,16 +4,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from PIL import Image, ImageTk
-import database
+from db_client import database
 import os
-import shutil
+import photo_store
 import datetime
 from ui_style import *
 from chat_window import open_chat_window # <-- U3 IMPORT
+from db_executor import DatabaseExecutor
+from ui_profile import profiled
 
 # Ensure DB exists
 database.connect_db()
 
+CALENDAR_DAYS = 30   # days shown in "My Calendar", starting today
+
 # ===================================================================
 # MAIN WORKER DASHBOARD WINDOW
 # ===================================================================
@@ -32,6 +36,9 @@ def open_worker_dashboard(worker_id, worker_name):
     y = (root.winfo_screenheight() // 2) - (h // 2)
     root.geometry(f"{w}x{h}+{x}+{y}")
 
+    # All database calls run in the background; results come back via after()
+    db = DatabaseExecutor(root)
+
     # --- Header ---
     title = title_label(root, f"Welcome, {worker_name}")
     title.pack(pady=(20, 5))
@@ -45,6 +52,9 @@ def open_worker_dashboard(worker_id, worker_name):
     profile_btn = styled_button(top_frame, "My Profile", command=lambda: open_profile_edit(worker_id, root), width=15)
     profile_btn.pack(side="left", padx=10)
     
+    calendar_btn = styled_button(top_frame, "My Calendar", command=lambda: open_calendar(), width=15)
+    calendar_btn.pack(side="left", padx=10)
+
     refresh_btn = styled_button(top_frame, "Refresh Requests", command=lambda: populate_requests(), width=20)
     refresh_btn.pack(side="left", padx=10)
 
@@ -70,16 +80,28 @@ def open_worker_dashboard(worker_id, worker_name):
     tree.pack(side="left", fill="both", expand=True)
 
 
-    def populate_requests():
+    @profiled
+    def fill_requests(data):
         for item in tree.get_children():
             tree.delete(item)
-        data = database.get_bookings_by_worker(worker_id)
         for row in data:
             # row = (booking_id, customer_id, c.name, c.phone, b.service_date, b.status, b.address, b.notes)
             # We store customer_id and customer_name in tags
             tree.insert("", "end", values=(row[0], row[2], row[3], row[4], row[5], row[6], row[7]), tags=(row[1], row[2]))
 
-        return data
+    @profiled
+    def populate_requests():
+        db.submit(database.get_bookings_by_worker, worker_id, callback=fill_requests)
+
+    def set_status(booking_id, status, success_msg, error_prefix):
+        def on_done(result):
+            ok, err = result
+            if ok:
+                messagebox.showinfo("Success", success_msg, parent=root)
+                populate_requests()
+            else:
+                messagebox.showerror("Error", f"{error_prefix}: {err}", parent=root)
+        db.submit(database.update_booking_status, booking_id, status, callback=on_done)
 
     # --- Action Buttons ---
     action_frame = tk.Frame(root, bg=WHITE)
@@ -99,12 +121,7 @@ def open_worker_dashboard(worker_id, worker_name):
             messagebox.showinfo("Info", "This booking is already accepted.", parent=root)
             return
         
-        ok, err = database.update_booking_status(booking_id, "Accepted")
-        if ok:
-            messagebox.showinfo("Success", "Booking Accepted!", parent=root)
-            populate_requests()
-        else:
-            messagebox.showerror("Error", f"Failed to accept: {err}", parent=root)
+        set_status(booking_id, "Accepted", "Booking Accepted!", "Failed to accept")
 
     accept_btn = styled_button(action_frame, "Accept Selected", command=accept_selected, width=18)
     accept_btn.grid(row=0, column=0, padx=10)
@@ -116,12 +133,7 @@ def open_worker_dashboard(worker_id, worker_name):
             return
         
         booking_id = tree.item(selected)["values"][0]
-        ok, err = database.update_booking_status(booking_id, "Rejected")
-        if ok:
-            messagebox.showinfo("Success", "Booking Rejected.", parent=root)
-            populate_requests()
-        else:
-            messagebox.showerror("Error", f"Failed to reject: {err}", parent=root)
+        set_status(booking_id, "Rejected", "Booking Rejected.", "Failed to reject")
 
     reject_btn = styled_button(action_frame, "Reject Selected", command=reject_selected, width=18)
     reject_btn.grid(row=0, column=1, padx=10)
@@ -140,12 +152,7 @@ def open_worker_dashboard(worker_id, worker_name):
             messagebox.showwarning("Info", "Only 'Accepted' bookings can be marked as complete.", parent=root)
             return
 
-        ok, err = database.update_booking_status(booking_id, "Completed")
-        if ok:
-            messagebox.showinfo("Success", "Booking marked as Completed!", parent=root)
-            populate_requests()
-        else:
-            messagebox.showerror("Error", f"Failed: {err}", parent=root)
+        set_status(booking_id, "Completed", "Booking marked as Completed!", "Failed")
             
     complete_btn = styled_button(action_frame, "Mark as Completed", command=complete_selected, width=20)
     complete_btn.grid(row=0, column=2, padx=10)
@@ -170,39 +177,120 @@ def open_worker_dashboard(worker_id, worker_name):
     # --- End U3 ---
 
 
-    # --- Notification System (Auto-Refresh) ---
-    last_count = len(populate_requests())
+    # --- Notification System (Auto-Refresh via change feed) ---
+    change_scope = f"worker:{worker_id}"
+    change_token = 0
+
+    def on_changes(result):
+        # The booking list is only refetched when it changed. changes is
+        # None when the token fell out of the pruned log: reload anyway.
+        nonlocal change_token
+        changes, change_token = result
+        if changes == []:
+            return
+        if changes and any(op == "insert" for (_, _, _, op) in changes):
+            messagebox.showinfo("New Booking", "You have a new booking request!", parent=root)
+        populate_requests() 
 
     def check_new_bookings():
         if not root.winfo_exists(): 
             return
-            
-        nonlocal last_count
-        try:
-            current_bookings = database.get_bookings_by_worker(worker_id)
-            current_count = len(current_bookings)
-            
-            if current_count > last_count:
-                messagebox.showinfo("New Booking", "You have a new booking request!", parent=root)
-                populate_requests() 
-            
-            last_count = current_count
-            root.task_id = root.after(5000, check_new_bookings) 
-        except Exception as e:
-            print(f"Error checking bookings: {e}")
-            
-    check_new_bookings() 
+        # key="poll": skip this tick if the last poll is still running
+        db.submit(database.get_changes_since, change_token, change_scope, callback=on_changes, key="poll")
+        root.task_id = root.after(5000, check_new_bookings) 
+
+    def start_polling(token):
+        nonlocal change_token
+        change_token = token
+        populate_requests()
+        check_new_bookings()
+
+    db.submit(database.get_change_token, change_scope, callback=start_polling)
 
     def on_close():
         if hasattr(root, 'task_id'): 
             root.after_cancel(root.task_id)
+        db.close()
         root.destroy()
     root.protocol("WM_DELETE_WINDOW", on_close)
 
 
+    # --- Calendar Popup (booked and blocked days) ---
+    def open_calendar():
+        win = tk.Toplevel(root)
+        win.title("My Calendar")
+        win.geometry("520x600")
+        win.configure(bg=WHITE)
+        win.transient(root)
+        win.grab_set()
+
+        title_label(win, "My Calendar").pack(pady=(20, 5))
+        subtitle_label(win, "Block the days you can't work. Customers can't book them.").pack()
+
+        cal_frame = tk.Frame(win, bg=WHITE)
+        cal_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        cal_cols = ("Date", "Day", "Status")
+        cal_tree = ttk.Treeview(cal_frame, columns=cal_cols, show="headings", height=16)
+        for c in cal_cols:
+            cal_tree.heading(c, text=c)
+            cal_tree.column(c, width=140, anchor="w")
+        cal_scroll = ttk.Scrollbar(cal_frame, orient="vertical", command=cal_tree.yview)
+        cal_tree.configure(yscrollcommand=cal_scroll.set)
+        cal_scroll.pack(side="right", fill="y")
+        cal_tree.pack(side="left", fill="both", expand=True)
+
+        today = datetime.date.today()
+
+        @profiled
+        def fill_calendar(entries):
+            if not win.winfo_exists():
+                return
+            taken = {day: (kind, booking_id) for day, kind, booking_id in entries}
+            cal_tree.delete(*cal_tree.get_children())
+            for offset in range(CALENDAR_DAYS):
+                day = (today + datetime.timedelta(days=offset)).isoformat()
+                kind, booking_id = taken.get(day, (None, None))
+                if kind == "booked":
+                    status = f"Booked (#{booking_id})"
+                elif kind == "blocked":
+                    status = "Blocked"
+                else:
+                    status = "Free"
+                cal_tree.insert("", "end", iid=day, values=(day, datetime.date.fromisoformat(day).strftime("%A"), status))
+
+        def load_calendar():
+            db.submit(database.get_worker_calendar, worker_id, today.isoformat(), CALENDAR_DAYS, callback=fill_calendar)
+
+        def change_selected(action, verb):
+            days = sorted(cal_tree.selection())
+            if not days:
+                messagebox.showwarning("No Selection", f"Please select the days to {verb}.", parent=win)
+                return
+
+            def apply():
+                # One day at a time, so a multi-selection with gaps leaves the gaps alone
+                return [err for ok, err in (action(worker_id, day) for day in days) if not ok]
+
+            def on_done(errors):
+                if errors:
+                    messagebox.showerror("Error", f"Could not {verb} some days: " + " ".join(errors), parent=win)
+                load_calendar()
+            db.submit(apply, callback=on_done)
+
+        cal_actions = tk.Frame(win, bg=WHITE)
+        cal_actions.pack(pady=15)
+        styled_button(cal_actions, "Block Days", command=lambda: change_selected(database.block_days, "block"), width=14).grid(row=0, column=0, padx=8)
+        styled_button(cal_actions, "Unblock Days", command=lambda: change_selected(database.unblock_days, "unblock"), width=14).grid(row=0, column=1, padx=8)
+        styled_button(cal_actions, "Close", command=win.destroy, width=10).grid(row=0, column=2, padx=8)
+
+        load_calendar()
+
     # --- Profile Edit Popup ---
     def open_profile_edit(worker_id, parent_root): 
-        row = database.get_worker_profile(worker_id)
+        db.submit(database.get_worker_profile, worker_id,
+                  callback=lambda row: show_profile_edit(worker_id, parent_root, row))
+
+    def show_profile_edit(worker_id, parent_root, row):
         if not row:
             messagebox.showerror("Error", "Could not load worker profile.")
             return
@@ -250,8 +338,6 @@ def open_worker_dashboard(worker_id, worker_name):
         photo_path_var = tk.StringVar(value=row[9] or "No photo selected.")
         
         def change_photo():
-            assets_dir = "assets/photos"
-            os.makedirs(assets_dir, exist_ok=True)
             filepath = filedialog.askopenfilename(
                 title="Select Profile Photo",
                 filetypes=[("Image Files", "*.png *.jpg *.jpeg")],
@@ -260,11 +346,11 @@ def open_worker_dashboard(worker_id, worker_name):
             if not filepath:
                 return
             try:
-                filename = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.path.basename(filepath)}"
-                dest_path = os.path.join(assets_dir, filename)
-                shutil.copy(filepath, dest_path)
+                # Identical uploads share one stored copy; the replaced
+                # photo is cleaned up later by database.gc_photos()
+                dest_path = photo_store.store_photo(filepath)
                 photo_path_var.set(dest_path)
-                photo_status_label.config(text=f"Selected: {filename}", fg="green")
+                photo_status_label.config(text=f"Selected: {os.path.basename(filepath)}", fg="green")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save photo: {e}", parent=win)
 
@@ -286,7 +372,16 @@ def open_worker_dashboard(worker_id, worker_name):
             if new_photo == "No photo selected.":
                 new_photo = old_photo_path 
 
-            ok, err = database.update_worker_profile(
+            def on_saved(result):
+                ok, err = result
+                if ok:
+                    messagebox.showinfo("Success", "Profile updated successfully!", parent=win)
+                    win.destroy()
+                else:
+                    messagebox.showerror("Error", f"Failed to update: {err}", parent=win)
+
+            db.submit(
+                database.update_worker_profile,
                 worker_id=worker_id,
                 name=entries["Name"].get().strip(),
                 phone=entries["Phone"].get().strip(),
@@ -295,13 +390,8 @@ def open_worker_dashboard(worker_id, worker_name):
                 price_per_hour=price,
                 availability=entries["Availability"].get().strip(),
                 address=entries["Address"].get().strip(),
-                photo=new_photo
+                photo=new_photo,
+                callback=on_saved
             )
-            
-            if ok:
-                messagebox.showinfo("Success", "Profile updated successfully!", parent=win)
-                win.destroy()
-            else:
-                messagebox.showerror("Error", f"Failed to update: {err}", parent=win)
         
     root.mainloop()
\ No newline at end of file